@@ -0,0 +1,380 @@
+import array
+import bisect
+import datetime
+from functools import lru_cache
+
+from armazenamento import CODIGO_TIPO, REMOVIDO, SEM_VALOR, centavos_para_reais, ordinal_para_data
+
+
+RECEITA = CODIGO_TIPO["Receita"]
+DESPESA = CODIGO_TIPO["Despesa"]
+INVESTIMENTO = CODIGO_TIPO["Investimento"]
+SERIES = ("receita", "despesa", "rendimento", "quantidade")  # Séries do TotaisPorData, nessa ordem.
+PERIODOS = ("dia", "semana", "mes", "trimestre", "ano")
+
+
+@lru_cache(maxsize=65536)
+def mes_do_ordinal(ordinal):  # Converte o ordinal de uma data para a chave inteira do mês (ano * 12 + mês - 1).
+    data = datetime.date.fromordinal(ordinal)
+    return data.year * 12 + data.month - 1
+
+
+def formata_mes(chave):  # Converte a chave inteira do mês para o texto "mm/aaaa" mostrado no resultado mensal.
+    return f"{chave % 12 + 1:02d}/{chave // 12}"
+
+
+def _ordem_de_exibicao(chave):  # O resultado mensal sempre saiu ordenado pelo texto "mm/aaaa", ou seja, por mês e depois por ano.
+    return chave % 12, chave // 12
+
+
+class AgregadoMensal:  # Mantém os totais de Receita e Despesa de cada mês sempre atualizados, aplicando a diferença de cada lançamento incluído, editado ou excluído.
+    # Fica registrado como observador do armazenamento colunar (ver LancamentosColunares.observadores).
+    # Cada mês (chave inteira, ver mes_do_ordinal) guarda [receita, despesa, quantidade de lançamentos]; o mês some quando a quantidade chega a zero.
+    # Receita e despesa são somadas em centavos (inteiros), então os totais mantidos e os recalculados são sempre iguais, em qualquer ordem de soma.
+    # Os investimentos entram na receita com o rendimento (investimento_atualizado - valor). Os que ainda não foram atualizados
+    # ficam em 'pendentes' (id -> data), porque sem eles o resultado mensal não pode ser mostrado.
+    def __init__(self, lancamentos):
+        self.lancamentos = lancamentos
+        self.meses = {}
+        self.pendentes = {}
+        self.recalcular()
+        lancamentos.observadores.append(self)
+
+    def recalcular(self):  # Refaz todos os totais do zero, varrendo as colunas direto (sem montar um Registro por lançamento).
+        meses = {}
+        pendentes = {}
+        mes_por_data = {}
+        lancamentos = self.lancamentos
+        colunas = zip(lancamentos.ids, lancamentos.datas, lancamentos.tipos, lancamentos.valores, lancamentos.atualizados)
+        for id_, data, tipo, valor, atualizado in colunas:
+            if tipo == REMOVIDO:
+                continue
+            mes = mes_por_data.get(data)
+            if mes is None:
+                mes = mes_por_data[data] = mes_do_ordinal(data)
+            totais = meses.get(mes)
+            if totais is None:
+                totais = meses[mes] = [0, 0, 0]
+            if tipo == RECEITA:
+                totais[0] += valor
+            elif tipo == DESPESA:
+                totais[1] += valor
+            elif tipo == INVESTIMENTO:
+                if atualizado == SEM_VALOR:  # Investimento ainda não atualizado.
+                    pendentes[id_] = data
+                else:
+                    totais[0] += atualizado - valor
+            totais[2] += 1
+        self.meses = meses
+        self.pendentes = pendentes
+
+    def _aplica(self, registro, sinal):  # Soma (sinal=1) ou subtrai (sinal=-1) a contribuição de um lançamento no mês dele.
+        mes = mes_do_ordinal(registro.data)
+        totais = self.meses.get(mes)
+        if totais is None:
+            totais = self.meses[mes] = [0, 0, 0]
+
+        if registro.tipo == RECEITA:
+            totais[0] += sinal * registro.valor
+        elif registro.tipo == DESPESA:
+            totais[1] += sinal * registro.valor
+        elif registro.tipo == INVESTIMENTO:
+            if registro.atualizado == SEM_VALOR:  # Investimento ainda não atualizado.
+                if sinal > 0:
+                    self.pendentes[registro.id] = registro.data
+                else:
+                    self.pendentes.pop(registro.id, None)
+            else:
+                totais[0] += sinal * (registro.atualizado - registro.valor)
+
+        totais[2] += sinal
+        if totais[2] == 0:
+            del self.meses[mes]
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):
+        if _mesma_contribuicao(antes, depois):
+            return
+        if antes is not None:
+            self._aplica(antes, -1)
+        if depois is not None:
+            self._aplica(depois, 1)
+
+    def limpo(self):
+        self.recalcular()
+
+    # ---- consultas ----
+
+    def investimento_pendente(self):  # Retorna a data ('dd/mm/aaaa') do primeiro investimento não atualizado, ou None se todos estão atualizados.
+        if not self.pendentes:
+            return None
+        return ordinal_para_data(self.pendentes[min(self.pendentes)])
+
+    def resultados(self):  # Lista ordenada de (mês "mm/aaaa", receita, despesa, resultado) em reais, custa O(meses).
+        return [(formata_mes(mes), centavos_para_reais(receita), centavos_para_reais(despesa), centavos_para_reais(receita + despesa))
+                for mes, (receita, despesa, _) in sorted(self.meses.items(), key=lambda item: _ordem_de_exibicao(item[0]))]
+
+    def conferir(self):  # Compara os totais mantidos com um recálculo completo. Retorna a lista de (mês, mantido, recalculado) que não batem.
+        # Depois da conferência ficam valendo os totais recalculados.
+        mantidos = {mes: tuple(totais) for mes, totais in self.meses.items()}
+        mantidos_pendentes = dict(self.pendentes)
+        self.recalcular()
+        divergencias = []
+        for mes in sorted(set(mantidos) | set(self.meses), key=_ordem_de_exibicao):
+            mantido = mantidos.get(mes, (0, 0, 0))
+            recalculado = tuple(self.meses.get(mes, (0, 0, 0)))
+            if mantido != recalculado:
+                divergencias.append((formata_mes(mes), mantido, recalculado))
+        if mantidos_pendentes != self.pendentes:
+            divergencias.append(("pendentes", tuple(sorted(mantidos_pendentes)), tuple(sorted(self.pendentes))))
+        return divergencias
+
+
+def _mesma_contribuicao(antes, depois):  # A mudança não mexe nos totais (mudou só a taxa ou a data do investimento).
+    if antes is None or depois is None:
+        return False
+    if antes.data != depois.data or antes.tipo != depois.tipo or antes.valor != depois.valor:
+        return False
+    return antes.atualizado == depois.atualizado
+
+
+def _contribuicao(registro):  # (receita, despesa, rendimento) de um lançamento. Investimento ainda não atualizado rende 0.
+    if registro.tipo == RECEITA:
+        return registro.valor, 0, 0
+    if registro.tipo == DESPESA:
+        return 0, registro.valor, 0
+    if registro.tipo == INVESTIMENTO and registro.atualizado != SEM_VALOR:
+        return 0, 0, registro.atualizado - registro.valor
+    return 0, 0, 0
+
+
+def totais_em_reais(totais):  # (receita, despesa, rendimento, quantidade) em centavos -> o mesmo em reais.
+    receita, despesa, rendimento, quantidade = totais
+    return centavos_para_reais(receita), centavos_para_reais(despesa), centavos_para_reais(rendimento), quantidade
+
+
+class TotaisPorData:  # Totais de receita, despesa, rendimento dos investimentos e quantidade de lançamentos em qualquer intervalo de datas, em O(log n).
+    # Uma árvore de Fenwick por série (SERIES) sobre os dias que têm lançamento: 'dias' é a lista ordenada desses dias, e a posição i das
+    # árvores guarda a soma de um bloco de dias que termina em dias[i - 1]. A soma até um dia sai de uma bisseção em 'dias' e O(log n)
+    # posições; um intervalo é a diferença de dois prefixos. Só os dias distintos ocupam espaço: um lançamento em 9999 ao lado dos de 2024 é uma posição a mais.
+    # Observa o armazenamento colunar como o AgregadoMensal. Cada mudança vai primeiro para '_pendentes' (dia -> diferença de cada série),
+    # em O(1); a consulta seguinte leva as pendências para as árvores em O(log n) cada. Um dia que ainda não está em 'dias' (ou pendências
+    # demais) remonta as árvores, em O(dias distintos), como os índices (ver indices.py). Um dia que fica sem lançamentos continua em 'dias' até a remontagem.
+    # As árvores são array('q') em centavos, como as colunas: incluir e tirar o mesmo lançamento volta exatamente ao total de antes.
+    def __init__(self, lancamentos):
+        self.lancamentos = lancamentos
+        self.dias = array.array("q")  # Dias (ordinais) das posições 1..n das árvores, em ordem crescente.
+        self.arvores = tuple(array.array("q", [0]) for _ in SERIES)
+        self._pendentes = {}
+        self.recalcular()
+        lancamentos.observadores.append(self)
+
+    def recalcular(self):  # Remonta as árvores do zero, varrendo as colunas.
+        pontos = {}
+        lancamentos = self.lancamentos
+        for id_, data, tipo, valor, atualizado in zip(lancamentos.ids, lancamentos.datas, lancamentos.tipos, lancamentos.valores, lancamentos.atualizados):
+            if tipo == REMOVIDO:
+                continue
+            totais = pontos.get(data)
+            if totais is None:
+                totais = pontos[data] = [0, 0, 0, 0]
+            if tipo == RECEITA:
+                totais[0] += valor
+            elif tipo == DESPESA:
+                totais[1] += valor
+            elif tipo == INVESTIMENTO and atualizado != SEM_VALOR:
+                totais[2] += atualizado - valor
+            totais[3] += 1
+        self._pendentes = {}
+        self._monta(pontos)
+
+    def _monta(self, pontos):  # Monta as árvores em O(n) a partir dos totais de cada dia (dia -> [receita, despesa, rendimento, quantidade]).
+        self.dias = array.array("q", sorted(pontos))
+        tamanho = len(self.dias)
+        self.arvores = tuple(array.array("q", bytes(8 * (tamanho + 1))) for _ in SERIES)
+        for posicao, dia in enumerate(self.dias, start=1):
+            for arvore, total in zip(self.arvores, pontos[dia]):
+                arvore[posicao] = total
+        for arvore in self.arvores:
+            for posicao in range(1, tamanho + 1):
+                acima = posicao + (posicao & -posicao)
+                if acima <= tamanho:
+                    arvore[acima] += arvore[posicao]
+
+    def _pontos(self):  # O contrário de _monta: os totais de cada dia com lançamento, em O(n).
+        arvores = tuple(arvore[:] for arvore in self.arvores)
+        tamanho = len(self.dias)
+        for arvore in arvores:
+            for posicao in range(tamanho, 0, -1):
+                acima = posicao + (posicao & -posicao)
+                if acima <= tamanho:
+                    arvore[acima] -= arvore[posicao]
+        quantidades = arvores[-1]
+        return {self.dias[posicao - 1]: [arvore[posicao] for arvore in arvores] for posicao in range(1, tamanho + 1) if quantidades[posicao]}
+
+    def _posicao(self, dia):  # Posição do dia nas árvores (a partir de 1), ou 0 se ele não estiver em 'dias'.
+        posicao = bisect.bisect_left(self.dias, dia)
+        return posicao + 1 if posicao < len(self.dias) and self.dias[posicao] == dia else 0
+
+    def _aplica_pendentes(self):
+        if not self._pendentes:
+            return
+        pendentes, self._pendentes = self._pendentes, {}
+        tamanho = len(self.dias)
+        posicoes = [self._posicao(dia) for dia in pendentes]
+        if 0 in posicoes or len(pendentes) * tamanho.bit_length() > tamanho:  # Dia novo, ou remontar sai mais barato.
+            pontos = self._pontos()
+            for dia, diferencas in pendentes.items():
+                totais = pontos.setdefault(dia, [0, 0, 0, 0])
+                for serie, diferenca in enumerate(diferencas):
+                    totais[serie] += diferenca
+                if not totais[-1]:  # O dia ficou sem lançamentos.
+                    del pontos[dia]
+            self._monta(pontos)
+            return
+        for posicao, diferencas in zip(posicoes, pendentes.values()):
+            while posicao <= tamanho:
+                for arvore, diferenca in zip(self.arvores, diferencas):
+                    arvore[posicao] += diferenca
+                posicao += posicao & -posicao
+
+    def _soma(self, posicao):  # Totais das posições 1..posicao das árvores.
+        totais = [0, 0, 0, 0]
+        while posicao > 0:
+            for serie, arvore in enumerate(self.arvores):
+                totais[serie] += arvore[posicao]
+            posicao -= posicao & -posicao
+        return totais
+
+    def _prefixo(self, dia):  # Totais de todos os dias até 'dia' (inclusive).
+        return self._soma(bisect.bisect_right(self.dias, dia))
+
+    def _dia_da_quantidade(self, quantidade):  # Menor dia em que a quantidade acumulada chega a 'quantidade' (descida binária na árvore).
+        quantidades = self.arvores[-1]
+        posicao = 0
+        passo = 1 << (len(quantidades) - 1).bit_length()
+        while passo:
+            proxima = posicao + passo
+            if proxima < len(quantidades) and quantidades[proxima] < quantidade:
+                posicao = proxima
+                quantidade -= quantidades[proxima]
+            passo >>= 1
+        return self.dias[posicao]
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):
+        if _mesma_contribuicao(antes, depois):
+            return
+        for registro, sinal in ((antes, -1), (depois, 1)):
+            if registro is None:
+                continue
+            diferencas = self._pendentes.get(registro.data)
+            if diferencas is None:
+                diferencas = self._pendentes[registro.data] = [0, 0, 0, 0]
+            for serie, valor in enumerate(_contribuicao(registro)):
+                diferencas[serie] += sinal * valor
+            diferencas[3] += sinal
+
+    def limpo(self):
+        self.recalcular()
+
+    # ---- consultas ----
+
+    def totais_entre(self, data_inicial=None, data_final=None):  # (receita, despesa, rendimento, quantidade) dos lançamentos entre as duas datas (ordinais, inclusive), em reais. None não limita.
+        return totais_em_reais(self.centavos_entre(data_inicial, data_final))
+
+    def centavos_entre(self, data_inicial=None, data_final=None):  # O mesmo que totais_entre, com receita, despesa e rendimento em centavos.
+        if data_inicial is not None and data_final is not None and data_inicial > data_final:
+            return 0, 0, 0, 0
+        self._aplica_pendentes()
+        final = self._prefixo(data_final) if data_final is not None else self._soma(len(self.dias))
+        if data_inicial is not None:
+            for serie, total in enumerate(self._prefixo(data_inicial - 1)):
+                final[serie] -= total
+        return tuple(final)
+
+    def limites(self):  # (primeiro, último) dia com lançamento, como ordinais, ou None se não houver lançamentos.
+        self._aplica_pendentes()
+        total = self._soma(len(self.dias))[3]
+        if not total:
+            return None
+        return self._dia_da_quantidade(1), self._dia_da_quantidade(total)
+
+    def proximo_dia(self, dia):  # Primeiro dia com lançamento a partir de 'dia' (ordinal), ou None. O(log n), para pular os períodos vazios.
+        self._aplica_pendentes()
+        antes = self._prefixo(dia - 1)[3]
+        if antes == self._soma(len(self.dias))[3]:
+            return None
+        return self._dia_da_quantidade(antes + 1)
+
+
+def _inicio_do_periodo(periodo, data):  # Primeiro dia do período (date) que contém a data.
+    if periodo == "semana":
+        return data - datetime.timedelta(days=data.weekday())
+    if periodo == "mes":
+        return data.replace(day=1)
+    if periodo == "trimestre":
+        return data.replace(month=(data.month - 1) // 3 * 3 + 1, day=1)
+    if periodo == "ano":
+        return data.replace(month=1, day=1)
+    return data
+
+
+def _proximo_periodo(periodo, inicio):  # Primeiro dia do período seguinte, ou None se ele passa de 31/12/9999 (date.max).
+    if inicio >= _inicio_do_periodo(periodo, datetime.date.max):  # Último período do calendário.
+        return None
+    if periodo == "semana":
+        return inicio + datetime.timedelta(days=7)
+    if periodo in ("mes", "trimestre"):
+        meses = inicio.year * 12 + inicio.month - 1 + (1 if periodo == "mes" else 3)
+        return datetime.date(meses // 12, meses % 12 + 1, 1)
+    if periodo == "ano":
+        return datetime.date(inicio.year + 1, 1, 1)
+    return inicio + datetime.timedelta(days=1)
+
+
+def rotulo_do_periodo(periodo, inicio):  # "dd/mm/aaaa", "S05/2024" (semana ISO), "mm/aaaa", "T1/2024" ou "2024".
+    if periodo == "semana":
+        ano, semana, _ = inicio.isocalendar()
+        return f"S{semana:02d}/{ano}"
+    if periodo == "mes":
+        return f"{inicio.month:02d}/{inicio.year}"
+    if periodo == "trimestre":
+        return f"T{(inicio.month - 1) // 3 + 1}/{inicio.year}"
+    if periodo == "ano":
+        return str(inicio.year)
+    return inicio.strftime("%d/%m/%Y")
+
+
+def totais_por_periodo(totais, periodo, data_inicial=None, data_final=None):  # Lista de (rótulo, receita, despesa, rendimento, resultado) de cada período com lançamentos.
+    # 'totais' é um TotaisPorData (ou o banco SQLite, que tem os mesmos centavos_entre, limites e proximo_dia). Cada período é um centavos_entre, O(log n).
+    # Depois de cada período, proximo_dia pula direto para o período do próximo lançamento: os períodos vazios não são percorridos.
+    # A soma do resultado é feita em centavos, e só o resultado final vira reais.
+    # Sem datas, vai do primeiro ao último lançamento; o primeiro e o último período são cortados nas datas pedidas.
+    if periodo not in PERIODOS:
+        raise ValueError(f"Período inválido: {periodo!r} (use {', '.join(PERIODOS)}).")
+    if data_inicial is None or data_final is None:
+        limites = totais.limites()
+        if limites is None:
+            return []
+        data_inicial = limites[0] if data_inicial is None else data_inicial
+        data_final = limites[1] if data_final is None else data_final
+
+    linhas = []
+    inicio = _inicio_do_periodo(periodo, datetime.date.fromordinal(data_inicial))
+    while inicio.toordinal() <= data_final:
+        proximo = _proximo_periodo(periodo, inicio)
+        fim = datetime.date.max.toordinal() if proximo is None else proximo.toordinal() - 1
+        centavos = totais.centavos_entre(max(inicio.toordinal(), data_inicial), min(fim, data_final))
+        if centavos[3]:
+            receita, despesa, rendimento, _ = totais_em_reais(centavos)
+            linhas.append((rotulo_do_periodo(periodo, inicio), receita, despesa, rendimento, centavos_para_reais(sum(centavos[:3]))))
+        if proximo is None:
+            break
+        dia = totais.proximo_dia(proximo.toordinal())
+        if dia is None or dia > data_final:
+            break
+        inicio = max(proximo, _inicio_do_periodo(periodo, datetime.date.fromordinal(dia)))
+    return linhas
@@ -0,0 +1,325 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import main
+from armazenamento import CAMPOS_OPCIONAIS, CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, centavos_para_reais, data_para_ordinal, ordinal_para_data, reais_para_centavos, taxa_para_inteiro
+from agregados import totais_em_reais, totais_por_periodo
+from edicao_em_lote import alterar_em_lote, excluir_em_lote
+from exportacao import exporta
+from filtros import monta
+from importacao import importa
+from recorrencias import Recorrencias, como_dict
+from projecao import ProjecaoCarteira, grade_de_datas
+from rendimento import atualizar_em_lote
+
+
+# API sem menu (headless) para as operações do livro-caixa, para ser usada por outros programas e pelo modo lote.
+# Trabalha sobre os mesmos objetos do main.py (main.lancamentos, main.indices, main.resultado_mensal, main.diario),
+# mas não faz perguntas nem imprime nada: recebe os dados por parâmetro, devolve os resultados e avisa erro com exceção.
+#
+# Modo lote: aplica um arquivo de comandos (um JSON por linha) num processo só e salva uma vez no final.
+#   python api.py comandos.jsonl [--arquivo registros.csv]
+# Cada linha tem "op" e os parâmetros da função de mesmo nome, por exemplo:
+#   {"op": "inserir", "tipo": "Despesa", "valor": 18.25, "data": "14/08/2024"}
+#   {"op": "editar", "id": 3, "valor": 20}
+#   {"op": "excluir", "id": 3}
+#   {"op": "excluir_filtrados", "filtro": {"data": ["01/01/2024", "31/01/2024"], "tipo": "Despesa"}}
+#   {"op": "editar_filtrados", "filtro": {"valor": [null, 0]}, "tipo": "Despesa"}
+#   {"op": "excluir_filtrados", "filtro": {}, "todos": true}      (filtro vazio pega todos os lançamentos: só com "todos")
+#   {"op": "filtrar", "tipo": "Receita"}
+#   {"op": "consultar", "filtro": {"data": ["01/01/2024", "31/03/2024"], "ou": [{"tipo": "Receita"}, {"valor": [1000, null]}]}, "explicar": true}
+#   {"op": "revalorizar", "data_referencia": "31/12/2024"}
+#   {"op": "resultado_mensal"}
+#   {"op": "exportar", "nome_relatorio": "relatorio.jsonl.gz", "data_inicial": "01/01/2024", "data_final": "31/12/2024"}
+#   {"op": "importar", "nome_extrato": "extrato.csv"}
+#   {"op": "incluir_recorrencia", "tipo": "Despesa", "valor": 1200, "frequencia": "mensal", "data_inicial": "05/01/2024", "data_final": "05/12/2024"}
+#   {"op": "recorrencias"}
+#   {"op": "projetar", "data_inicial": "01/01/2025", "data_final": "31/12/2034", "passo": "mensal"}
+#   {"op": "totais", "data_inicial": "01/01/2024", "data_final": "30/06/2024", "periodo": "semana"}
+# As consultas (filtrar, consultar, resultado_mensal, projetar, totais, recorrencias) e a importação (o resumo) escrevem o resultado como uma linha JSON na saída padrão.
+
+
+def usar_arquivo(nome_arquivo):  # Troca o arquivo de dados usado pelo livro-caixa (o padrão é "registros.csv" na pasta atual).
+    # No modo SQLite, 'nome_arquivo' é o banco: as alterações pendentes no banco atual são confirmadas e ele é trocado pelo novo nos cinco papéis.
+    main.diario.aguardar()
+    main.nome_arquivo = nome_arquivo
+    main.recorrencias = Recorrencias(nome_arquivo + ".recorrencias")
+    if main.banco_sqlite:
+        main.lancamentos.salvar()
+        main.lancamentos.conexao.close()
+        main.banco_sqlite = nome_arquivo
+        main.lancamentos = main.resultado_mensal = main.indices = main.totais_por_data = main.diario = main.BancoSQLite(nome_arquivo)
+        main.versao_do_livro = main.lancamentos
+        main.cache.limpar()
+        return
+    main.lancamentos.observadores.remove(main.diario)
+    if main.particoes is not None:
+        main.diario = main.resultado_mensal = main.particoes = main.LivroParticionado(main.lancamentos, main.particoes.agregado, main.indices, nome_arquivo)
+    else:
+        main.diario = main.Diario(main.lancamentos, nome_arquivo)
+
+
+def carregar():  # Carrega o arquivo de dados (snapshot ou CSV, mais o diário) e as recorrências. Retorna a quantidade de lançamentos.
+    main.recorrencias.carregar()
+    if os.path.exists(main.nome_arquivo) or (main.particoes is not None and os.path.exists(main.particoes.caminho_manifesto)):
+        main.diario.carregar(main.carrega_de_arquivo)
+    return len(main.lancamentos)
+
+
+def salvar():  # Grava no diário as alterações feitas desde o último salvamento. Retorna quantas foram gravadas.
+    return main.diario.salvar()
+
+
+def _ordinal(data):  # Aceita None (hoje), date, datetime ou 'dd/mm/aaaa'.
+    if data is None:
+        return datetime.date.today().toordinal()
+    return data_para_ordinal(data)
+
+
+CODIGO_POR_NOME = {nome.lower(): codigo for nome, codigo in CODIGO_TIPO.items()}
+
+
+def _codigo_tipo(tipo):  # Aceita o nome do tipo em qualquer caixa ('receita', 'Receita'...).
+    codigo = CODIGO_POR_NOME.get(str(tipo).lower())
+    if codigo is None:
+        raise ValueError(f"Tipo de lançamento inválido: {tipo!r}")
+    return codigo
+
+
+def inserir(tipo, valor, data=None, taxa_de_juros=None, data_investimento=None):  # Inclui um lançamento com as mesmas regras do criar_registro e retorna o id criado.
+    codigo = _codigo_tipo(tipo)
+    valor = reais_para_centavos(valor)  # Em centavos, como na coluna; aceita número ou texto ("12.34").
+    if codigo == CODIGO_TIPO["Despesa"]:
+        valor = -abs(valor)  # Despesa sempre negativa.
+    if codigo == CODIGO_TIPO["Investimento"]:
+        taxa = SEM_VALOR if taxa_de_juros is None else taxa_para_inteiro(taxa_de_juros)
+        ordinal_investimento = _ordinal(data_investimento)
+    else:  # Os campos de investimento só existem para investimentos.
+        taxa, ordinal_investimento = SEM_VALOR, SEM_DATA
+
+    lancamentos = main.lancamentos
+    id_ = lancamentos.proximo_id()
+    lancamentos.gravar_valores(id_, (_ordinal(data), codigo, valor, taxa, ordinal_investimento, SEM_VALOR))
+    return id_
+
+
+def editar(id_, tipo=None, valor=None, data=None, taxa_de_juros=None, data_investimento=None):  # Altera só os campos informados de um lançamento, com as regras do editar_lancamento.
+    # Diferente do menu, a data do lançamento só muda se for informada.
+    lancamento = dict(main.lancamentos[id_])  # KeyError se o id não existir.
+    novo_tipo = lancamento["tipo"] if tipo is None else TIPOS[_codigo_tipo(tipo)]
+    novo_valor = lancamento["valor"] if valor is None else float(valor)
+    novo_valor = -abs(novo_valor) if novo_tipo == "Despesa" else abs(novo_valor)
+
+    lancamento["tipo"] = novo_tipo
+    lancamento["valor"] = novo_valor
+    if data is not None:
+        lancamento["data"] = data
+    if novo_tipo == "Investimento":
+        if taxa_de_juros is not None:
+            lancamento["taxa_de_juros"] = float(taxa_de_juros)
+        if data_investimento is not None:
+            lancamento["data_investimento"] = data_investimento
+        lancamento.setdefault("data_investimento", datetime.date.today())
+    else:
+        for campo in CAMPOS_OPCIONAIS:
+            lancamento.pop(campo, None)
+    main.lancamentos[id_] = lancamento
+    return id_
+
+
+def excluir(id_):  # Exclui um lançamento. KeyError se o id não existir.
+    del main.lancamentos[id_]
+    return id_
+
+
+def _ids_do_lote(filtro, todos):  # Ids de uma operação em lote. Um filtro vazio (ou que vale para todos) só é aceito com todos=True.
+    if monta(filtro) is None and not todos:
+        raise ValueError("Filtro vazio: ele pegaria todos os lançamentos. Para isso, passe todos=True.")
+    main.carrega_filtro(filtro)
+    ids, _ = main.indices.consulta(filtro)
+    return ids
+
+
+def excluir_filtrados(filtro, todos=False):  # Exclui de uma vez todos os lançamentos que atendem o filtro composto (ver filtros.py). Retorna quantos foram excluídos.
+    return excluir_em_lote(main.lancamentos, _ids_do_lote(filtro, todos))
+
+
+def editar_filtrados(filtro, tipo=None, taxa_de_juros=None, todos=False):  # Troca o tipo e/ou a taxa de juros de todos os lançamentos do filtro, numa operação só. Retorna quantos mudaram.
+    # Regras em edicao_em_lote.py: a data dos lançamentos não muda e a taxa só vale para os investimentos.
+    if tipo is None and taxa_de_juros is None:
+        raise ValueError("Informe o novo tipo ou a nova taxa de juros.")
+    codigo = None if tipo is None else _codigo_tipo(tipo)
+    taxa = None if taxa_de_juros is None else taxa_para_inteiro(taxa_de_juros)
+    return alterar_em_lote(main.lancamentos, _ids_do_lote(filtro, todos), codigo, taxa)
+
+
+def filtrar(data=None, tipo=None, valor_minimo=None, valor_maximo=None):  # Lançamentos que atendem a todos os critérios informados, como lista de (id, dict), em ordem de id (ocorrências de recorrências no fim).
+    # Sem nenhum critério devolve todos. É um filtro composto só com E, respondido pelo planejador (ver filtros.py): um tipo inteiro
+    # junto com uma faixa de valor estreita não monta a lista do tipo, só confere o tipo dos poucos ids da faixa.
+    filtro = {}
+    if data is not None:
+        filtro["data"] = data
+    if tipo is not None:
+        filtro["tipo"] = tipo
+    if valor_minimo is not None or valor_maximo is not None:
+        filtro["valor"] = [valor_minimo, valor_maximo]
+    return consultar(filtro)
+
+
+def consultar(filtro, explicar=False):  # Lançamentos que atendem um filtro composto (dict, ver filtros.py), como lista de (id, dict), em ordem de id.
+    # Depois deles vêm as ocorrências das recorrências que atendem o filtro, em ordem de data, com o id negativo da recorrência (ver recorrencias.py).
+    # Com explicar=True devolve {"lancamentos": [...], "plano": [linhas do plano]}.
+    main.carrega_filtro(filtro)  # No modo particionado, só os meses que o filtro pode pegar (ver particoes.py).
+    ids, plano = main.indices.consulta(filtro)
+    lancamentos = [(id_, dict(main.lancamentos[id_])) for id_ in ids]
+    lancamentos.extend((ocorrencia.id, como_dict(ocorrencia)) for ocorrencia in main.recorrencias.filtradas(filtro))
+    if explicar:
+        return {"lancamentos": lancamentos, "plano": plano}
+    return lancamentos
+
+
+def revalorizar(data_referencia=None):  # Recalcula o valor de todos os investimentos na data (hoje por padrão). Retorna quantos foram atualizados.
+    if data_referencia is not None and not isinstance(data_referencia, datetime.date):
+        data_referencia = datetime.date.fromordinal(data_para_ordinal(data_referencia))
+    if main.banco_sqlite:
+        return main.lancamentos.revalorizar(data_referencia)
+    main.carrega_investimentos()
+    return atualizar_em_lote(main.lancamentos, data_referencia)
+
+
+def resultado_mensal():  # Lista de dicts {mes, receita, despesa, resultado}, em ordem de mês, com as recorrências até hoje. ValueError se houver investimento não atualizado.
+    data_pendente = main.resultado_mensal.investimento_pendente()
+    if data_pendente is not None:
+        raise ValueError(f"O investimento realizado em {data_pendente} não foi atualizado.")
+    return [{"mes": mes, "receita": receita, "despesa": despesa, "resultado": resultado}
+            for mes, receita, despesa, resultado in main.recorrencias.com_resultado_mensal(main.resultado_mensal.resultados())]
+
+
+def exportar(nome_relatorio="meu_relatorio.csv", formato=None, data_inicial=None, data_final=None, tipo=None):  # Exporta o relatório (formatos em exportacao.py). Retorna a quantidade de lançamentos exportados.
+    if tipo is not None:
+        tipo = _codigo_tipo(tipo)
+    linhas, _ = exporta(main.lancamentos, nome_relatorio, formato, data_inicial, data_final, tipo, recorrencias=main.recorrencias)
+    return linhas
+
+
+def importar(nome_extrato, formato=None, ignorar_duplicados=True):  # Importa um extrato (formatos em importacao.py), salvando a cada lote. Retorna o resumo (dict com lidas, importadas, duplicadas, invalidas, erros...).
+    return importa(main.lancamentos, nome_extrato, formato, ignorar_duplicados, ao_gravar_lote=main.diario.salvar)
+
+
+def recorrencias():  # Lista de dicts {numero, tipo, valor, frequencia, data_inicial, data_final} das recorrências (data_final None: sem fim).
+    return [{"numero": regra.numero, "tipo": TIPOS[regra.tipo], "valor": centavos_para_reais(regra.valor), "frequencia": regra.frequencia,
+             "data_inicial": ordinal_para_data(regra.inicio), "data_final": ordinal_para_data(regra.fim) if regra.fim != SEM_DATA else None}
+            for regra in main.recorrencias]
+
+
+def incluir_recorrencia(tipo, valor, frequencia="mensal", data_inicial=None, data_final=None):  # Inclui uma receita ou despesa recorrente (data inicial None é hoje, final None é sem fim). Retorna o número dela.
+    fim = SEM_DATA if data_final is None else data_para_ordinal(data_final)
+    return main.recorrencias.incluir(_codigo_tipo(tipo), reais_para_centavos(valor), frequencia, _ordinal(data_inicial), fim)
+
+
+def excluir_recorrencia(numero):  # Exclui uma recorrência. KeyError se não existir.
+    main.recorrencias.excluir(numero)
+    return numero
+
+
+def projetar(data_inicial=None, data_final=None, passo="mensal"):  # Total da carteira de investimentos em cada data da grade, como lista de dicts {data, total}. Datas None são hoje.
+    grade = grade_de_datas(_ordinal(data_inicial), _ordinal(data_final), passo)
+    return [{"data": data, "total": total} for data, total in ProjecaoCarteira(main.lancamentos, grade).linhas_dos_totais()]
+
+
+def totais(data_inicial=None, data_final=None, periodo=None):  # Receita, despesa, rendimento e resultado do intervalo (datas None não limitam).
+    # Sem 'periodo' devolve um dict só; com periodo ("dia", "semana", "mes", "trimestre" ou "ano") devolve a lista de dicts de cada período com lançamentos.
+    inicio = None if data_inicial is None else data_para_ordinal(data_inicial)
+    fim = None if data_final is None else data_para_ordinal(data_final)
+    main.carrega_periodo(inicio, fim)
+    if periodo is None:
+        centavos = main.totais_por_data.centavos_entre(inicio, fim)
+        receita, despesa, rendimento, quantidade = totais_em_reais(centavos)
+        return {"receita": receita, "despesa": despesa, "rendimento": rendimento, "resultado": centavos_para_reais(sum(centavos[:3])),
+                "quantidade": quantidade}
+    return [{"periodo": rotulo, "receita": receita, "despesa": despesa, "rendimento": rendimento, "resultado": resultado}
+            for rotulo, receita, despesa, rendimento, resultado in totais_por_periodo(main.totais_por_data, periodo, inicio, fim)]
+
+
+OPERACOES = {
+    "inserir": inserir,
+    "editar": editar,
+    "excluir": excluir,
+    "excluir_filtrados": excluir_filtrados,
+    "editar_filtrados": editar_filtrados,
+    "filtrar": filtrar,
+    "consultar": consultar,
+    "revalorizar": revalorizar,
+    "resultado_mensal": resultado_mensal,
+    "exportar": exportar,
+    "importar": importar,
+    "recorrencias": recorrencias,
+    "incluir_recorrencia": incluir_recorrencia,
+    "excluir_recorrencia": excluir_recorrencia,
+    "projetar": projetar,
+    "totais": totais,
+}
+CONSULTAS = {"filtrar", "consultar", "resultado_mensal", "projetar", "totais", "importar", "recorrencias"}  # Operações cujo resultado é escrito na saída.
+
+
+def executar(comando, operacoes=OPERACOES):  # Executa um comando já lido do JSON ({"op": ..., parâmetros}) e devolve o resultado. Usada pelo modo lote e pelo servidor (servidor.py).
+    comando = dict(comando)
+    operacao = operacoes[comando.pop("op")]  # KeyError se a operação não existir.
+    if "id" in comando:
+        comando["id_"] = comando.pop("id")
+    return operacao(**comando)
+
+
+def executar_lote(linhas, saida=sys.stdout):  # Aplica os comandos (linhas JSON) em ordem. Retorna (quantidade aplicada, lista de erros (número da linha, mensagem)).
+    aplicados = 0
+    erros = []
+    for numero, linha in enumerate(linhas, start=1):
+        linha = linha.strip()
+        if not linha or linha.startswith("#"):
+            continue
+        try:
+            comando = json.loads(linha)
+            resultado = executar(comando)
+        except (KeyError, ValueError, TypeError, OSError) as erro:  # OSError: exportar ou importar um arquivo que não dá para abrir.
+            erros.append((numero, f"{type(erro).__name__}: {erro}"))
+            continue
+        if comando["op"] in CONSULTAS:
+            saida.write(json.dumps({"linha": numero, "resultado": resultado}, ensure_ascii=False) + "\n")
+        aplicados += 1
+    return aplicados, erros
+
+
+def roda_lote():  # Ponto de entrada do modo lote: carrega, aplica o arquivo de comandos e salva uma vez no final.
+    parser = argparse.ArgumentParser(description="Aplica um arquivo de comandos (JSON Lines) no livro-caixa do EcoBalance.")
+    parser.add_argument("comandos", help="arquivo com um comando JSON por linha ('-' para a entrada padrão)")
+    parser.add_argument("--arquivo", default=main.nome_arquivo, help="arquivo de dados (padrão: registros.csv)")
+    argumentos = parser.parse_args()
+
+    if argumentos.arquivo != main.nome_arquivo:
+        usar_arquivo(argumentos.arquivo)
+    carregar()
+    inicio = time.perf_counter()
+    try:
+        if argumentos.comandos == "-":
+            aplicados, erros = executar_lote(sys.stdin)
+        else:
+            with open(argumentos.comandos, encoding="utf-8") as file:
+                aplicados, erros = executar_lote(file)
+        segundos = time.perf_counter() - inicio
+    finally:  # Mesmo se o lote parar no meio (um erro inesperado, Ctrl+C), os comandos já aplicados são salvos.
+        gravadas = salvar()
+        main.diario.aguardar()
+
+    for numero, mensagem in erros:
+        print(f"Linha {numero}: {mensagem}", file=sys.stderr)
+    print(f"{aplicados} comandos aplicados em {segundos:.2f} s ({aplicados / segundos if segundos else 0:.0f} por segundo), "
+          f"{len(erros)} com erro, {gravadas} alterações salvas.", file=sys.stderr)
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(roda_lote())
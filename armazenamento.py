@@ -0,0 +1,459 @@
+import array  # arrays tipados, guardam os números sem criar um objeto Python por valor
+import bisect
+import datetime
+from collections import namedtuple
+from collections.abc import MutableMapping
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from functools import lru_cache
+
+
+# Armazenamento colunar dos lançamentos.
+# Em vez de um dict pequeno por lançamento, cada campo fica numa coluna (array tipado) e a posição "i" de todas as colunas forma um lançamento.
+# As colunas são:
+#   ids          array('q')  id do lançamento, sempre em ordem crescente (permite achar o id por bisseção)
+#   datas        array('i')  data do lançamento como ordinal (datetime.date.toordinal())
+#   tipos        array('b')  código do tipo, ver TIPOS. O código 0 marca uma posição removida.
+#   valores      array('q')  valor do lançamento em centavos (R$ 12,34 é 1234)
+#   taxas        array('q')  taxa de juros mensal em ponto fixo, ESCALA_TAXA por ponto percentual (0,5% é 5000); SEM_VALOR quando não existe
+#   datas_inv    array('i')  data do investimento como ordinal, 0 quando não existe
+#   atualizados  array('q')  investimento atualizado em centavos, SEM_VALOR quando não existe
+# Dinheiro e taxas são inteiros para as somas serem exatas (0,10 + 0,20 é 0,30, em qualquer ordem de soma) e para o texto do CSV ir e voltar
+# sem arredondamento: a conversão de texto para inteiro é decimal (reais_para_centavos), sem passar por float. A view com cara de dict
+# continua mostrando reais e porcentagens como float; os valores crus (Registro, gravar_valores) são os inteiros das colunas.
+
+TIPOS = ("", "Receita", "Despesa", "Investimento")  # o índice na tupla é o código guardado na coluna 'tipos'.
+CODIGO_TIPO = {"Receita": 1, "Despesa": 2, "Investimento": 3}
+REMOVIDO = 0
+SEM_DATA = 0  # Nenhuma data real tem ordinal 0, então 0 significa "campo vazio".
+SEM_VALOR = -2**63  # Menor inteiro de 64 bits, nenhum valor válido chega nele: marca taxa e investimento atualizado vazios.
+CENTAVOS = 100  # Centavos por real.
+CASAS_TAXA = 4
+ESCALA_TAXA = 10 ** CASAS_TAXA  # A taxa guarda 4 casas decimais do ponto percentual (0,0001% ao mês).
+LIMITE_INTEIRO = 2**63 - 1
+
+CAMPOS = ("data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado")
+CAMPOS_OPCIONAIS = ("taxa_de_juros", "data_investimento", "investimento_atualizado")
+
+# Valores crus de um lançamento, na ordem das colunas. É o que os observadores recebem quando um lançamento muda.
+Registro = namedtuple("Registro", "id data tipo valor taxa data_inv atualizado")
+
+
+@lru_cache(maxsize=65536)
+def data_para_ordinal(data):  # Converte 'dd/mm/aaaa' (ou date/datetime) para o ordinal do dia. Existem poucas datas distintas, por isso o cache.
+    if isinstance(data, (datetime.date, datetime.datetime)):
+        return data.toordinal()
+    if not isinstance(data, str):  # Um número ou lista vindo do JSON (api.py): TypeError, como os outros parâmetros errados, e não AttributeError.
+        raise TypeError(f"Data inválida: {data!r} (use 'dd/mm/aaaa').")
+    dia, mes, ano = data.split("/")
+    return datetime.date(int(ano), int(mes), int(dia)).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def ordinal_para_data(ordinal):  # Converte o ordinal de volta para a string 'dd/mm/aaaa', só usado na hora de mostrar ou gravar.
+    return datetime.date.fromordinal(ordinal).strftime("%d/%m/%Y")
+
+
+def _inteiro_escalado(valor, casas, arredondamento):  # valor (texto ou número) * 10**casas como inteiro, com a conta feita em decimal.
+    if isinstance(valor, int):
+        inteiro = valor * 10 ** casas
+    else:
+        texto = valor.strip() if isinstance(valor, str) else str(valor)  # str de um float é o texto mais curto que volta nele (0.1 e não 0.1000000000000000055...).
+        parte_inteira, _, fracao = texto.partition(".")
+        digitos = parte_inteira[1:] if parte_inteira[:1] in ("-", "+") else parte_inteira
+        if digitos.isdecimal() and len(fracao) <= casas and (not fracao or fracao.isdecimal()):
+            inteiro = int(parte_inteira + fracao.ljust(casas, "0"))  # Caso comum (o texto do CSV): basta juntar os dígitos.
+        else:
+            try:
+                numero = Decimal(texto)
+            except InvalidOperation:
+                raise ValueError(f"Número inválido: {valor!r}") from None
+            if not numero.is_finite() or numero.adjusted() > 20:
+                raise ValueError(f"Número fora do limite: {valor!r}")
+            inteiro = int(numero.scaleb(casas).to_integral_value(arredondamento))
+    if not -LIMITE_INTEIRO <= inteiro <= LIMITE_INTEIRO:
+        raise ValueError(f"Número fora do limite: {valor!r}")
+    return inteiro
+
+
+def reais_para_centavos(valor, arredondamento=ROUND_HALF_EVEN):  # '12.34', 12.34 ou Decimal('12.34') -> 1234. Mais de duas casas são arredondadas.
+    ponto = valor.rfind(".") if type(valor) is str else -1
+    casas = len(valor) - 1 - ponto if ponto >= 0 else 0
+    if casas in (1, 2) and valor[ponto + 1:].isdecimal():  # Caso mais comum, o texto do CSV ('12.34', ou '12.3' como o float era gravado): basta tirar o ponto.
+        try:
+            centavos = int(valor.replace(".", "", 1)) * (10 if casas == 1 else 1)
+        except ValueError:
+            pass
+        else:
+            if -LIMITE_INTEIRO <= centavos <= LIMITE_INTEIRO:
+                return centavos
+    return _inteiro_escalado(valor, 2, arredondamento)
+
+
+def taxa_para_inteiro(valor, arredondamento=ROUND_HALF_EVEN):  # Taxa em porcentagem ('0.5', 0.5...) -> ponto fixo da coluna 'taxas' (5000).
+    return _inteiro_escalado(valor, CASAS_TAXA, arredondamento)
+
+
+def centavos_para_reais(centavos):  # 1234 -> 12.34 (float, para mostrar e para a API).
+    return centavos / CENTAVOS
+
+
+def inteiro_para_taxa(taxa):  # 5000 -> 0.5 (float, em porcentagem).
+    return taxa / ESCALA_TAXA
+
+
+def _texto_escalado(inteiro, casas):
+    parte_inteira, fracao = divmod(abs(inteiro), 10 ** casas)
+    return f"{'-' if inteiro < 0 else ''}{parte_inteira}.{fracao:0{casas}d}"
+
+
+def centavos_para_texto(centavos):  # 1234 -> '12.34', sempre com duas casas. É o formato gravado no CSV e no diário.
+    texto = str(centavos) if centavos >= 0 else str(-centavos)  # Fatiar o texto dos dígitos sai mais barato que divmod e formatação.
+    if len(texto) < 3:
+        texto = texto.rjust(3, "0")
+    return ("-" if centavos < 0 else "") + texto[:-2] + "." + texto[-2:]
+
+
+def taxa_para_texto(taxa):  # 5000 -> '0.5': as casas da taxa sem os zeros à direita (mas com pelo menos uma).
+    texto = _texto_escalado(taxa, CASAS_TAXA).rstrip("0")
+    return texto + "0" if texto.endswith(".") else texto
+
+
+def _vazio(valor):  # Os campos opcionais chegam como None, "" (linha do CSV) ou com o valor de fato.
+    return valor is None or valor == ""
+
+
+class LancamentoView(MutableMapping):  # "Janela" com cara de dict para um lançamento guardado nas colunas. Ler e escrever nela lê e escreve direto nas colunas.
+    __slots__ = ("_colunas", "_id", "_pos", "_geracao")
+
+    def __init__(self, colunas, id_, posicao=None):
+        self._colunas = colunas
+        self._id = id_
+        self._pos = posicao
+        self._geracao = colunas._geracao
+
+    def _posicao(self):  # Guarda a posição do id e só refaz a busca se as colunas mudaram de lugar (inserção no meio ou compactação).
+        colunas = self._colunas
+        if self._pos is None or self._geracao != colunas._geracao or colunas.tipos[self._pos] == REMOVIDO:
+            self._pos = colunas._posicao(self._id)
+            self._geracao = colunas._geracao
+        return self._pos
+
+    def __getitem__(self, campo):
+        valor = self._colunas._ler_campo(self._posicao(), campo)
+        if valor is None:
+            raise KeyError(campo)
+        return valor
+
+    def __setitem__(self, campo, valor):
+        self._colunas._gravar_campo(self._posicao(), campo, valor)
+
+    def __delitem__(self, campo):
+        if campo not in CAMPOS_OPCIONAIS:
+            raise KeyError(f"O campo '{campo}' é obrigatório e não pode ser removido.")
+        posicao = self._posicao()
+        if self._colunas._ler_campo(posicao, campo) is None:
+            raise KeyError(campo)
+        self._colunas._gravar_campo(posicao, campo, None)
+
+    def __iter__(self):  # Só devolve os campos preenchidos, igual ao dict antigo.
+        posicao = self._posicao()
+        for campo in CAMPOS:
+            if self._colunas._ler_campo(posicao, campo) is not None:
+                yield campo
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class LancamentosColunares(MutableMapping):  # Substitui o dict de dicts 'lancamentos' mantendo a mesma interface: lancamentos[id], lancamentos[id] = {...}, del lancamentos[id], items(), values()...
+    # Estruturas derivadas (agregados, índices...) se registram em 'observadores' para serem avisadas de cada mudança.
+    # Cada observador precisa ter os métodos alterado(antes, depois), que recebe os Registro de antes e depois da mudança
+    # (antes é None numa inclusão e depois é None numa exclusão), e limpo(), chamado quando as colunas são trocadas por inteiro
+    # (zeradas ou carregadas de uma vez por substituir_colunas); nesse caso o observador deve se refazer a partir das colunas atuais.
+    # As alterações em lote (gravar_em_lote) chamam alterados(mudancas), com a lista de pares (antes, depois) da operação inteira,
+    # nos observadores que têm esse método; nos outros, alterado é chamado para cada par.
+    def __init__(self):
+        self.observadores = []
+        self.limpar()
+
+    def limpar(self):  # Zera todas as colunas.
+        self.ids = array.array("q")
+        self.datas = array.array("i")
+        self.tipos = array.array("b")
+        self.valores = array.array("q")
+        self.taxas = array.array("q")
+        self.datas_inv = array.array("i")
+        self.atualizados = array.array("q")
+        self._removidos = 0  # Quantidade de posições marcadas como removidas (tipo 0) e ainda não compactadas.
+        self._geracao = getattr(self, "_geracao", 0) + 1  # Muda sempre que as posições dos ids mudam, invalida as posições guardadas nas views.
+        for observador in self.observadores:
+            observador.limpo()
+
+    def substituir_colunas(self, ids, datas, tipos, valores, taxas, datas_inv, atualizados):  # Troca todas as colunas de uma vez (carga de um snapshot, por exemplo). Os ids precisam estar em ordem crescente.
+        observadores, self.observadores = self.observadores, []
+        self.limpar()
+        self.observadores = observadores
+        self.ids, self.datas, self.tipos, self.valores = ids, datas, tipos, valores
+        self.taxas, self.datas_inv, self.atualizados = taxas, datas_inv, atualizados
+        self._removidos = self.tipos.count(REMOVIDO)
+        for observador in self.observadores:
+            observador.limpo()
+
+    def proximo_id(self):  # Maior id existente + 1 (ou 1 se não houver lançamentos), sem percorrer todos os ids: eles estão em ordem crescente.
+        posicao = len(self.ids) - 1
+        while posicao >= 0 and self.tipos[posicao] == REMOVIDO:
+            posicao -= 1
+        return self.ids[posicao] + 1 if posicao >= 0 else 1
+
+    def _colunas(self):
+        return (self.ids, self.datas, self.tipos, self.valores, self.taxas, self.datas_inv, self.atualizados)
+
+    def registro(self, posicao):  # Valores crus do lançamento na posição.
+        return Registro(self.ids[posicao], self.datas[posicao], self.tipos[posicao], self.valores[posicao],
+                        self.taxas[posicao], self.datas_inv[posicao], self.atualizados[posicao])
+
+    def registro_por_id(self, id_):
+        return self.registro(self._posicao(id_))
+
+    def _avisa(self, antes, depois):
+        for observador in self.observadores:
+            observador.alterado(antes, depois)
+
+    def _avisa_lote(self, mudancas):
+        for observador in self.observadores:
+            alterados = getattr(observador, "alterados", None)
+            if alterados is not None:
+                alterados(mudancas)
+            else:
+                for antes, depois in mudancas:
+                    observador.alterado(antes, depois)
+
+    # ---- localização de um id ----
+
+    def _procura(self, id_):  # Retorna a posição onde o id está (ou deveria estar) na coluna 'ids'.
+        return bisect.bisect_left(self.ids, id_)
+
+    def _posicao(self, id_):  # Retorna a posição de um id existente, ou KeyError.
+        posicao = self._procura(id_)
+        if posicao < len(self.ids) and self.ids[posicao] == id_ and self.tipos[posicao] != REMOVIDO:
+            return posicao
+        raise KeyError(id_)
+
+    # ---- leitura e escrita de campos ----
+
+    def _ler_campo(self, posicao, campo):  # Retorna o valor do campo no formato antigo (datas como string) ou None se o campo estiver vazio.
+        if campo == "data":
+            return ordinal_para_data(self.datas[posicao])
+        if campo == "tipo":
+            return TIPOS[self.tipos[posicao]]
+        if campo == "valor":
+            return centavos_para_reais(self.valores[posicao])
+        if campo == "taxa_de_juros":
+            taxa = self.taxas[posicao]
+            return None if taxa == SEM_VALOR else inteiro_para_taxa(taxa)
+        if campo == "data_investimento":
+            ordinal = self.datas_inv[posicao]
+            return None if ordinal == SEM_DATA else ordinal_para_data(ordinal)
+        if campo == "investimento_atualizado":
+            atualizado = self.atualizados[posicao]
+            return None if atualizado == SEM_VALOR else centavos_para_reais(atualizado)
+        return None
+
+    def _gravar_campo(self, posicao, campo, valor):
+        antes = self.registro(posicao) if self.observadores else None
+        self._gravar_campo_sem_aviso(posicao, campo, valor)
+        if self.observadores:
+            self._avisa(antes, self.registro(posicao))
+
+    def _gravar_campo_sem_aviso(self, posicao, campo, valor):
+        if campo == "data":
+            self.datas[posicao] = data_para_ordinal(valor)
+        elif campo == "tipo":
+            if valor not in CODIGO_TIPO:
+                raise ValueError(f"Tipo de lançamento inválido: {valor!r}")
+            self.tipos[posicao] = CODIGO_TIPO[valor]
+        elif campo == "valor":
+            self.valores[posicao] = reais_para_centavos(valor)
+        elif campo == "taxa_de_juros":
+            self.taxas[posicao] = SEM_VALOR if _vazio(valor) else taxa_para_inteiro(valor)
+        elif campo == "data_investimento":
+            self.datas_inv[posicao] = SEM_DATA if _vazio(valor) else data_para_ordinal(valor)
+        elif campo == "investimento_atualizado":
+            self.atualizados[posicao] = SEM_VALOR if _vazio(valor) else reais_para_centavos(valor)
+        else:
+            raise KeyError(f"Campo desconhecido: {campo!r}")
+
+    @staticmethod
+    def _converte(lancamento):  # Converte um dict de lançamento (com strings ou números) para a tupla de valores das colunas.
+        tipo = lancamento["tipo"]
+        if tipo not in CODIGO_TIPO:
+            raise ValueError(f"Tipo de lançamento inválido: {tipo!r}")
+        taxa = lancamento.get("taxa_de_juros")
+        data_inv = lancamento.get("data_investimento")
+        atualizado = lancamento.get("investimento_atualizado")
+        return (
+            data_para_ordinal(lancamento["data"]),
+            CODIGO_TIPO[tipo],
+            reais_para_centavos(lancamento["valor"]),
+            SEM_VALOR if _vazio(taxa) else taxa_para_inteiro(taxa),
+            SEM_DATA if _vazio(data_inv) else data_para_ordinal(data_inv),
+            SEM_VALOR if _vazio(atualizado) else reais_para_centavos(atualizado),
+        )
+
+    # ---- interface de dict ----
+
+    def __getitem__(self, id_):
+        return LancamentoView(self, id_, self._posicao(id_))
+
+    def __setitem__(self, id_, lancamento):
+        if isinstance(lancamento, LancamentoView) and lancamento._colunas is self and lancamento._id == id_:
+            return  # lancamentos[id] = lancamentos[id], nada a fazer.
+        self.gravar_valores(id_, self._converte(lancamento))
+
+    def gravar_valores(self, id_, valores):  # Inclui ou substitui o lançamento 'id_' a partir dos valores crus das colunas (data, tipo, valor, taxa, data_inv, atualizado).
+        posicao = self._procura(id_)
+        antes = None
+        if posicao < len(self.ids) and self.ids[posicao] == id_:  # O id já tem uma posição (existente ou removida), reaproveita.
+            if self.tipos[posicao] == REMOVIDO:
+                self._removidos -= 1
+            elif self.observadores:
+                antes = self.registro(posicao)
+            self._grava_posicao(posicao, valores)
+        elif posicao == len(self.ids):  # Caso comum: id maior que todos, só acrescenta no fim.
+            self.ids.append(id_)
+            for coluna, valor in zip(self._colunas()[1:], valores):
+                coluna.append(valor)
+        else:  # Id no meio da sequência, insere mantendo a ordem.
+            self._geracao += 1
+            self.ids.insert(posicao, id_)
+            for coluna, valor in zip(self._colunas()[1:], valores):
+                coluna.insert(posicao, valor)
+        if self.observadores:
+            self._avisa(antes, Registro(id_, *valores))
+
+    def _grava_posicao(self, posicao, valores):
+        for coluna, valor in zip(self._colunas()[1:], valores):
+            coluna[posicao] = valor
+
+    def __delitem__(self, id_):
+        posicao = self._posicao(id_)
+        if self.observadores:
+            self._avisa(self.registro(posicao), None)
+        self.tipos[posicao] = REMOVIDO  # Só marca como removido, a compactação tira as posições de uma vez.
+        self._removidos += 1
+        if self._removidos > 1024 and self._removidos * 2 > len(self.ids):
+            self.compactar()
+
+    def compactar(self):  # Remove das colunas as posições marcadas como removidas.
+        if not self._removidos:
+            return
+        vivos = [posicao for posicao, tipo in enumerate(self.tipos) if tipo != REMOVIDO]
+        colunas = self._colunas()
+        observadores, self.observadores = self.observadores, []  # Compactar não muda nenhum lançamento, os observadores não precisam saber.
+        self.limpar()
+        self.observadores = observadores
+        for nova, antiga in zip(self._colunas(), colunas):
+            nova.extend(antiga[posicao] for posicao in vivos)
+
+    def __iter__(self):
+        for id_, tipo in zip(self.ids, self.tipos):
+            if tipo != REMOVIDO:
+                yield id_
+
+    def __len__(self):
+        return len(self.ids) - self._removidos
+
+    def __contains__(self, id_):
+        posicao = self._procura(id_)
+        return posicao < len(self.ids) and self.ids[posicao] == id_ and self.tipos[posicao] != REMOVIDO
+
+    def items(self):  # Mais rápido que o items() padrão do MutableMapping, não faz a bisseção para cada id.
+        for posicao, (id_, tipo) in enumerate(zip(self.ids, self.tipos)):
+            if tipo != REMOVIDO:
+                yield id_, LancamentoView(self, id_, posicao)
+
+    def values(self):
+        for _, lancamento in self.items():
+            yield lancamento
+
+    def clear(self):
+        self.limpar()
+
+    def gravar_em_lote(self, alteracoes):  # Aplica de uma vez uma lista de (id, valores crus) em lançamentos existentes; valores None exclui o lançamento.
+        # Confere todos os ids antes de gravar (KeyError sem mudar nada) e avisa os observadores uma vez só, com todas as mudanças
+        # (ver alterados): o diário guarda a operação inteira como uma unidade. Retorna quantos lançamentos mudaram.
+        posicoes = [self._posicao(id_) for id_, _ in alteracoes]
+        mudancas = []
+        for posicao, (id_, valores) in zip(posicoes, alteracoes):
+            antes = self.registro(posicao)
+            if valores is None:
+                self.tipos[posicao] = REMOVIDO
+                self._removidos += 1
+                mudancas.append((antes, None))
+            else:
+                self._grava_posicao(posicao, valores)
+                mudancas.append((antes, Registro(id_, *valores)))
+        if self.observadores and mudancas:
+            self._avisa_lote(mudancas)
+        if self._removidos > 1024 and self._removidos * 2 > len(self.ids):
+            self.compactar()
+        return len(mudancas)
+
+    def incluir_em_lote(self, inclusoes):  # Inclui de uma vez uma lista de (id, valores crus) de lançamentos novos, com ids crescentes e maiores que os existentes.
+        # Os ids novos vão para o fim das colunas (extend, sem bisseção nem inserção no meio) e os observadores são avisados uma vez só,
+        # como no gravar_em_lote. Retorna quantos lançamentos entraram.
+        if not inclusoes:
+            return 0
+        if self.ids and inclusoes[0][0] <= self.ids[-1]:
+            self.compactar()  # Os ids do fim podem ser só de lançamentos removidos (proximo_id não conta com eles).
+            if self.ids and inclusoes[0][0] <= self.ids[-1]:
+                raise ValueError(f"O id {inclusoes[0][0]} não é maior que os ids existentes.")
+        ids = [id_ for id_, _ in inclusoes]
+        if any(anterior >= seguinte for anterior, seguinte in zip(ids, ids[1:])):
+            raise ValueError("Os ids incluídos em lote precisam estar em ordem crescente.")
+        self.ids.extend(ids)
+        for coluna, valores in zip(self._colunas()[1:], zip(*(valores for _, valores in inclusoes))):
+            coluna.extend(valores)
+        if self.observadores:
+            self._avisa_lote([(None, Registro(id_, *valores)) for id_, valores in inclusoes])
+        return len(inclusoes)
+
+    def registros_por_ids(self, ids):  # Registro de cada id (existente), na ordem dada.
+        return [self.registro(self._posicao(id_)) for id_ in ids]
+
+    def gravar_atualizados(self, posicoes, montantes):  # Grava vários valores de 'investimento_atualizado' de uma vez, avisando os observadores.
+        atualizados = self.atualizados
+        if not self.observadores:
+            for posicao, montante in zip(posicoes, montantes):
+                atualizados[posicao] = montante
+            return
+        for posicao, montante in zip(posicoes, montantes):
+            antes = self.registro(posicao)
+            atualizados[posicao] = montante
+            self._avisa(antes, antes._replace(atualizado=montante))
+
+    # ---- leitura rápida por linha, sem criar views ----
+
+    def linhas(self):  # Gera tuplas (id, data, tipo, valor, taxa, data_inv, atualizado) com os valores crus das colunas, para varreduras rápidas.
+        for linha in zip(*self._colunas()):
+            if linha[2] != REMOVIDO:
+                yield linha
+
+    def registros_em_blocos(self, tamanho=65536, data_inicial=None, data_final=None, tipo=None):  # Gera listas de até 'tamanho' tuplas na ordem de Registro, em ordem de id.
+        # Só lê uma fatia das colunas por vez, então serve para varrer (e exportar) tudo ou só um período/tipo sem montar a seleção inteira.
+        # data_inicial e data_final são ordinais (inclusivos) e tipo é o código; None não filtra.
+        minimo = -1 if data_inicial is None else data_inicial
+        maximo = 2**31 if data_final is None else data_final
+        colunas = self._colunas()
+        for inicio in range(0, len(self.ids), tamanho):
+            fatias = [coluna[inicio:inicio + tamanho] for coluna in colunas]
+            bloco = [linha for linha in zip(*fatias)
+                     if linha[2] != REMOVIDO and minimo <= linha[1] <= maximo and (tipo is None or linha[2] == tipo)]
+            if bloco:
+                yield bloco
+
+    def memoria_em_bytes(self):  # Tamanho ocupado pelos dados das colunas.
+        return sum(coluna.itemsize * len(coluna) for coluna in self._colunas())
@@ -0,0 +1,112 @@
+import atexit
+import sys
+import threading
+import time
+
+
+# Salvamento automático numa thread, sem travar o menu. Observa o armazenamento colunar (como o diário) e salva o diário quando:
+#   - passaram 'espera' segundos sem nenhuma alteração nova (uma rajada de alterações vira um salvamento só), ou
+#   - a alteração mais antiga ainda não salva tem 'intervalo' segundos (mesmo com o usuário alterando sem parar), ou
+#   - juntou 'limite_alteracoes' alterações.
+# O diário já guarda os ids alterados e os valores de cada um (ver diario.py), então a thread só grava essas linhas no fim do
+# diário, com fsync, sem ler as colunas. A compactação (que reescreve o registros.csv num temporário e troca com os.replace) continua
+# sendo feita pela thread do menu, em 'SALVAR', 'COMPACTAR' e na saída. Ao sair, encerrar() para a thread e salva o que faltou.
+INTERVALO = 5.0
+ESPERA = 1.0
+LIMITE_ALTERACOES = 1000
+
+
+class Autosalvamento:
+    def __init__(self, lancamentos, diario, intervalo=INTERVALO, espera=ESPERA, limite_alteracoes=LIMITE_ALTERACOES):
+        self.lancamentos = lancamentos
+        self.diario = diario
+        self.intervalo = intervalo
+        self.espera = min(espera, intervalo)
+        self.limite_alteracoes = limite_alteracoes
+        self.salvamentos = 0  # Quantas vezes a thread salvou.
+        self.gravadas = 0  # Quantas linhas a thread gravou no diário.
+        self.erro = None  # Último erro de gravação; a thread tenta de novo na próxima alteração.
+        self._condicao = threading.Condition()
+        self._alteracoes = 0  # Alterações desde o último salvamento.
+        self._primeira = 0.0  # Quando (time.monotonic) foi a alteração mais antiga ainda não salva.
+        self._ultima = 0.0  # Quando foi a alteração mais recente.
+        self._parar = False
+        self._thread = None
+
+    def iniciar(self):  # Começa a observar os lançamentos e sobe a thread. Chamar depois da carga, para a carga não contar como alteração.
+        self.lancamentos.observadores.append(self)
+        self._thread = threading.Thread(target=self._executa, name="autosalvamento", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)  # Também salva se o programa sair por exceção (Ctrl+C, por exemplo).
+        return self
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):
+        with self._condicao:
+            agora = time.monotonic()
+            if not self._alteracoes:
+                self._primeira = agora
+                self._condicao.notify()  # Acorda a thread para ela começar a contar o tempo.
+            self._alteracoes += 1
+            self._ultima = agora
+            if self._alteracoes == self.limite_alteracoes:
+                self._condicao.notify()
+
+    def alterados(self, mudancas):  # Alteração em lote: conta todas de uma vez, e o diário já as recebeu juntas (vão para o mesmo salvamento).
+        with self._condicao:
+            agora = time.monotonic()
+            if not self._alteracoes:
+                self._primeira = agora
+            self._alteracoes += len(mudancas)
+            self._ultima = agora
+            self._condicao.notify()
+
+    def limpo(self):  # Lançamentos zerados ou recarregados: o diário vai ser reescrito inteiro no próximo salvamento do menu.
+        pass
+
+    # ---- thread ----
+
+    def _executa(self):
+        with self._condicao:
+            while True:
+                while not self._alteracoes and not self._parar:
+                    self._condicao.wait()
+                if self._parar:
+                    return
+                prazo = min(self._ultima + self.espera, self._primeira + self.intervalo)
+                agora = time.monotonic()
+                if self._alteracoes < self.limite_alteracoes and agora < prazo:
+                    self._condicao.wait(prazo - agora)
+                    continue
+                self._alteracoes = 0
+                self._condicao.release()  # Grava fora da trava, para o menu continuar alterando enquanto isso.
+                try:
+                    self._salva()
+                finally:
+                    self._condicao.acquire()
+
+    def _salva(self):
+        try:
+            gravadas = self.diario.salvar(compactar_se_preciso=False)
+        except OSError as erro:  # Disco cheio, arquivo travado...: o diário devolveu as alterações para 'pendentes', nada se perde.
+            self.erro = erro
+            print(f"\nAtenção: salvamento automático falhou ({erro}).", file=sys.stderr)
+            return
+        self.erro = None
+        if gravadas:
+            self.salvamentos += 1
+            self.gravadas += gravadas
+
+    def encerrar(self):  # Para a thread e salva o que faltou (compactando o diário se ele ficou grande). Pode ser chamada mais de uma vez.
+        if self._thread is None:
+            return
+        with self._condicao:
+            self._parar = True
+            self._condicao.notify()
+        self._thread.join()
+        self._thread = None
+        self.lancamentos.observadores.remove(self)
+        atexit.unregister(self.encerrar)
+        self.diario.salvar()
+        self.diario.aguardar()
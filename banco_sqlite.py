@@ -0,0 +1,420 @@
+import argparse
+import csv
+import datetime
+import os
+import sqlite3
+import sys
+from collections.abc import MutableMapping, Sequence
+from decimal import ROUND_CEILING, ROUND_FLOOR
+from functools import lru_cache
+
+from agregados import totais_em_reais
+from armazenamento import (CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, LancamentosColunares, Registro, centavos_para_reais, inteiro_para_taxa,
+                           ordinal_para_data, reais_para_centavos, taxa_para_inteiro)
+from diario import COLUNAS, linha_csv
+from filtros import monta
+from rendimento import taxa_mensal_para_diaria
+
+
+# Armazenamento opcional dos lançamentos num banco SQLite (sqlite3, da biblioteca padrão), para livros-caixa grandes demais para a memória.
+# Para usar, rode o programa com ECOBALANCE_SQLITE=registros.db; sem essa variável o padrão continua sendo o registros.csv.
+# O banco faz sozinho o papel das quatro estruturas do main.py: é o 'lancamentos' (mesma interface de dict do armazenamento colunar),
+# os 'indices' (filtros por data, tipo e valor e os filtros compostos viram consultas SQL sobre índices do banco), o 'resultado_mensal' (GROUP BY por mês)
+# e o 'diario' (salvar é um COMMIT; o que não foi salvo se perde ao sair, igual ao CSV).
+# As colunas guardam os mesmos valores do armazenamento colunar: datas como ordinal do dia, tipo como código, valores em centavos e
+# taxa em ponto fixo (INTEGER, as somas do SQLite também ficam exatas); campos vazios ficam NULL.
+# Um banco criado antes dos centavos (valor, taxa e atualizado REAL, em reais) é convertido na primeira abertura (ver _migra_para_inteiros).
+#
+# Migração entre os dois formatos:
+#   python banco_sqlite.py importar registros.csv registros.db
+#   python banco_sqlite.py exportar registros.db registros.csv
+# O índice por data também cobre tipo, valor e investimento_atualizado, assim o resultado mensal é respondido só pelo índice, sem ler a tabela.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lancamentos (
+    id INTEGER PRIMARY KEY,
+    data INTEGER NOT NULL,
+    tipo INTEGER NOT NULL,
+    valor INTEGER NOT NULL,
+    taxa_de_juros INTEGER,
+    data_investimento INTEGER,
+    investimento_atualizado INTEGER
+);
+CREATE INDEX IF NOT EXISTS lancamentos_data ON lancamentos (data, tipo, valor, investimento_atualizado);
+CREATE INDEX IF NOT EXISTS lancamentos_tipo ON lancamentos (tipo);
+CREATE INDEX IF NOT EXISTS lancamentos_valor ON lancamentos (valor);
+CREATE INDEX IF NOT EXISTS lancamentos_taxa ON lancamentos (taxa_de_juros) WHERE taxa_de_juros IS NOT NULL;
+CREATE INDEX IF NOT EXISTS lancamentos_data_investimento ON lancamentos (data_investimento) WHERE data_investimento IS NOT NULL;
+"""
+JULIANO_DO_ORDINAL = 1721424.5  # ordinal + JULIANO_DO_ORDINAL é o dia juliano que as funções de data do SQLite entendem.
+INVESTIMENTO = CODIGO_TIPO["Investimento"]
+TAMANHO_LOTE = 10_000  # Linhas por executemany na migração.
+INDICES = ("lancamentos_data", "lancamentos_tipo", "lancamentos_valor", "lancamentos_taxa", "lancamentos_data_investimento")
+
+
+def _para_banco(valores):  # Converte os valores crus das colunas (data, tipo, valor, taxa, data_inv, atualizado) para a linha do banco, com NULL nos campos vazios.
+    data, tipo, valor, taxa, data_inv, atualizado = valores
+    return (data, tipo, valor, None if taxa == SEM_VALOR else taxa,
+            None if data_inv == SEM_DATA else data_inv, None if atualizado == SEM_VALOR else atualizado)
+
+
+def _registro(linha):  # Converte uma linha do banco (id primeiro) para o Registro do armazenamento colunar.
+    id_, data, tipo, valor, taxa, data_inv, atualizado = linha
+    return Registro(id_, data, tipo, valor, SEM_VALOR if taxa is None else taxa,
+                    SEM_DATA if data_inv is None else data_inv, SEM_VALOR if atualizado is None else atualizado)
+
+
+def _lancamento(linha):  # Converte uma linha do banco para o dict de um lançamento, no mesmo formato da LancamentoView (campos vazios não aparecem).
+    _, data, tipo, valor, taxa, data_inv, atualizado = linha
+    lancamento = {"data": ordinal_para_data(data), "tipo": TIPOS[tipo], "valor": centavos_para_reais(valor)}
+    if taxa is not None:
+        lancamento["taxa_de_juros"] = inteiro_para_taxa(taxa)
+    if data_inv is not None:
+        lancamento["data_investimento"] = ordinal_para_data(data_inv)
+    if atualizado is not None:
+        lancamento["investimento_atualizado"] = centavos_para_reais(atualizado)
+    return lancamento
+
+
+@lru_cache(maxsize=65536)
+def _fator(taxa, dias):  # Mesmo fator de correção de rendimento.calcular_montantes, calculado uma vez por par (taxa, dias).
+    return (1 + (taxa_mensal_para_diaria(inteiro_para_taxa(taxa)) / 100)) ** dias
+
+
+def _montante(valor, taxa, dias):  # Função SQL usada na revalorização: mesma conta e arredondamento (para o centavo) da versão em memória.
+    return round(valor * _fator(taxa, dias))
+
+
+def _migra_para_inteiros(conexao):  # Reescreve um banco com valor, taxa e atualizado REAL (reais e porcentagem) com os inteiros atuais.
+    # A afinidade REAL das colunas antigas voltaria os inteiros para float, então a tabela é recriada com o ESQUEMA novo.
+    # A conversão é a mesma da carga do CSV (reais_para_centavos), feita em Python para arredondar igual.
+    conexao.execute("BEGIN")  # Tudo numa transação só: se algo falhar, o banco continua como estava.
+    try:
+        for indice in INDICES:  # Os índices iriam junto com a tabela renomeada e impediriam criar os da tabela nova.
+            conexao.execute(f"DROP INDEX IF EXISTS {indice}")
+        conexao.execute("ALTER TABLE lancamentos RENAME TO lancamentos_em_reais")
+        for comando in ESQUEMA.split(";"):  # executescript confirmaria a transação antes de rodar.
+            if comando.strip():
+                conexao.execute(comando)
+        cursor = conexao.execute("SELECT * FROM lancamentos_em_reais")
+        while True:
+            linhas = cursor.fetchmany(TAMANHO_LOTE)
+            if not linhas:
+                break
+            conexao.executemany("INSERT INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                (id_, data, tipo, reais_para_centavos(valor), None if taxa is None else taxa_para_inteiro(taxa),
+                 data_inv, None if atualizado is None else reais_para_centavos(atualizado))
+                for id_, data, tipo, valor, taxa, data_inv, atualizado in linhas])
+        conexao.execute("DROP TABLE lancamentos_em_reais")
+        conexao.commit()
+    except BaseException:
+        conexao.rollback()
+        raise
+
+
+class IdsDoBanco(Sequence):  # Sequência dos ids em ordem crescente, lida do banco em blocos, para a paginação (ver paginacao.py) não carregar todos os ids.
+    TAMANHO_BLOCO = 256
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self._inicio = 0
+        self._bloco = []
+
+    def __len__(self):
+        return self.conexao.execute("SELECT COUNT(*) FROM lancamentos").fetchone()[0]
+
+    def __getitem__(self, posicao):
+        if not self._inicio <= posicao < self._inicio + len(self._bloco):
+            self._inicio = max(0, posicao - self.TAMANHO_BLOCO // 2)  # O bloco fica em volta da posição, assim voltar uma página também cai nele.
+            self._bloco = [id_ for (id_,) in self.conexao.execute(
+                "SELECT id FROM lancamentos ORDER BY id LIMIT ? OFFSET ?", (self.TAMANHO_BLOCO, self._inicio))]
+            if not self._inicio <= posicao < self._inicio + len(self._bloco):
+                raise IndexError(posicao)
+        return self._bloco[posicao - self._inicio]
+
+
+class BancoSQLite(MutableMapping):  # Lançamentos guardados num banco SQLite, com a mesma interface usada pelo main.py no armazenamento colunar, nos índices, nos totais mensais e no diário.
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho)
+        tipos = {nome: tipo for _, nome, tipo, *_ in self.conexao.execute("PRAGMA table_info(lancamentos)")}
+        if tipos.get("valor") == "REAL":
+            _migra_para_inteiros(self.conexao)
+        self.conexao.executescript(ESQUEMA)
+        self.conexao.create_function("montante", 3, _montante, deterministic=True)
+        self._salvas = self.conexao.total_changes
+
+    # ---- interface de dict (papel do 'lancamentos') ----
+
+    def __getitem__(self, id_):
+        linha = self.conexao.execute("SELECT * FROM lancamentos WHERE id = ?", (id_,)).fetchone()
+        if linha is None:
+            raise KeyError(id_)
+        return _lancamento(linha)
+
+    def __setitem__(self, id_, lancamento):
+        self.gravar_valores(id_, LancamentosColunares._converte(lancamento))
+
+    def __delitem__(self, id_):
+        if self.conexao.execute("DELETE FROM lancamentos WHERE id = ?", (id_,)).rowcount == 0:
+            raise KeyError(id_)
+
+    def __iter__(self):
+        for (id_,) in self.conexao.execute("SELECT id FROM lancamentos ORDER BY id"):
+            yield id_
+
+    def __len__(self):
+        return self.conexao.execute("SELECT COUNT(*) FROM lancamentos").fetchone()[0]
+
+    def __contains__(self, id_):
+        return self.conexao.execute("SELECT 1 FROM lancamentos WHERE id = ?", (id_,)).fetchone() is not None
+
+    def items(self):  # Uma consulta só, em vez de uma por id.
+        for linha in self.conexao.execute("SELECT * FROM lancamentos ORDER BY id"):
+            yield linha[0], _lancamento(linha)
+
+    def values(self):
+        for _, lancamento in self.items():
+            yield lancamento
+
+    def gravar_valores(self, id_, valores):  # Inclui ou substitui o lançamento 'id_' a partir dos valores crus das colunas, como LancamentosColunares.gravar_valores.
+        self.conexao.execute("INSERT OR REPLACE INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)", (id_, *_para_banco(valores)))
+
+    def registro_por_id(self, id_):
+        linha = self.conexao.execute("SELECT * FROM lancamentos WHERE id = ?", (id_,)).fetchone()
+        if linha is None:
+            raise KeyError(id_)
+        return _registro(linha)
+
+    def registros_por_ids(self, ids):  # Registro de cada id, na ordem dada, lidos em poucas consultas. KeyError se algum não existir.
+        registros = {}
+        ids = list(ids)
+        for inicio in range(0, len(ids), 500):
+            parte = ids[inicio:inicio + 500]
+            consulta = f"SELECT * FROM lancamentos WHERE id IN ({', '.join('?' * len(parte))})"
+            registros.update((linha[0], _registro(linha)) for linha in self.conexao.execute(consulta, parte))
+        return [registros[id_] for id_ in ids]
+
+    def gravar_em_lote(self, alteracoes):  # Mesma interface de LancamentosColunares.gravar_em_lote, num SAVEPOINT: ou grava tudo ou nada.
+        # Como o resto, só fica definitivo no próximo salvamento (COMMIT).
+        ids = [id_ for id_, _ in alteracoes]
+        self.registros_por_ids(ids)  # KeyError antes de mudar qualquer coisa.
+        if not self.conexao.in_transaction:  # Sem transação aberta o RELEASE confirmaria na hora, em vez de esperar o salvamento.
+            self.conexao.execute("BEGIN")
+        self.conexao.execute("SAVEPOINT lote")
+        try:
+            self.conexao.executemany("DELETE FROM lancamentos WHERE id = ?", [(id_,) for id_, valores in alteracoes if valores is None])
+            self.conexao.executemany("INSERT OR REPLACE INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     [(id_, *_para_banco(valores)) for id_, valores in alteracoes if valores is not None])
+        except BaseException:
+            self.conexao.execute("ROLLBACK TO lote")
+            raise
+        finally:
+            self.conexao.execute("RELEASE lote")
+        return len(alteracoes)
+
+    def incluir_em_lote(self, inclusoes):  # Mesma interface de LancamentosColunares.incluir_em_lote, num SAVEPOINT: ou inclui tudo ou nada.
+        if not inclusoes:
+            return 0
+        if inclusoes[0][0] < self.proximo_id():
+            raise ValueError(f"O id {inclusoes[0][0]} não é maior que os ids existentes.")
+        if not self.conexao.in_transaction:
+            self.conexao.execute("BEGIN")
+        self.conexao.execute("SAVEPOINT lote")
+        try:
+            self.conexao.executemany("INSERT INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     [(id_, *_para_banco(valores)) for id_, valores in inclusoes])
+        except BaseException:
+            self.conexao.execute("ROLLBACK TO lote")
+            raise
+        finally:
+            self.conexao.execute("RELEASE lote")
+        return len(inclusoes)
+
+    @property
+    def versao(self):  # Muda a cada linha incluída, alterada ou excluída (faz o papel do cache.VersaoDoLivro).
+        return self.conexao.total_changes
+
+    def proximo_id(self):
+        return self.conexao.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM lancamentos").fetchone()[0]
+
+    def registros_em_blocos(self, tamanho=65536, data_inicial=None, data_final=None, tipo=None):  # Mesma interface de LancamentosColunares.registros_em_blocos, lendo o banco aos poucos (fetchmany).
+        condicoes, parametros = [], []
+        if data_inicial is not None:
+            condicoes.append("data >= ?")
+            parametros.append(data_inicial)
+        if data_final is not None:
+            condicoes.append("data <= ?")
+            parametros.append(data_final)
+        if tipo is not None:
+            condicoes.append("tipo = ?")
+            parametros.append(tipo)
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        cursor = self.conexao.execute(f"SELECT * FROM lancamentos {onde} ORDER BY id", parametros)
+        while True:
+            linhas = cursor.fetchmany(tamanho)
+            if not linhas:
+                return
+            yield [tuple(_registro(linha)) for linha in linhas]
+
+    def sequencia_de_ids(self):  # Ids em ordem crescente, lidos sob demanda (usado pela paginação).
+        return IdsDoBanco(self.conexao)
+
+    # ---- filtros (papel dos 'indices') ----
+
+    def ids_por_data(self, ordinal):
+        return [id_ for (id_,) in self.conexao.execute("SELECT id FROM lancamentos WHERE data = ? ORDER BY id", (ordinal,))]
+
+    def ids_por_tipo(self, codigo):
+        return [id_ for (id_,) in self.conexao.execute("SELECT id FROM lancamentos WHERE tipo = ? ORDER BY id", (codigo,))]
+
+    def ids_por_faixa_de_valor(self, minimo, maximo):  # minimo e maximo em reais, como em IndiceLancamentos.ids_por_faixa_de_valor.
+        consulta = "SELECT id FROM lancamentos WHERE valor BETWEEN ? AND ? ORDER BY id"
+        limites = (reais_para_centavos(minimo, ROUND_CEILING), reais_para_centavos(maximo, ROUND_FLOOR))
+        return [id_ for (id_,) in self.conexao.execute(consulta, limites)]
+
+    def consulta(self, filtro):  # Mesma interface de IndiceLancamentos.consulta: o filtro composto vira um WHERE e o plano é o EXPLAIN QUERY PLAN do SQLite.
+        no = monta(filtro) if isinstance(filtro, dict) else filtro
+        condicao, parametros = no.sql() if no is not None else ("1", [])
+        consulta = f"SELECT id FROM lancamentos WHERE {condicao} ORDER BY id"
+        ids = [id_ for (id_,) in self.conexao.execute(consulta, parametros)]
+        linhas = [f"{len(ids)} resultados (o SQLite não informa quantas linhas examinou)"]
+        niveis = {0: -1}
+        for passo, pai, _, detalhe in self.conexao.execute("EXPLAIN QUERY PLAN " + consulta, parametros):
+            niveis[passo] = niveis.get(pai, -1) + 1
+            linhas.append("  " * niveis[passo] + detalhe)
+        return ids, linhas
+
+    # ---- totais mensais (papel do 'resultado_mensal') ----
+
+    def investimento_pendente(self):  # Data do investimento não atualizado de menor id, ou None, como AgregadoMensal.investimento_pendente.
+        linha = self.conexao.execute(
+            "SELECT data FROM lancamentos WHERE tipo = ? AND investimento_atualizado IS NULL ORDER BY id LIMIT 1", (INVESTIMENTO,)).fetchone()
+        return None if linha is None else ordinal_para_data(linha[0])
+
+    def resultados(self):  # Lista de (mês "mm/aaaa", receita, despesa, resultado), na mesma ordem do AgregadoMensal.
+        # Agrupa primeiro por data (poucas datas distintas) e só depois converte a data em mês.
+        consulta = f"""
+            SELECT strftime('%m/%Y', data + {JULIANO_DO_ORDINAL}) AS mes, SUM(receita), SUM(despesa)
+            FROM (SELECT data,
+                         COALESCE(SUM(CASE tipo WHEN ? THEN valor WHEN ? THEN investimento_atualizado - valor END), 0) AS receita,
+                         COALESCE(SUM(CASE tipo WHEN ? THEN valor END), 0) AS despesa
+                  FROM lancamentos GROUP BY data)
+            GROUP BY mes ORDER BY mes"""
+        # SUM (e não TOTAL, que sempre devolve float) soma os centavos como inteiros.
+        parametros = (CODIGO_TIPO["Receita"], INVESTIMENTO, CODIGO_TIPO["Despesa"])
+        return [(mes, centavos_para_reais(receita), centavos_para_reais(despesa), centavos_para_reais(receita + despesa))
+                for mes, receita, despesa in self.conexao.execute(consulta, parametros)]
+
+    def conferir(self):  # Os totais são calculados na hora a partir das linhas, não há o que divergir.
+        return []
+
+    # ---- totais por intervalo de datas (papel do 'totais_por_data', ver agregados.TotaisPorData) ----
+
+    def totais_entre(self, data_inicial=None, data_final=None):  # (receita, despesa, rendimento, quantidade) entre as duas datas, em reais.
+        return totais_em_reais(self.centavos_entre(data_inicial, data_final))
+
+    def centavos_entre(self, data_inicial=None, data_final=None):  # O mesmo em centavos, pelo índice de data (ver agregados.TotaisPorData.centavos_entre).
+        consulta = """
+            SELECT COALESCE(SUM(CASE tipo WHEN ? THEN valor END), 0), COALESCE(SUM(CASE tipo WHEN ? THEN valor END), 0),
+                   COALESCE(SUM(CASE tipo WHEN ? THEN investimento_atualizado - valor END), 0), COUNT(*)
+            FROM lancamentos WHERE data BETWEEN ? AND ?"""
+        parametros = (CODIGO_TIPO["Receita"], CODIGO_TIPO["Despesa"], INVESTIMENTO,
+                      -2**31 if data_inicial is None else data_inicial, 2**31 if data_final is None else data_final)
+        return self.conexao.execute(consulta, parametros).fetchone()
+
+    def limites(self):  # (primeiro, último) dia com lançamento, ou None se o banco estiver vazio.
+        primeiro, ultimo = self.conexao.execute("SELECT MIN(data), MAX(data) FROM lancamentos").fetchone()
+        return None if primeiro is None else (primeiro, ultimo)
+
+    def proximo_dia(self, dia):  # Primeiro dia com lançamento a partir de 'dia', ou None, pelo índice de data.
+        return self.conexao.execute("SELECT MIN(data) FROM lancamentos WHERE data >= ?", (dia,)).fetchone()[0]
+
+    # ---- rendimentos ----
+
+    def revalorizar(self, data_referencia=None):  # Recalcula o investimento_atualizado de todos os investimentos com um UPDATE só. Retorna quantos foram atualizados.
+        referencia = data_referencia or datetime.date.today()
+        cursor = self.conexao.execute(
+            """UPDATE lancamentos SET investimento_atualizado = montante(valor, taxa_de_juros, ? - data_investimento)
+               WHERE tipo = ? AND taxa_de_juros IS NOT NULL AND data_investimento IS NOT NULL""",
+            (referencia.toordinal(), INVESTIMENTO))
+        return cursor.rowcount
+
+    # ---- salvamento (papel do 'diario') ----
+
+    def carregar(self, carrega_base):  # Não há o que carregar, as consultas vão direto ao banco.
+        pass
+
+    def salvar(self, compactar_se_preciso=True):  # Confirma (COMMIT) as alterações desde o último salvamento. Retorna quantas foram.
+        self.conexao.commit()
+        gravadas = self.conexao.total_changes - self._salvas
+        self._salvas = self.conexao.total_changes
+        return gravadas
+
+    def alteracoes_pendentes(self):  # Linhas alteradas desde o último COMMIT.
+        return self.conexao.total_changes - self._salvas
+
+    def compactar(self, em_segundo_plano=False):  # Salva e reescreve o arquivo do banco sem o espaço livre (VACUUM).
+        self.salvar()
+        self.conexao.execute("VACUUM")
+
+    def aguardar(self):
+        pass
+
+
+def importar_csv(caminho_csv, caminho_banco):  # Copia um registros.csv para um banco SQLite (novo ou existente; ids iguais são substituídos). Retorna quantas linhas copiou.
+    if os.path.exists(caminho_csv + ".diario") and os.path.getsize(caminho_csv + ".diario"):
+        raise ValueError(f"{caminho_csv} tem alterações no diário: compacte (opção COMPACTAR do menu) antes de migrar.")
+    banco = BancoSQLite(caminho_banco)
+    copiadas = 0
+    with open(caminho_csv, mode="r", newline="", encoding="utf-8") as file:
+        lote = []
+        for row in csv.DictReader(file):  # Lê o CSV em fluxo, sem montar os lançamentos na memória.
+            id_ = int(row.pop("id"))
+            lote.append((id_, *_para_banco(LancamentosColunares._converte(row))))
+            if len(lote) == TAMANHO_LOTE:
+                banco.conexao.executemany("INSERT OR REPLACE INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+                copiadas += len(lote)
+                lote = []
+        banco.conexao.executemany("INSERT OR REPLACE INTO lancamentos VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+        copiadas += len(lote)
+    banco.salvar()
+    banco.conexao.close()
+    return copiadas
+
+
+def exportar_csv(caminho_banco, caminho_csv):  # Grava todo o banco num registros.csv, no mesmo formato da compactação. Retorna quantas linhas gravou.
+    conexao = sqlite3.connect(caminho_banco)
+    gravadas = 0
+    temporario = caminho_csv + ".tmp"
+    with open(temporario, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUNAS)
+        for linha in conexao.execute("SELECT * FROM lancamentos ORDER BY id"):
+            writer.writerow(linha_csv(_registro(linha)))
+            gravadas += 1
+        file.flush()
+        os.fsync(file.fileno())
+    conexao.close()
+    os.replace(temporario, caminho_csv)
+    return gravadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra os lançamentos do EcoBalance entre o registros.csv e um banco SQLite.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    importar = comandos.add_parser("importar", help="copia um registros.csv para um banco SQLite")
+    importar.add_argument("csv")
+    importar.add_argument("banco")
+    exportar = comandos.add_parser("exportar", help="grava um banco SQLite num registros.csv")
+    exportar.add_argument("banco")
+    exportar.add_argument("csv")
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "importar":
+        print(f"{importar_csv(argumentos.csv, argumentos.banco)} lançamentos copiados para {argumentos.banco}.")
+    else:
+        print(f"{exportar_csv(argumentos.banco, argumentos.csv)} lançamentos gravados em {argumentos.csv}.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
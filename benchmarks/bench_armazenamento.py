@@ -0,0 +1,77 @@
+# Compara o layout antigo (dict de dicts) com o armazenamento colunar: memória ocupada e tempo de varredura.
+# Uso: python benchmarks/bench_armazenamento.py [quantidade_de_linhas]
+import datetime
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import CODIGO_TIPO, LancamentosColunares  # noqa: E402
+
+
+def gera_linhas(quantidade, semente=42):  # Gera lançamentos sintéticos no formato que o csv.DictReader entrega.
+    aleatorio = random.Random(semente)
+    inicio = datetime.date(2020, 1, 1).toordinal()
+    for id_ in range(1, quantidade + 1):
+        data = datetime.date.fromordinal(inicio + aleatorio.randrange(1500)).strftime("%d/%m/%Y")
+        tipo = aleatorio.choice(("Receita", "Despesa", "Investimento"))
+        valor = round(aleatorio.uniform(1, 5000), 2)
+        linha = {"data": data, "tipo": tipo, "valor": -valor if tipo == "Despesa" else valor}
+        if tipo == "Investimento":
+            linha["taxa_de_juros"] = aleatorio.choice((0.5, 0.8, 1.0, 1.2))
+            linha["data_investimento"] = data
+        yield id_, linha
+
+
+def mede(construtor, quantidade):  # Retorna (estrutura, bytes alocados) ao montar a estrutura com 'quantidade' linhas.
+    tracemalloc.start()
+    estrutura = construtor(quantidade)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return estrutura, memoria
+
+
+def monta_dict(quantidade):
+    return {id_: linha for id_, linha in gera_linhas(quantidade)}
+
+
+def monta_colunar(quantidade):
+    colunar = LancamentosColunares()
+    for id_, linha in gera_linhas(quantidade):
+        colunar[id_] = linha
+    return colunar
+
+
+def cronometra(funcao, repeticoes=3):  # Melhor tempo entre as repetições, em segundos.
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    antigo, memoria_antigo = mede(monta_dict, quantidade)
+    colunar, memoria_colunar = mede(monta_colunar, quantidade)
+
+    receita = CODIGO_TIPO["Receita"]
+    soma_antigo = cronometra(lambda: sum(l["valor"] for l in antigo.values() if l["tipo"] == "Receita"))
+    soma_colunar = cronometra(lambda: sum(v for t, v in zip(colunar.tipos, colunar.valores) if t == receita))
+    soma_view = cronometra(lambda: sum(l["valor"] for l in colunar.values() if l["tipo"] == "Receita"), repeticoes=1)
+
+    print(f"Linhas: {quantidade}")
+    print(f"Memória dict de dicts:   {memoria_antigo / 2**20:9.1f} MiB ({memoria_antigo / quantidade:6.1f} bytes/linha)")
+    print(f"Memória colunar:         {memoria_colunar / 2**20:9.1f} MiB ({memoria_colunar / quantidade:6.1f} bytes/linha)")
+    print(f"Soma das receitas, dict de dicts:       {soma_antigo * 1000:9.1f} ms")
+    print(f"Soma das receitas, colunas:             {soma_colunar * 1000:9.1f} ms")
+    print(f"Soma das receitas, colunar via views:   {soma_view * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
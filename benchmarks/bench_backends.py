@@ -0,0 +1,91 @@
+# Compara os dois armazenamentos dos lançamentos: colunar em memória (padrão, com registros.csv) e banco SQLite (banco_sqlite.py).
+# Para cada tamanho gera o mesmo livro-caixa sintético, migra para o banco e mede as mesmas operações nos dois.
+#   python benchmarks/bench_backends.py 100000 1000000
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agregados import AgregadoMensal  # noqa: E402
+from armazenamento import CODIGO_TIPO, SEM_VALOR, LancamentosColunares, data_para_ordinal  # noqa: E402
+from banco_sqlite import BancoSQLite, exportar_csv, importar_csv  # noqa: E402
+from bench_menu import gera_livro  # noqa: E402
+from carga_paralela import carrega_em_paralelo  # noqa: E402
+from diario import Diario, grava_base  # noqa: E402
+from indices import IndiceLancamentos  # noqa: E402
+from rendimento import atualizar_em_lote  # noqa: E402
+
+INCLUSOES = 1000
+REFERENCIA = datetime.date(2025, 1, 1)
+
+
+def cronometra(funcao):  # Tempo de uma execução, em segundos.
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def mede_memoria(caminho_csv):  # Mede as operações no armazenamento colunar. Retorna dict nome -> segundos.
+    lancamentos = LancamentosColunares()
+    resultado_mensal = AgregadoMensal(lancamentos)
+    indices = IndiceLancamentos(lancamentos)
+    diario = Diario(lancamentos, caminho_csv)
+    tempos = {"carga": cronometra(lambda: carrega_em_paralelo(caminho_csv, lancamentos))}
+    tempos.update(mede_operacoes(lancamentos, indices, resultado_mensal, diario,
+                                 lambda: atualizar_em_lote(lancamentos, REFERENCIA),
+                                 lambda: grava_base(caminho_csv + ".exportado", lancamentos._colunas())))
+    return tempos
+
+
+def mede_sqlite(caminho_csv, caminho_banco):  # Mede as mesmas operações no banco SQLite. Retorna dict nome -> segundos.
+    tempos = {"carga": cronometra(lambda: importar_csv(caminho_csv, caminho_banco))}  # A "carga" do banco é a migração, feita uma vez só.
+    banco = BancoSQLite(caminho_banco)
+    tempos.update(mede_operacoes(banco, banco, banco, banco,
+                                 lambda: banco.revalorizar(REFERENCIA),
+                                 lambda: (banco.salvar(), exportar_csv(caminho_banco, caminho_csv + ".exportado"))))
+    banco.conexao.close()
+    return tempos
+
+
+def mede_operacoes(lancamentos, indices, resultado_mensal, diario, revaloriza, exporta):
+    tempos = {}
+    tempos["filtro_data"] = cronometra(lambda: indices.ids_por_data(data_para_ordinal("15/06/2022")))
+    tempos["filtro_tipo"] = cronometra(lambda: indices.ids_por_tipo(CODIGO_TIPO["Investimento"]))
+    tempos["filtro_valor"] = cronometra(lambda: indices.ids_por_faixa_de_valor(100.0, 150.0))
+    tempos["revalorizacao"] = cronometra(revaloriza)
+    tempos["resultado_mensal"] = cronometra(resultado_mensal.resultados)
+
+    def inclui():
+        for numero in range(INCLUSOES):
+            lancamentos.gravar_valores(lancamentos.proximo_id(), (data_para_ordinal("01/06/2024"), CODIGO_TIPO["Receita"], 1000 + 100 * numero,
+                                                                  SEM_VALOR, 0, SEM_VALOR))
+        diario.salvar(compactar_se_preciso=False)
+    tempos[f"inclusao_{INCLUSOES}"] = cronometra(inclui)
+    tempos["exportacao"] = cronometra(exporta)
+    return tempos
+
+
+def main():
+    tamanhos = [int(argumento) for argumento in sys.argv[1:]] or [100_000, 1_000_000]
+    for quantidade in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho_csv = os.path.join(pasta, "registros.csv")
+            gera_livro(caminho_csv, quantidade)
+            sqlite = mede_sqlite(caminho_csv, os.path.join(pasta, "registros.db"))  # Antes da memória, que deixa um diário ao lado do CSV.
+            memoria = mede_memoria(caminho_csv)
+            tamanho_banco = os.path.getsize(os.path.join(pasta, "registros.db")) / 2**20
+            tamanho_csv = os.path.getsize(caminho_csv) / 2**20
+
+        print(f"\n{quantidade} lançamentos (CSV {tamanho_csv:.1f} MiB, banco {tamanho_banco:.1f} MiB)")
+        print(f"  {'medida':<20} {'memória':>10} {'sqlite':>10}")
+        for nome in memoria:
+            print(f"  {nome:<20} {memoria[nome]:>9.4f}s {sqlite[nome]:>9.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Mede a carga a frio dos lançamentos: registros.csv pelo csv.DictReader (caminho antigo) contra o snapshot binário.
+# Uso: python benchmarks/bench_carga.py [quantidade_de_linhas ...]
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import LancamentosColunares  # noqa: E402
+from bench_armazenamento import gera_linhas  # noqa: E402
+from snapshot import carrega_snapshot, grava_snapshot  # noqa: E402
+
+COLUNAS = ["id", "data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado"]
+
+
+def gera_csv(caminho, quantidade):  # Grava um registros.csv sintético com 'quantidade' linhas.
+    with open(caminho, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUNAS)
+        writer.writeheader()
+        for id_, linha in gera_linhas(quantidade):
+            writer.writerow({"id": id_, **linha})
+
+
+def carrega_csv(caminho):  # Mesmo laço do carrega_de_arquivo do main.py.
+    lancamentos = LancamentosColunares()
+    with open(caminho, mode="r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            id_ = int(row.pop("id"))
+            lancamentos[id_] = row
+    return lancamentos
+
+
+def main():
+    quantidades = [int(argumento) for argumento in sys.argv[1:]] or [1_000_000]
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "registros.csv")
+        for quantidade in quantidades:
+            gera_csv(caminho, quantidade)
+
+            inicio = time.perf_counter()
+            lancamentos = carrega_csv(caminho)
+            tempo_csv = time.perf_counter() - inicio
+
+            grava_snapshot(caminho, lancamentos._colunas())
+            del lancamentos
+
+            inicio = time.perf_counter()
+            carregados = carrega_snapshot(caminho, LancamentosColunares())
+            tempo_snapshot = time.perf_counter() - inicio
+            assert len(carregados) == quantidade
+            del carregados
+
+            tamanho_csv = os.path.getsize(caminho) / 2**20
+            tamanho_snapshot = os.path.getsize(caminho + ".snapshot") / 2**20
+            print(f"{quantidade} linhas: CSV {tempo_csv:8.2f} s ({tamanho_csv:7.1f} MiB) | snapshot {tempo_snapshot:8.3f} s ({tamanho_snapshot:7.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compara as colunas de dinheiro em float (array('d'), como eram) com as colunas em centavos inteiros (array('q'), as atuais):
+# memória, tempo de soma, exatidão da soma e o custo de ler e escrever o texto do CSV.
+# Uso: python benchmarks/bench_centavos.py [quantidade_de_valores]
+import array
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import centavos_para_texto, reais_para_centavos  # noqa: E402
+
+
+def gera_textos(quantidade, semente=42):  # Valores como aparecem no registros.csv, com duas casas e despesas negativas.
+    aleatorio = random.Random(semente)
+    textos = []
+    for _ in range(quantidade):
+        centavos = int(aleatorio.lognormvariate(9, 1.5))
+        textos.append(centavos_para_texto(-centavos if aleatorio.random() < 0.5 else centavos))
+    return textos
+
+
+def cronometra(funcao, repeticoes=3):  # (melhor tempo em segundos, resultado da última execução).
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    textos = gera_textos(quantidade)
+
+    tempo_float, floats = cronometra(lambda: array.array("d", map(float, textos)))
+    tempo_centavos, centavos = cronometra(lambda: array.array("q", map(reais_para_centavos, textos)))
+
+    soma_float, total_float = cronometra(lambda: sum(floats))
+    soma_centavos, total_centavos = cronometra(lambda: sum(centavos))
+    invertida_float = sum(reversed(floats))  # A mesma soma em outra ordem (como a de um total mantido a cada edição).
+    invertida_centavos = sum(reversed(centavos))
+
+    escrita_float, _ = cronometra(lambda: [repr(valor) for valor in floats], repeticoes=1)
+    escrita_centavos, _ = cronometra(lambda: [centavos_para_texto(valor) for valor in centavos], repeticoes=1)
+    voltaram = sum(1 for texto, valor in zip(textos, floats) if repr(valor) != texto)
+
+    print(f"Valores: {quantidade}")
+    print(f"Memória float:     {floats.itemsize * len(floats) / 2**20:8.1f} MiB ({floats.itemsize} bytes/valor)")
+    print(f"Memória centavos:  {centavos.itemsize * len(centavos) / 2**20:8.1f} MiB ({centavos.itemsize} bytes/valor)")
+    print(f"Leitura do texto, float:      {tempo_float * 1000:9.1f} ms")
+    print(f"Leitura do texto, centavos:   {tempo_centavos * 1000:9.1f} ms")
+    print(f"Escrita do texto, float:      {escrita_float * 1000:9.1f} ms ({voltaram} textos diferentes do original, ex.: '12.30' volta '12.3')")
+    print(f"Escrita do texto, centavos:   {escrita_centavos * 1000:9.1f} ms")
+    print(f"Soma, float:                  {soma_float * 1000:9.1f} ms  total {total_float!r}, na ordem inversa {invertida_float!r}")
+    print(f"Soma, centavos:               {soma_centavos * 1000:9.1f} ms  total {centavos_para_texto(total_centavos)}, "
+          f"na ordem inversa {centavos_para_texto(invertida_centavos)}")
+    print(f"Erro da soma em float:        {abs(Decimal(total_float) * 100 - total_centavos):.2e} centavos")  # Decimal(float) é o valor exato do float.
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Mede a importação de extratos (importacao.py): linhas por segundo e pico de memória, com uma parte do extrato já no livro-caixa
+# (os duplicados que a importação precisa pular). O extrato é gerado em fluxo num arquivo temporário, nunca inteiro na memória.
+# Uso: python benchmarks/bench_importacao.py [--linhas 10000000] [--existentes 0.1] [--formato csv|csv.gz|jsonl|jsonl.gz]
+import argparse
+import csv
+import gzip
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import LancamentosColunares  # noqa: E402
+from bench_armazenamento import gera_linhas  # noqa: E402
+from importacao import FORMATOS, TAMANHO_LOTE, importa, normaliza  # noqa: E402
+
+COLUNAS = ["data", "tipo", "valor", "taxa_de_juros", "data_investimento"]
+
+
+def pico_memoria_mib():  # Pico de memória residente do processo até agora.
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 2**10  # No macOS vem em bytes, no Linux em KiB.
+
+
+def gera_extrato(caminho, formato, quantidade):  # Grava o extrato sintético linha a linha.
+    file = gzip.open(caminho, "wt", encoding="utf-8", newline="") if formato.endswith(".gz") else open(caminho, "w", encoding="utf-8", newline="")
+    with file:
+        if formato.startswith("csv"):
+            writer = csv.DictWriter(file, fieldnames=COLUNAS)
+            writer.writeheader()
+            for _, linha in gera_linhas(quantidade):
+                writer.writerow(linha)
+        else:
+            for _, linha in gera_linhas(quantidade):
+                file.write(json.dumps(linha) + "\n")
+
+
+def livro_com_existentes(quantidade):  # Livro-caixa com as primeiras 'quantidade' linhas do extrato (mesma semente), incluídas em lotes.
+    lancamentos = LancamentosColunares()
+    lote = []
+    for id_, linha in gera_linhas(quantidade):
+        lote.append((id_, normaliza(linha)))
+        if len(lote) >= TAMANHO_LOTE:
+            lancamentos.incluir_em_lote(lote)
+            lote = []
+    lancamentos.incluir_em_lote(lote)
+    return lancamentos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da importação de extratos do EcoBalance.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas do extrato (padrão: 1 milhão)")
+    parser.add_argument("--existentes", type=float, default=0.1, help="fração do extrato que já está no livro-caixa (padrão: 0.1)")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "extrato." + argumentos.formato)
+        inicio = time.perf_counter()
+        gera_extrato(caminho, argumentos.formato, argumentos.linhas)
+        print(f"Extrato: {argumentos.linhas} linhas, {os.path.getsize(caminho) / 2**20:.1f} MiB ({time.perf_counter() - inicio:.1f} s para gerar)")
+
+        lancamentos = livro_com_existentes(int(argumentos.linhas * argumentos.existentes))
+        antes = pico_memoria_mib()
+        print(f"Livro-caixa antes: {len(lancamentos)} lançamentos, pico de memória {antes:.0f} MiB")
+
+        resumo = importa(lancamentos, caminho, argumentos.formato)
+        depois = pico_memoria_mib()
+        colunas = lancamentos.memoria_em_bytes() / 2**20
+        print(f"Importadas {resumo['importadas']}, duplicadas {resumo['duplicadas']}, inválidas {resumo['invalidas']} "
+              f"em {resumo['segundos']:.1f} s ({resumo['linhas_por_segundo']:.0f} linhas por segundo)")
+        print(f"Pico de memória depois: {depois:.0f} MiB (+{depois - antes:.0f} MiB; as colunas do livro-caixa ocupam {colunas:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Suíte de benchmarks das operações do menu, sobre livros-caixa sintéticos e determinísticos.
+# Mede carga (CSV e snapshot), salvamento (diário e compactação), inclusão (criar_registro), cada filtro de filtrar_lancamentos,
+# atualizar_rendimento, calcular_resultado_mensal, exportação e renderização da tabela, além do pico de memória do processo.
+# Cada tamanho roda num processo separado, para o pico de memória de um não contaminar o outro.
+# O resultado vai para um arquivo JSON, que pode ser comparado com o de outra versão:
+#   python benchmarks/bench_menu.py --tamanhos 10000 1000000 10000000
+#   python benchmarks/bench_menu.py --comparar antes.json depois.json
+import argparse
+import builtins
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+TAMANHOS_PADRAO = (10_000, 1_000_000, 10_000_000)
+COLUNAS = ["id", "data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado"]
+INCLUSOES = 100  # Quantidade de criar_registro cronometrados em cada tamanho.
+
+
+def gera_livro(caminho, quantidade, semente=2024):  # Grava um registros.csv sintético: 45% receitas, 45% despesas, 10% investimentos, datas de 2019 a 2024.
+    aleatorio = random.Random(semente)
+    inicio = datetime.date(2019, 1, 1).toordinal()
+    dias = datetime.date(2024, 12, 31).toordinal() - inicio
+    taxas = (0.5, 0.65, 0.8, 0.9, 1.0, 1.1, 1.25)
+    with open(caminho, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUNAS)
+        for id_ in range(1, quantidade + 1):
+            data = datetime.date.fromordinal(inicio + aleatorio.randrange(dias)).strftime("%d/%m/%Y")
+            sorteio = aleatorio.random()
+            valor = round(aleatorio.lognormvariate(5, 1.2), 2)
+            if sorteio < 0.45:
+                writer.writerow([id_, data, "Receita", valor, "", "", ""])
+            elif sorteio < 0.90:
+                writer.writerow([id_, data, "Despesa", -valor, "", "", ""])
+            else:
+                writer.writerow([id_, data, "Investimento", valor, aleatorio.choice(taxas), data, ""])
+
+
+@contextlib.contextmanager
+def respostas(*entradas):  # Responde os input() das funções do menu com as entradas dadas, em ordem.
+    fila = list(entradas)
+    original = builtins.input
+    builtins.input = lambda prompt="": fila.pop(0)
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def pico_memoria_mib():  # Pico de memória residente do processo até agora.
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 2**10  # No macOS vem em bytes, no Linux em KiB.
+
+
+def roda_um_tamanho(quantidade, limite_renderizacao):  # Roda todas as medidas para um tamanho, dentro de uma pasta temporária. Retorna o dict de resultados.
+    import main
+
+    medidas = {}
+
+    def mede(nome, funcao, linhas=None, **extras):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcao()
+            segundos = time.perf_counter() - inicio
+        medidas[nome] = {"segundos": segundos, "pico_memoria_mib": pico_memoria_mib(), **extras}
+        if linhas:
+            medidas[nome]["linhas_por_segundo"] = linhas / segundos if segundos else None
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        gera_livro(main.nome_arquivo, quantidade)
+        renderiza = limite_renderizacao is None or quantidade <= limite_renderizacao
+
+        mede("carga_csv", main.checa_arquivo_csv, quantidade)
+        mede("compactacao", main.compacta_arquivo, quantidade)  # Reescreve o CSV inteiro e grava o snapshot.
+        mede("carga_snapshot", main.checa_arquivo_csv, quantidade)  # Agora o snapshot é mais novo que o CSV e substitui todas as colunas.
+
+        def inclui():
+            for numero in range(INCLUSOES):
+                main.criar_registro("Receita", 10.0 + numero, datetime.date(2024, 6, 1))
+        mede("inclusao", inclui, INCLUSOES, operacoes=INCLUSOES)
+        mede("salvamento_diario", main.salva_em_arquivo, INCLUSOES)
+
+        filtros = {
+            "filtro_data": ("1", "15/06/2022"),
+            "filtro_tipo": ("2", "Investimento"),
+            "filtro_valor": ("3", "100", "150"),
+        }
+        for nome, entradas in filtros.items():
+            if renderiza:
+                def filtra(entradas=entradas):
+                    with respostas(*entradas, "S"):  # "S" sai da paginação depois da primeira página.
+                        main.filtrar_lancamentos()
+                mede(nome, filtra)
+            else:  # Tabela grande demais para o tabulate: mede só a seleção, que é o que filtrar_lancamentos faz antes de renderizar.
+                consultas = {
+                    "filtro_data": lambda: main.indices.ids_por_data(main.data_para_ordinal("15/06/2022")),
+                    "filtro_tipo": lambda: main.indices.ids_por_tipo(main.CODIGO_TIPO["Investimento"]),
+                    "filtro_valor": lambda: main.indices.ids_por_faixa_de_valor(100.0, 150.0),
+                }
+                mede(nome, consultas[nome], sem_renderizacao=True)
+
+        mede("atualizar_rendimento", main.atualizar_rendimento, quantidade)
+        mede("resultado_mensal", main.calcular_resultado_mensal)
+        mede("exportacao", lambda: main.exportar_relatorio(main.lancamentos, "relatorio.csv"), quantidade)
+        if renderiza:
+            def renderiza_pagina():
+                with respostas("S"):
+                    main.listar_lancamentos()
+            mede("renderizacao", renderiza_pagina)
+        else:
+            medidas["renderizacao"] = {"pulado": f"mais de {limite_renderizacao} linhas"}
+        main.diario.aguardar()
+        os.chdir(RAIZ)
+
+    return {"linhas": quantidade, "pico_memoria_mib": pico_memoria_mib(), "medidas": medidas}
+
+
+def versao_do_codigo():  # Commit atual do git, para identificar a versão medida.
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compara(antes, depois):  # Mostra, para cada tamanho e medida, o tempo das duas execuções e a razão entre eles.
+    with open(antes, encoding="utf-8") as file:
+        a = json.load(file)
+    with open(depois, encoding="utf-8") as file:
+        b = json.load(file)
+    print(f"{'linhas':>10} {'medida':<22} {a['versao'] or 'antes':>12} {b['versao'] or 'depois':>12} {'razão':>8}")
+    por_linhas = {resultado["linhas"]: resultado for resultado in a["resultados"]}
+    for resultado in b["resultados"]:
+        anterior = por_linhas.get(resultado["linhas"])
+        if anterior is None:
+            continue
+        for nome, medida in resultado["medidas"].items():
+            velho = anterior["medidas"].get(nome, {}).get("segundos")
+            novo = medida.get("segundos")
+            if velho is None or novo is None:
+                continue
+            razao = velho / novo if novo else float("inf")
+            print(f"{resultado['linhas']:>10} {nome:<22} {velho:>11.4f}s {novo:>11.4f}s {razao:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks das operações do EcoBalance sobre livros-caixa sintéticos.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO), help="quantidades de lançamentos a medir")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (padrão: benchmarks/resultados/bench_<data>_<commit>.json)")
+    parser.add_argument("--limite-renderizacao", type=int, help="acima disso as tabelas não são renderizadas (padrão: sem limite, só a primeira página é renderizada)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois arquivos de resultados")
+    parser.add_argument("--um-tamanho", nargs=2, help=argparse.SUPPRESS)  # Usado internamente: roda um tamanho e grava o JSON no arquivo dado.
+    argumentos = parser.parse_args()
+
+    if argumentos.comparar:
+        compara(*argumentos.comparar)
+        return
+    if argumentos.um_tamanho:
+        quantidade, arquivo = argumentos.um_tamanho
+        resultado = roda_um_tamanho(int(quantidade), argumentos.limite_renderizacao)
+        with open(arquivo, mode="w", encoding="utf-8") as file:
+            json.dump(resultado, file)
+        return
+
+    resultados = []
+    for quantidade in argumentos.tamanhos:
+        print(f"Medindo {quantidade} lançamentos...", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as pasta:  # O processo filho grava o resultado num arquivo; a saída dele tem o que o menu imprime (limpar_terminal, por exemplo).
+            arquivo = os.path.join(pasta, "resultado.json")
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--um-tamanho", str(quantidade), arquivo,
+                 *(["--limite-renderizacao", str(argumentos.limite_renderizacao)] if argumentos.limite_renderizacao else [])],
+                stdout=subprocess.DEVNULL, check=True)
+            with open(arquivo, encoding="utf-8") as file:
+                resultados.append(json.load(file))
+
+    versao = versao_do_codigo()
+    saida = argumentos.saida or os.path.join(
+        RAIZ, "benchmarks", "resultados", f"bench_{datetime.datetime.now():%Y%m%d_%H%M%S}_{versao or 'sem_git'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    relatorio = {
+        "versao": versao,
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    with open(saida, mode="w", encoding="utf-8") as file:
+        json.dump(relatorio, file, indent=2, ensure_ascii=False)
+
+    for resultado in resultados:
+        print(f"\n{resultado['linhas']} lançamentos (pico de memória {resultado['pico_memoria_mib']:.1f} MiB)")
+        for nome, medida in resultado["medidas"].items():
+            if "segundos" in medida:
+                print(f"  {nome:<22} {medida['segundos']:10.4f} s")
+            else:
+                print(f"  {nome:<22} pulado ({medida['pulado']})")
+    print(f"\nResultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
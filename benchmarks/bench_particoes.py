@@ -0,0 +1,101 @@
+# Mede o livro-caixa particionado por mês (particoes.py) contra o registros.csv inteiro com diário: carga, resultado mensal,
+# filtro de um mês antigo e salvamento depois de uma edição. Os lançamentos são sintéticos, com ids em ordem de data, ao longo de --anos anos até hoje.
+# Uso: python benchmarks/bench_particoes.py [--linhas 1000000] [--anos 10]
+import argparse
+import csv
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregados import AgregadoMensal  # noqa: E402
+from armazenamento import LancamentosColunares  # noqa: E402
+from diario import COLUNAS, Diario  # noqa: E402
+from indices import IndiceLancamentos  # noqa: E402
+from particoes import LancamentosParticionados, LivroParticionado  # noqa: E402
+
+
+def gera_csv(caminho, quantidade, anos, semente=42):  # registros.csv com ids crescentes em ordem de data, todos os investimentos já atualizados.
+    aleatorio = random.Random(semente)
+    hoje = datetime.date.today().toordinal()
+    inicio = hoje - 365 * anos
+    with open(caminho, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUNAS)
+        for id_ in range(1, quantidade + 1):
+            data = datetime.date.fromordinal(inicio + (hoje - inicio) * id_ // quantidade).strftime("%d/%m/%Y")
+            tipo = aleatorio.choice(("Receita", "Despesa", "Investimento"))
+            valor = round(aleatorio.uniform(1, 5000), 2)
+            if tipo == "Investimento":
+                writer.writerow([id_, data, tipo, f"{valor:.2f}", "0.5", data, f"{valor * 1.01:.2f}"])
+            else:
+                writer.writerow([id_, data, tipo, f"{-valor if tipo == 'Despesa' else valor:.2f}", "", "", ""])
+
+
+def carrega_csv(lancamentos, caminho):  # Mesmo laço do carrega_de_arquivo do main.py.
+    with open(caminho, mode="r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            lancamentos[int(row.pop("id"))] = row
+
+
+def cronometra(rotulo, funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    print(f"  {rotulo:<42} {(time.perf_counter() - inicio) * 1e3:>10.1f} ms")
+    return resultado
+
+
+def mede_inteiro(caminho, id_antigo):
+    print("registros.csv inteiro (diário):")
+    lancamentos = LancamentosColunares()
+    agregado = AgregadoMensal(lancamentos)
+    indices = IndiceLancamentos(lancamentos)
+    diario = Diario(lancamentos, caminho)
+    cronometra("carga", lambda: diario.carregar(lambda: carrega_csv(lancamentos, caminho)))
+    cronometra("resultado mensal", agregado.resultados)
+    cronometra("filtro de um mês antigo", lambda: indices.consulta({"data": [id_antigo[1], id_antigo[2]]}))
+    lancamentos[id_antigo[0]]["valor"] = 1.0
+    cronometra("salvar uma edição (diário)", diario.salvar)
+    cronometra("compactar (regrava o arquivo)", diario.compactar)
+
+
+def mede_particionado(caminho, id_antigo):
+    print("Particionado por mês:")
+    lancamentos = LancamentosParticionados()
+    agregado = AgregadoMensal(lancamentos)
+    indices = IndiceLancamentos(lancamentos)
+    livro = LivroParticionado(lancamentos, agregado, indices, caminho)
+    cronometra("migração (lê o CSV e grava as partições)", lambda: livro.carregar(lambda: carrega_csv(lancamentos, caminho)))
+    cronometra("carga (manifesto e ano atual)", lambda: livro.carregar(None))
+    print(f"  {'lançamentos na memória':<42} {len(lancamentos.ids):>10} de {len(lancamentos)}")
+    cronometra("resultado mensal", livro.resultados)
+    cronometra("filtro de um mês antigo (carrega o mês)", lambda: (livro.garante(id_antigo[3], id_antigo[3]), indices.consulta({"data": [id_antigo[1], id_antigo[2]]})))
+    lancamentos[id_antigo[0]]["valor"] = 1.0
+    cronometra("salvar uma edição (regrava um mês)", livro.salvar)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do livro-caixa particionado do EcoBalance.")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--anos", type=int, default=10)
+    argumentos = parser.parse_args()
+    id_ = argumentos.linhas // 10  # Um lançamento do primeiro ano.
+    data = datetime.date.fromordinal(datetime.date.today().toordinal() - 365 * argumentos.anos + 365 * argumentos.anos // 10)
+    primeiro = data.replace(day=1)
+    ultimo = (primeiro + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+    antigo = (id_, primeiro.strftime("%d/%m/%Y"), ultimo.strftime("%d/%m/%Y"), data.toordinal())
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "registros.csv")
+        gera_csv(caminho, argumentos.linhas, argumentos.anos)
+        print(f"{argumentos.linhas} lançamentos em {argumentos.anos} anos, {os.path.getsize(caminho) / 2**20:.0f} MiB")
+        mede_inteiro(caminho, antigo)
+        mede_particionado(caminho, antigo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Mede o servidor local de consultas (servidor.py): sobe o servidor num livro-caixa sintético e dispara vários clientes ao mesmo tempo,
+# cada um em seu processo, com uma mistura de consultas curtas (filtro por data, por tipo com faixa de valor, resultado mensal) e inclusões.
+#   python benchmarks/bench_servidor.py --lancamentos 100000 --clientes 4 --segundos 5
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_menu import gera_livro  # noqa: E402
+from cliente import ClienteEcoBalance  # noqa: E402
+
+PEDIDOS = [
+    {"op": "filtrar", "data": "15/06/2022"},
+    {"op": "filtrar", "tipo": "Investimento", "valor_minimo": 4990},
+    {"op": "resultado_mensal"},
+    {"op": "inserir", "tipo": "Despesa", "valor": 10.5, "data": "01/01/2025"},
+]
+
+
+def cliente(endereco, segundos, em_lote, fila):  # Roda num processo: repete os pedidos até o tempo acabar e devolve quantos fez.
+    with ClienteEcoBalance(endereco) as conexao:
+        conexao.consulta("revalorizar")  # O resultado mensal exige os investimentos atualizados.
+        feitos = 0
+        fim = time.perf_counter() + segundos
+        while time.perf_counter() < fim:
+            if em_lote:
+                conexao.consultas(PEDIDOS * 25)
+                feitos += len(PEDIDOS) * 25
+            else:
+                for pedido in PEDIDOS:
+                    conexao.consulta(**pedido)
+                feitos += len(PEDIDOS)
+    fila.put(feitos)
+
+
+def espera_servidor(endereco, processo):
+    while not os.path.exists(endereco):
+        if processo.poll() is not None:
+            raise RuntimeError("O servidor não subiu.")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lancamentos", type=int, default=100_000)
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=5.0)
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "registros.csv")
+        endereco = caminho + ".sock"
+        gera_livro(caminho, argumentos.lancamentos)
+        servidor = subprocess.Popen([sys.executable, os.path.join(RAIZ, "servidor.py"), "--arquivo", caminho], cwd=pasta)
+        try:
+            espera_servidor(endereco, servidor)
+            for em_lote in (False, True):
+                fila = multiprocessing.Queue()
+                processos = [multiprocessing.Process(target=cliente, args=(endereco, argumentos.segundos, em_lote, fila))
+                             for _ in range(argumentos.clientes)]
+                for processo in processos:
+                    processo.start()
+                feitos = sum(fila.get() for _ in processos)
+                for processo in processos:
+                    processo.join()
+                modo = "em lote (100 pedidos por envio)" if em_lote else "um pedido por vez"
+                print(f"{argumentos.clientes} clientes, {modo}: {feitos / argumentos.segundos:.0f} pedidos por segundo")
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import sys
+from collections import OrderedDict
+
+
+# Cache dos resultados das consultas do menu (filtros, resultado mensal) e das páginas já renderizadas pelo tabulate.
+# Cada item é guardado com a versão do livro-caixa em que foi calculado: obter(chave, calcula) só devolve o item se a versão ainda
+# for a atual, senão calcula de novo. A versão vem da função 'versao' (em main.py: VersaoDoLivro, a versão das recorrências e o dia de hoje),
+# então qualquer inclusão, edição, exclusão, revalorização ou importação invalida tudo, sem cada função do menu precisar avisar o cache.
+# Os itens saem pelo menos usado recentemente (LRU) quando o tamanho aproximado de todos passa do limite em bytes (0 desliga o cache).
+LIMITE_PADRAO = 32 * 2**20
+
+
+class VersaoDoLivro:  # Observador do armazenamento colunar que conta as mudanças: 'versao' muda a cada inclusão, edição, exclusão ou troca das colunas.
+    def __init__(self, lancamentos):
+        self.versao = 0
+        lancamentos.observadores.append(self)
+
+    def alterado(self, antes, depois):
+        self.versao += 1
+
+    def alterados(self, mudancas):
+        self.versao += 1
+
+    def limpo(self):
+        self.versao += 1
+
+
+def tamanho_aproximado(valor):  # Bytes ocupados pelo valor e pelo que está dentro dele (listas, tuplas, dicts, textos e números).
+    tamanho = sys.getsizeof(valor)
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        tamanho += sum(tamanho_aproximado(item) for item in valor)
+    elif isinstance(valor, dict):
+        tamanho += sum(tamanho_aproximado(chave) + tamanho_aproximado(item) for chave, item in valor.items())
+    return tamanho
+
+
+class CacheDeResultados:  # chave -> (versão, valor, tamanho), do menos para o mais usado recentemente.
+    def __init__(self, versao, limite_bytes=LIMITE_PADRAO):
+        self.versao = versao
+        self.limite_bytes = limite_bytes
+        self.itens = OrderedDict()
+        self.bytes = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0  # Itens tirados para caber no limite.
+
+    def obter(self, chave, calcula):  # Valor da chave na versão atual; se não estiver no cache (ou for de outra versão), chama calcula() e guarda.
+        versao = self.versao()
+        item = self.itens.get(chave)
+        if item is not None and item[0] == versao:
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+        self.faltas += 1
+        valor = calcula()
+        self._guarda(chave, versao, valor)
+        return valor
+
+    def _guarda(self, chave, versao, valor):
+        self._retira(chave)
+        tamanho = tamanho_aproximado(valor)
+        if tamanho > self.limite_bytes:  # Maior que o cache inteiro: não guarda.
+            return
+        self.itens[chave] = (versao, valor, tamanho)
+        self.bytes += tamanho
+        while self.bytes > self.limite_bytes:
+            self._retira(next(iter(self.itens)))
+            self.descartes += 1
+
+    def _retira(self, chave):
+        item = self.itens.pop(chave, None)
+        if item is not None:
+            self.bytes -= item[2]
+
+    def limpar(self):
+        self.itens.clear()
+        self.bytes = 0
+
+    def estatisticas(self):  # Contadores do cache, para o resumo do --perfil.
+        return {"acertos": self.acertos, "faltas": self.faltas, "descartes": self.descartes, "itens": len(self.itens),
+                "kib": round(self.bytes / 1024, 1), "limite_kib": round(self.limite_bytes / 1024, 1)}
@@ -0,0 +1,126 @@
+import array
+import bisect
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from armazenamento import LancamentosColunares
+
+
+# Carga de um CSV grande (registros.csv ou extrato importado) em paralelo.
+# O arquivo é dividido em fatias de bytes que começam e terminam em quebra de linha, e cada fatia é lida num processo separado.
+# Cada processo devolve as colunas já convertidas (arrays tipados, baratos de mandar de volta), ordenadas por id.
+# A conversão de cada linha é a mesma do armazenamento colunar (LancamentosColunares._converte), então ids, centavos, taxas e campos opcionais
+# vazios ficam iguais aos da carga linha a linha. Não há suporte a campos entre aspas com quebra de linha dentro, que o registros.csv não usa.
+TAMANHO_MAXIMO_FATIA = 64 * 2**20  # Limita a memória usada por fatia, em bytes.
+TIPOS_COLUNAS = ("q", "i", "b", "q", "q", "i", "q")  # Mesma ordem e tipos das colunas de LancamentosColunares.
+
+
+class IdDuplicadoError(ValueError):  # O mesmo id aparece em duas fatias diferentes do arquivo.
+    pass
+
+
+def fatias_do_arquivo(caminho, quantidade):  # Divide o arquivo (sem o cabeçalho) em até 'quantidade' fatias (inicio, fim) alinhadas em quebra de linha.
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, "rb") as file:
+        cabecalho = file.readline()
+        inicio = len(cabecalho)
+        passo = max(1, (tamanho - inicio) // quantidade)
+        fatias = []
+        while inicio < tamanho:
+            file.seek(min(inicio + passo, tamanho))
+            file.readline()  # Avança até o fim da linha em que a divisão caiu.
+            fim = min(file.tell(), tamanho)
+            fatias.append((inicio, fim))
+            inicio = fim
+    return cabecalho.decode("utf-8-sig"), fatias
+
+
+def carrega_fatia(caminho, inicio, fim, campos):  # Lê as linhas entre os bytes 'inicio' e 'fim' e devolve as colunas ordenadas por id. Roda dentro de um processo do pool.
+    with open(caminho, "rb") as file:
+        file.seek(inicio)
+        texto = file.read(fim - inicio).decode("utf-8")
+
+    colunas = tuple(array.array(tipo) for tipo in TIPOS_COLUNAS)
+    ids, resto = colunas[0], colunas[1:]
+    converte = LancamentosColunares._converte
+    ultimo_id = None
+    em_ordem = True
+    for linha in csv.reader(io.StringIO(texto, newline="")):
+        if not linha:
+            continue
+        row = dict(zip(campos, linha))
+        id_ = int(row.pop("id"))
+        if ultimo_id is not None and id_ <= ultimo_id:
+            em_ordem = False
+        ultimo_id = id_
+        ids.append(id_)
+        for coluna, valor in zip(resto, converte(row)):
+            coluna.append(valor)
+
+    if not em_ordem:  # Ids fora de ordem ou repetidos dentro da fatia: ordena, e o último valor de um id repetido vale (igual à carga linha a linha).
+        ultima_posicao = {id_: posicao for posicao, id_ in enumerate(ids)}
+        ordem = [ultima_posicao[id_] for id_ in sorted(ultima_posicao)]
+        colunas = tuple(array.array(coluna.typecode, (coluna[posicao] for posicao in ordem)) for coluna in colunas)
+    return colunas
+
+
+def carrega_em_paralelo(caminho, lancamentos, processos=None):  # Carrega o CSV 'caminho' em 'lancamentos' usando um pool de processos. Retorna 'lancamentos'.
+    processos = processos or os.cpu_count() or 1
+    tamanho = os.path.getsize(caminho)
+    quantidade = max(processos, -(-tamanho // TAMANHO_MAXIMO_FATIA))
+    cabecalho, fatias = fatias_do_arquivo(caminho, quantidade)
+    campos = next(csv.reader([cabecalho]))
+    if "id" not in campos:
+        raise ValueError(f"{caminho} não tem a coluna 'id' no cabeçalho.")
+
+    novas = tuple(array.array(tipo) for tipo in TIPOS_COLUNAS)
+    faixas = []  # (menor id, maior id, número da fatia) de cada fatia já lida, para apontar duplicatas.
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        resultados = pool.map(carrega_fatia, *zip(*((caminho, inicio, fim, campos) for inicio, fim in fatias)))
+        for numero, colunas in enumerate(resultados, start=1):  # pool.map devolve na ordem das fatias, uma de cada vez.
+            ids = colunas[0]
+            if not ids:
+                continue
+            if novas[0] and ids[0] <= novas[0][-1]:  # A fatia se sobrepõe às anteriores: confere ids repetidos antes de juntar.
+                _confere_duplicados(faixas, ids, numero, novas[0])
+                _junta_ordenado(novas, colunas)
+            else:
+                for nova, coluna in zip(novas, colunas):
+                    nova.extend(coluna)
+            faixas.append((ids[0], ids[-1], numero))
+
+    if not lancamentos:
+        lancamentos.substituir_colunas(*novas)
+    else:  # Já havia lançamentos: o arquivo sobrescreve os ids que coincidirem, como na carga linha a linha.
+        for registro in zip(*novas):
+            lancamentos.gravar_valores(registro[0], registro[1:])
+    return lancamentos
+
+
+def _confere_duplicados(faixas, ids, numero, ids_anteriores):  # Levanta IdDuplicadoError se algum id da fatia 'numero' já apareceu numa fatia anterior.
+    anteriores = set(ids_anteriores[bisect.bisect_left(ids_anteriores, ids[0]):])  # Só os ids anteriores a partir do menor id da fatia podem coincidir.
+    for id_ in ids:
+        if id_ in anteriores:
+            fatia = next(n for menor, maior, n in faixas if menor <= id_ <= maior)
+            raise IdDuplicadoError(f"O id {id_} aparece em mais de uma parte do arquivo (fatias {fatia} e {numero}).")
+
+
+def _junta_ordenado(novas, colunas):  # Junta as colunas de uma fatia nas colunas já lidas, mantendo a ordem por id (as duas já estão ordenadas).
+    corte = bisect.bisect_left(novas[0], colunas[0][0])  # Tudo antes do menor id da fatia continua no lugar.
+    juntas = tuple(array.array(nova.typecode) for nova in novas)
+    a, b = corte, 0
+    ids_a, ids_b = novas[0], colunas[0]
+    while a < len(ids_a) or b < len(ids_b):
+        if b == len(ids_b) or (a < len(ids_a) and ids_a[a] < ids_b[b]):
+            origem, posicao = novas, a
+            a += 1
+        else:
+            origem, posicao = colunas, b
+            b += 1
+        for junta, coluna in zip(juntas, origem):
+            junta.append(coluna[posicao])
+    for nova, junta in zip(novas, juntas):
+        del nova[corte:]
+        nova.extend(junta)
@@ -0,0 +1,121 @@
+import json
+import socket
+
+
+# Cliente do servidor local de consultas (servidor.py). Cada método manda um pedido e espera a resposta; os erros do servidor voltam
+# como as mesmas exceções da api.py (KeyError para id inexistente, ValueError para dado inválido, TypeError para parâmetro errado).
+#   with ClienteEcoBalance() as cliente:
+#       receitas = cliente.filtrar(tipo="Receita", valor_minimo=100)
+#       cliente.inserir("Despesa", 18.25, data="14/08/2024")
+# Para muitas consultas seguidas, consultas() manda todas de uma vez e lê as respostas depois, sem esperar cada ida e volta.
+ERROS = {"KeyError": KeyError, "ValueError": ValueError, "TypeError": TypeError}
+
+
+class ErroDoServidor(RuntimeError):  # Erro que não é de dado inválido nem de id inexistente.
+    pass
+
+
+class ClienteEcoBalance:
+    def __init__(self, endereco="registros.csv.sock", tempo_limite=None):
+        # 'endereco' é o caminho do socket Unix ou (host, porta), o mesmo passado ao servidor.
+        if isinstance(endereco, str):
+            self.conexao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.conexao = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.conexao.settimeout(tempo_limite)
+        self.conexao.connect(endereco)
+        self._arquivo = self.conexao.makefile("rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.fechar()
+
+    def fechar(self):
+        self._arquivo.close()
+        self.conexao.close()
+
+    def _resposta(self):
+        linha = self._arquivo.readline()
+        if not linha:
+            raise ConnectionError("O servidor fechou a conexão.")
+        resposta = json.loads(linha)
+        if "erro" in resposta:
+            raise ERROS.get(resposta.get("tipo"), ErroDoServidor)(resposta["erro"])
+        return resposta["resultado"]
+
+    def consulta(self, op, **parametros):  # Manda um pedido qualquer e devolve o resultado.
+        self.conexao.sendall(json.dumps({"op": op, **parametros}).encode("utf-8") + b"\n")
+        return self._resposta()
+
+    def consultas(self, pedidos):  # Manda vários pedidos (dicts com "op") de uma vez e devolve a lista de resultados, na mesma ordem.
+        # Um pedido com erro não impede os outros: no lugar do resultado dele vai a exceção.
+        pedidos = list(pedidos)
+        self.conexao.sendall(b"".join(json.dumps(pedido).encode("utf-8") + b"\n" for pedido in pedidos))
+        resultados = []
+        for _ in pedidos:
+            try:
+                resultados.append(self._resposta())
+            except (KeyError, ValueError, TypeError, ErroDoServidor) as erro:
+                resultados.append(erro)
+        return resultados
+
+    # ---- as mesmas operações da api.py ----
+
+    def filtrar(self, data=None, tipo=None, valor_minimo=None, valor_maximo=None):  # Lista de (id, dict), em ordem de id.
+        resultado = self.consulta("filtrar", data=data, tipo=tipo, valor_minimo=valor_minimo, valor_maximo=valor_maximo)
+        return [(id_, lancamento) for id_, lancamento in resultado]
+
+    def consultar(self, filtro, explicar=False):  # Filtro composto (ver filtros.py). Com explicar=True, um dict com "lancamentos" e "plano".
+        resultado = self.consulta("consultar", filtro=filtro, explicar=explicar)
+        if explicar:
+            resultado["lancamentos"] = [(id_, lancamento) for id_, lancamento in resultado["lancamentos"]]
+            return resultado
+        return [(id_, lancamento) for id_, lancamento in resultado]
+
+    def resultado_mensal(self):
+        return self.consulta("resultado_mensal")
+
+    def revalorizar(self, data_referencia=None):
+        return self.consulta("revalorizar", data_referencia=data_referencia)
+
+    def exportar(self, nome_relatorio="meu_relatorio.csv", formato=None, data_inicial=None, data_final=None, tipo=None):  # O arquivo é gravado pelo servidor, no caminho dele.
+        return self.consulta("exportar", nome_relatorio=nome_relatorio, formato=formato, data_inicial=data_inicial, data_final=data_final, tipo=tipo)
+
+    def importar(self, nome_extrato, formato=None, ignorar_duplicados=True):  # O extrato é lido pelo servidor, no caminho dele. Retorna o resumo (dict).
+        return self.consulta("importar", nome_extrato=nome_extrato, formato=formato, ignorar_duplicados=ignorar_duplicados)
+
+    def recorrencias(self):
+        return self.consulta("recorrencias")
+
+    def incluir_recorrencia(self, tipo, valor, frequencia="mensal", data_inicial=None, data_final=None):
+        return self.consulta("incluir_recorrencia", tipo=tipo, valor=valor, frequencia=frequencia, data_inicial=data_inicial, data_final=data_final)
+
+    def excluir_recorrencia(self, numero):
+        return self.consulta("excluir_recorrencia", numero=numero)
+
+    def projetar(self, data_inicial=None, data_final=None, passo="mensal"):
+        return self.consulta("projetar", data_inicial=data_inicial, data_final=data_final, passo=passo)
+
+    def totais(self, data_inicial=None, data_final=None, periodo=None):  # Um dict, ou a lista de dicts por período ("dia", "semana", "mes", "trimestre", "ano").
+        return self.consulta("totais", data_inicial=data_inicial, data_final=data_final, periodo=periodo)
+
+    def inserir(self, tipo, valor, data=None, taxa_de_juros=None, data_investimento=None):
+        return self.consulta("inserir", tipo=tipo, valor=valor, data=data, taxa_de_juros=taxa_de_juros, data_investimento=data_investimento)
+
+    def editar(self, id_, tipo=None, valor=None, data=None, taxa_de_juros=None, data_investimento=None):
+        return self.consulta("editar", id=id_, tipo=tipo, valor=valor, data=data, taxa_de_juros=taxa_de_juros, data_investimento=data_investimento)
+
+    def excluir(self, id_):
+        return self.consulta("excluir", id=id_)
+
+    def excluir_filtrados(self, filtro, todos=False):  # Exclui todos os lançamentos do filtro composto (ver filtros.py), numa operação só. Filtro vazio só com todos=True.
+        return self.consulta("excluir_filtrados", filtro=filtro, todos=todos)
+
+    def editar_filtrados(self, filtro, tipo=None, taxa_de_juros=None, todos=False):
+        return self.consulta("editar_filtrados", filtro=filtro, tipo=tipo, taxa_de_juros=taxa_de_juros, todos=todos)
+
+    def salvar(self):  # Força o salvamento agora (o servidor já salva sozinho, ver autosalvamento.py).
+        return self.consulta("salvar")
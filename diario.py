@@ -0,0 +1,278 @@
+import csv
+import os
+import shutil
+import threading
+
+from armazenamento import REMOVIDO, SEM_DATA, SEM_VALOR, TIPOS, centavos_para_texto, ordinal_para_data, taxa_para_texto
+from snapshot import grava_snapshot
+
+
+COLUNAS = ["id", "data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado"]  # Mesmas colunas do registros.csv.
+
+INCLUSAO = "I"
+ALTERACAO = "A"
+EXCLUSAO = "E"
+LOTE = "L"  # Linha de abertura de um salvamento: "L,<quantidade de linhas que vêm depois>". Ver Diario._reaplica.
+
+
+def combina_operacoes(anterior, nova):  # Operação que resume 'anterior' seguida de 'nova' no mesmo id (None: nada a gravar).
+    if anterior is None:
+        return nova
+    if anterior == INCLUSAO:  # Incluído e excluído antes de salvar não precisa ir para o diário; incluído e alterado continua inclusão.
+        return None if nova == EXCLUSAO else INCLUSAO
+    if nova == EXCLUSAO:
+        return EXCLUSAO
+    return ALTERACAO  # Alterado de novo, ou excluído e incluído de novo: o diário grava o lançamento inteiro.
+
+
+def linha_csv(registro):  # Converte os valores crus das colunas (Registro ou tupla na mesma ordem) para a linha do CSV, com os mesmos campos que o csv.DictWriter gravava.
+    # Valores saem com duas casas ('12.30') e taxas com as casas que têm ('0.5'), escritos a partir dos inteiros, sem passar por float.
+    id_, data, tipo, valor, taxa, data_inv, atualizado = registro
+    return [
+        id_,
+        ordinal_para_data(data),
+        TIPOS[tipo],
+        centavos_para_texto(valor),
+        "" if taxa == SEM_VALOR else taxa_para_texto(taxa),
+        "" if data_inv == SEM_DATA else ordinal_para_data(data_inv),
+        "" if atualizado == SEM_VALOR else centavos_para_texto(atualizado),
+    ]
+
+
+def grava_base(caminho, colunas):  # Grava o arquivo base inteiro a partir de uma cópia das colunas, num arquivo temporário que depois substitui o original (os.replace é atômico).
+    temporario = caminho + ".tmp"
+    with open(temporario, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUNAS)
+        for registro in zip(*colunas):
+            if registro[2] != REMOVIDO:
+                writer.writerow(linha_csv(registro))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporario, caminho)
+
+
+class Diario:  # Diário de alterações (só acrescenta linhas) gravado ao lado do arquivo base, para que salvar custe O(alterações) e não O(lançamentos).
+    # É um observador do armazenamento colunar: guarda em 'pendentes' os ids alterados desde o último salvamento, com a operação de cada um
+    # e os valores do lançamento depois da última mudança. Ao salvar, cada id pendente vira uma linha no diário: operação (I, A ou E) seguida
+    # das colunas do registros.csv. Como os valores já estão em 'pendentes', salvar não lê as colunas e pode rodar em outra thread
+    # (ver autosalvamento.py): 'pendentes' só é trocado sob '_trava_pendentes', e a escrita nos arquivos é feita sob '_trava_arquivo'.
+    # A compactação grava o arquivo base com o estado completo (e o snapshot binário dele, ver snapshot.py) e zera o diário. Durante a compactação o diário atual é renomeado para
+    # '<diario>.compactando', e os salvamentos seguintes vão para um diário novo; assim ela pode rodar numa thread sem travar o menu.
+    # Se o programa cair no meio, na próxima carga base + '.compactando' + diário são reaplicados e o resultado é o mesmo, pois as operações
+    # podem ser repetidas sem efeito colateral (I e A gravam o lançamento inteiro, E só exclui se existir).
+    # Cada salvamento começa com uma linha L com a quantidade de linhas dele, e na carga um salvamento que não chegou inteiro ao disco
+    # é descartado todo; como as alterações em lote (gravar_em_lote) entram em 'pendentes' de uma vez, sob a trava, uma exclusão
+    # ou edição em lote nunca fica pela metade no diário. Diários antigos, sem linhas L, continuam sendo lidos linha a linha.
+    def __init__(self, lancamentos, nome_arquivo):
+        self.lancamentos = lancamentos
+        self.nome_arquivo = nome_arquivo
+        self.caminho = nome_arquivo + ".diario"
+        self.caminho_compactando = self.caminho + ".compactando"
+        self.pendentes = {}  # id -> (operação desde o último salvamento, Registro atual ou None se excluído)
+        self._trava_pendentes = threading.Lock()
+        self._trava_arquivo = threading.RLock()
+        self.linhas_no_diario = 0
+        self.limite_compactacao = 1000  # Compacta quando o diário passa desse número de linhas e também do número de lançamentos.
+        self._pausado = False
+        self._reescrever = False  # Os lançamentos foram zerados e recarregados por fora do diário, o próximo salvamento precisa compactar.
+        self._compactacao = None  # Thread da compactação em segundo plano, quando existir.
+        lancamentos.observadores.append(self)
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):
+        if self._pausado:
+            return
+        id_ = antes.id if antes is not None else depois.id
+        nova = INCLUSAO if antes is None else (EXCLUSAO if depois is None else ALTERACAO)
+        with self._trava_pendentes:
+            anterior = self.pendentes.get(id_)
+            operacao = combina_operacoes(anterior and anterior[0], nova)
+            if operacao is None:
+                del self.pendentes[id_]
+            else:
+                self.pendentes[id_] = (operacao, depois)
+
+    def alterados(self, mudancas):  # Alteração em lote: todas as mudanças entram em 'pendentes' juntas, então vão para o mesmo salvamento.
+        if self._pausado:
+            return
+        with self._trava_pendentes:
+            pendentes = self.pendentes
+            pendentes_get = pendentes.get
+            for antes, depois in mudancas:
+                id_ = antes.id if antes is not None else depois.id
+                nova = INCLUSAO if antes is None else (EXCLUSAO if depois is None else ALTERACAO)
+                anterior = pendentes_get(id_)
+                operacao = combina_operacoes(anterior and anterior[0], nova)
+                if operacao is None:
+                    del pendentes[id_]
+                else:
+                    pendentes[id_] = (operacao, depois)
+
+    def limpo(self):
+        if not self._pausado:
+            with self._trava_pendentes:
+                self.pendentes = {}
+            self._reescrever = True
+
+    def _retira_pendentes(self):  # Troca 'pendentes' por um dict vazio e devolve o antigo: o que vai ser gravado agora.
+        with self._trava_pendentes:
+            lote, self.pendentes = self.pendentes, {}
+        return lote
+
+    def _devolve_pendentes(self, lote):  # A gravação do lote falhou: junta ele de volta com o que mudou enquanto isso.
+        with self._trava_pendentes:
+            for id_, (operacao, registro) in lote.items():
+                depois = self.pendentes.get(id_)
+                if depois is None:
+                    self.pendentes[id_] = (operacao, registro)
+                    continue
+                combinada = combina_operacoes(operacao, depois[0])
+                if combinada is None:
+                    del self.pendentes[id_]
+                else:
+                    self.pendentes[id_] = (combinada, depois[1])
+
+    # ---- carga ----
+
+    def carregar(self, carrega_base):  # Carrega o arquivo base com a função 'carrega_base' e reaplica os diários por cima, sem marcar nada como pendente.
+        self.aguardar()
+        self._pausado = True
+        try:
+            carrega_base()
+            self.linhas_no_diario = 0
+            sobrou_compactacao = os.path.exists(self.caminho_compactando)
+            for caminho in (self.caminho_compactando, self.caminho):
+                if os.path.exists(caminho):
+                    self.linhas_no_diario += self._reaplica(caminho)
+        finally:
+            self._pausado = False
+        self.pendentes = {}
+        if sobrou_compactacao:  # O programa caiu no meio de uma compactação, termina agora.
+            self.compactar()
+
+    def _reaplica(self, caminho):
+        quantidade = 0
+        lote, faltam = [], 0  # Linhas do salvamento aberto por uma linha L e quantas ainda faltam chegar.
+        lido = valido = 0  # Bytes lidos e bytes até o fim do último salvamento completo.
+        with open(caminho, mode="rb") as file:
+            def linhas():
+                nonlocal lido
+                for bruta in file:
+                    lido += len(bruta)
+                    if not bruta.endswith(b"\n"):  # Linha cortada no fim do arquivo: o programa caiu enquanto ela era gravada.
+                        return
+                    yield bruta.decode("utf-8")
+
+            for linha in csv.reader(linhas()):
+                if len(linha) != len(COLUNAS) + 1:  # Linha incompleta, descarta.
+                    continue
+                if linha[0] == LOTE:  # Um salvamento novo começa; se o anterior não chegou inteiro, ele é descartado.
+                    lote, faltam = [], int(linha[1])
+                    if not faltam:
+                        valido = lido
+                    continue
+                if not faltam:  # Diário antigo, sem linhas L: cada linha vale sozinha.
+                    quantidade += self._aplica_linhas([linha])
+                    valido = lido
+                    continue
+                lote.append(linha)
+                faltam -= 1
+                if not faltam:
+                    quantidade += self._aplica_linhas(lote)
+                    lote = []
+                    valido = lido
+        if valido < os.path.getsize(caminho):  # Sobrou um salvamento pela metade no fim: tira, para o próximo não ser gravado colado nele.
+            try:
+                os.truncate(caminho, valido)
+            except OSError:
+                pass
+        return quantidade
+
+    def _aplica_linhas(self, linhas):
+        for linha in linhas:
+            operacao, id_ = linha[0], int(linha[1])
+            if operacao == EXCLUSAO:
+                self.lancamentos.pop(id_, None)
+            else:
+                self.lancamentos[id_] = dict(zip(COLUNAS[1:], linha[2:]))
+        return len(linhas)
+
+    # ---- salvamento ----
+
+    def salvar(self, compactar_se_preciso=True):  # Acrescenta no diário uma linha por lançamento alterado e força a gravação no disco (fsync). Retorna quantas linhas gravou.
+        # Com compactar_se_preciso=False não lê as colunas, então pode ser chamada de outra thread (é o que o autosalvamento faz).
+        if self._reescrever and compactar_se_preciso:
+            gravadas = len(self.lancamentos)
+            self.compactar()
+            return gravadas
+        with self._trava_arquivo:
+            if not self.pendentes:
+                return 0
+            lote = self._retira_pendentes()
+            tamanho = os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0
+            try:
+                with open(self.caminho, mode="a", newline="", encoding="utf-8") as file:
+                    writer = csv.writer(file)
+                    writer.writerow([LOTE, len(lote), "", "", "", "", "", ""])
+                    for id_, (operacao, registro) in lote.items():
+                        if operacao == EXCLUSAO:
+                            writer.writerow([EXCLUSAO, id_, "", "", "", "", "", ""])
+                        else:
+                            writer.writerow([operacao, *linha_csv(registro)])
+                    file.flush()
+                    os.fsync(file.fileno())
+            except BaseException:
+                self._devolve_pendentes(lote)  # Nada se perde: o lote inteiro é gravado de novo no próximo salvamento.
+                try:
+                    os.truncate(self.caminho, tamanho)  # Tira o pedaço já escrito, para o próximo salvamento não começar no meio de uma linha.
+                except OSError:
+                    pass  # Se nem isso deu, a carga descarta o lote incompleto (falta linha depois do L).
+                raise
+            self.linhas_no_diario += len(lote)
+        if compactar_se_preciso and self.precisa_compactar():
+            self.compactar(em_segundo_plano=True)
+        return len(lote)
+
+    def alteracoes_pendentes(self):  # Quantos lançamentos mudaram desde o último salvamento (1 se as colunas foram recarregadas por fora).
+        return len(self.pendentes) or int(self._reescrever)
+
+    def precisa_compactar(self):  # O diário passou do limite e também do número de lançamentos.
+        return self.linhas_no_diario > max(self.limite_compactacao, len(self.lancamentos))
+
+    # ---- compactação ----
+
+    def compactar(self, em_segundo_plano=False):  # Grava o estado completo no arquivo base e descarta o diário.
+        # Lê as colunas, então só pode ser chamada pela thread que altera os lançamentos (a do menu).
+        self.aguardar()
+        self._reescrever = False
+        with self._trava_arquivo:  # Um autosalvamento em andamento termina antes do diário ser renomeado.
+            self.salvar(compactar_se_preciso=False)
+            if os.path.exists(self.caminho):
+                if os.path.exists(self.caminho_compactando):  # Sobrou de uma compactação interrompida: junta os dois para não perder nada se cair de novo.
+                    with open(self.caminho_compactando, mode="ab") as destino, open(self.caminho, mode="rb") as origem:
+                        shutil.copyfileobj(origem, destino)
+                        destino.flush()
+                        os.fsync(destino.fileno())
+                    os.remove(self.caminho)
+                else:
+                    os.replace(self.caminho, self.caminho_compactando)
+            colunas = tuple(coluna[:] for coluna in self.lancamentos._colunas())  # Cópia das colunas: a thread grava essa cópia enquanto o menu continua mexendo nas originais.
+            self.linhas_no_diario = 0
+        if em_segundo_plano:
+            self._compactacao = threading.Thread(target=self._grava_compactacao, args=(colunas,), daemon=False)
+            self._compactacao.start()
+        else:
+            self._grava_compactacao(colunas)
+
+    def _grava_compactacao(self, colunas):
+        grava_base(self.nome_arquivo, colunas)
+        grava_snapshot(self.nome_arquivo, colunas)  # Gravado depois do CSV, então fica mais novo que ele e é usado na próxima carga.
+        if os.path.exists(self.caminho_compactando):
+            os.remove(self.caminho_compactando)
+
+    def aguardar(self):  # Espera a compactação em segundo plano terminar, se houver uma rodando. Chamada antes de sair do programa.
+        if self._compactacao is not None:
+            self._compactacao.join()
+            self._compactacao = None
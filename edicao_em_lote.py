@@ -0,0 +1,41 @@
+import datetime
+
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR
+
+
+# Edição e exclusão em lote: a mesma mudança em todos os lançamentos de uma lista de ids (normalmente o resultado de um filtro composto,
+# ver filtros.py), numa passada só. As mudanças vão para lancamentos.gravar_em_lote, que grava as colunas e avisa os observadores
+# uma vez só: índices e totais se atualizam juntos e o diário grava a operação inteira como uma unidade (ver diario.py).
+# As regras são as do editar_lancamento (valor negativo na despesa, campos de investimento só no investimento), mas a data do
+# lançamento não muda, como no api.editar: trocar o tipo de 100 mil lançamentos importados não deve mudar a data de todos para hoje.
+DESPESA = CODIGO_TIPO["Despesa"]
+INVESTIMENTO = CODIGO_TIPO["Investimento"]
+
+
+def com_tipo(registro, codigo, hoje):  # Valores crus (data, tipo, valor, taxa, data_inv, atualizado) com o tipo trocado para 'codigo', pelas regras do editar_lancamento.
+    _, data, _, valor, taxa, data_inv, atualizado = registro
+    valor = -abs(valor) if codigo == DESPESA else abs(valor)
+    if codigo == INVESTIMENTO:  # Passa a investimento com a data do investimento de hoje se não tinha uma, como no editar_lancamento.
+        return data, codigo, valor, taxa, data_inv if data_inv != SEM_DATA else hoje, atualizado
+    return data, codigo, valor, SEM_VALOR, SEM_DATA, SEM_VALOR  # Some com os campos de investimento.
+
+
+def excluir_em_lote(lancamentos, ids):  # Exclui todos os ids. Retorna quantos foram excluídos.
+    return lancamentos.gravar_em_lote([(id_, None) for id_ in ids])
+
+
+def alterar_em_lote(lancamentos, ids, codigo=None, taxa=None):  # Troca o tipo (código) e/ou a taxa de juros mensal de todos os ids. Retorna quantos mudaram.
+    # 'taxa' vem no ponto fixo da coluna (ver armazenamento.taxa_para_inteiro). A taxa só vale para quem é investimento depois da troca de tipo (os outros tipos não têm taxa). Tipo e taxa vão na mesma operação.
+    hoje = datetime.date.today().toordinal()
+    alteracoes = []
+    for registro in lancamentos.registros_por_ids(ids):
+        valores = None
+        if codigo is not None and registro.tipo != codigo:
+            valores = com_tipo(registro, codigo, hoje)
+        if taxa is not None:
+            data, tipo, valor, taxa_atual, data_inv, atualizado = valores or registro[1:]
+            if tipo == INVESTIMENTO and taxa_atual != taxa:
+                valores = (data, tipo, valor, taxa, data_inv, atualizado)
+        if valores is not None:
+            alteracoes.append((registro.id, valores))
+    return lancamentos.gravar_em_lote(alteracoes)
@@ -0,0 +1,171 @@
+import array
+import csv
+import gzip
+import itertools
+import json
+import struct
+import sys
+import time
+
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, centavos_para_reais, data_para_ordinal, inteiro_para_taxa, ordinal_para_data
+from diario import linha_csv
+from snapshot import COLUNA, colunas_da_versao_1, grava_nomes_dos_tipos
+
+
+# Exportação dos lançamentos em fluxo: os lançamentos são lidos em blocos (registros_em_blocos do armazenamento) e cada bloco é
+# gravado antes de ler o próximo, então a memória usada não depende do tamanho do livro-caixa nem do período exportado.
+# Todos os formatos têm o mesmo esquema fixo, ESQUEMA, com os campos vazios em branco (CSV), null (JSON) ou SEM_VALOR/0 (colunar).
+# Formatos (escolhidos pela extensão do arquivo, ou pelo argumento 'formato'):
+#   csv        .csv        mesmo formato de linha do registros.csv
+#   csv.gz     .csv.gz     o mesmo CSV comprimido com gzip
+#   jsonl      .jsonl      um objeto JSON por lançamento
+#   jsonl.gz   .jsonl.gz   o mesmo JSON Lines comprimido com gzip
+#   colunar    .ecol       binário colunar em blocos, descrito abaixo; lido de volta por le_colunar
+#
+# Formato colunar (little-endian):
+#   cabeçalho   8s I           assinatura b"ECOBCOLS" e versão
+#   strings     I + (H + bytes) nomes dos tipos, na ordem dos códigos gravados (mesma tabela do snapshot)
+#   colunas     B + (c B)*     quantidade de colunas e, para cada uma, typecode e tamanho do item
+#   blocos      I + bytes      quantidade de linhas do bloco e os bytes crus de cada coluna; um bloco com 0 linhas marca o fim
+# As colunas são as do armazenamento: valores em centavos e taxa em ponto fixo desde a versão 2 (a versão 1 tinha float, e é convertida na leitura).
+# Com 'recorrencias' (ver recorrencias.py), as ocorrências do período vão depois dos lançamentos, geradas em blocos do mesmo jeito,
+# com o id negativo da recorrência; sem data final, até hoje.
+ESQUEMA = ("id", "data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado")
+TIPOS_COLUNAS = ("q", "i", "b", "q", "q", "i", "q")  # Mesmos typecodes das colunas de LancamentosColunares.
+TAMANHO_BLOCO = 65536
+ASSINATURA = b"ECOBCOLS"
+VERSAO = 2
+CABECALHO = struct.Struct("<8sI")
+BLOCO = struct.Struct("<I")
+EXTENSOES = ((".csv.gz", "csv.gz"), (".jsonl.gz", "jsonl.gz"), (".csv", "csv"), (".jsonl", "jsonl"), (".ecol", "colunar"))
+
+
+def formato_pelo_nome(caminho):  # Descobre o formato pela extensão do arquivo; CSV se a extensão não for conhecida.
+    for extensao, formato in EXTENSOES:
+        if caminho.lower().endswith(extensao):
+            return formato
+    return "csv"
+
+
+def _ordinal(data):  # Aceita None, ordinal, date/datetime ou 'dd/mm/aaaa'.
+    if data is None or isinstance(data, int):
+        return data
+    return data_para_ordinal(data)
+
+
+def exporta(lancamentos, caminho, formato=None, data_inicial=None, data_final=None, tipo=None, tamanho_bloco=TAMANHO_BLOCO, recorrencias=None):  # Exporta os lançamentos (ou só o período/tipo pedido). Retorna (linhas gravadas, segundos).
+    formato = formato or formato_pelo_nome(caminho)
+    if formato not in GRAVADORES:
+        raise ValueError(f"Formato de exportação desconhecido: {formato!r}")
+    if tipo is not None and not isinstance(tipo, int):
+        if tipo not in CODIGO_TIPO:
+            raise ValueError(f"Tipo de lançamento inválido: {tipo!r}")
+        tipo = CODIGO_TIPO[tipo]
+
+    inicio = time.perf_counter()
+    blocos = lancamentos.registros_em_blocos(tamanho_bloco, _ordinal(data_inicial), _ordinal(data_final), tipo)
+    if recorrencias:
+        blocos = itertools.chain(blocos, recorrencias.blocos(tamanho_bloco, _ordinal(data_inicial), _ordinal(data_final), tipo))
+    linhas = GRAVADORES[formato](caminho, blocos)
+    return linhas, time.perf_counter() - inicio
+
+
+def _grava_csv(caminho, blocos, comprimido=False):
+    abre = gzip.open if comprimido else open
+    argumentos = {"compresslevel": 6} if comprimido else {}
+    linhas = 0
+    with abre(caminho, mode="wt", newline="", encoding="utf-8", **argumentos) as file:
+        writer = csv.writer(file)
+        writer.writerow(ESQUEMA)
+        for bloco in blocos:
+            writer.writerows(map(linha_csv, bloco))
+            linhas += len(bloco)
+    return linhas
+
+
+def _objeto_json(registro):  # Lançamento como dict do ESQUEMA, com null nos campos vazios. Valores em reais (12.34) e taxa em porcentagem, como na API.
+    id_, data, tipo, valor, taxa, data_inv, atualizado = registro
+    return {
+        "id": id_,
+        "data": ordinal_para_data(data),
+        "tipo": TIPOS[tipo],
+        "valor": centavos_para_reais(valor),
+        "taxa_de_juros": None if taxa == SEM_VALOR else inteiro_para_taxa(taxa),
+        "data_investimento": None if data_inv == SEM_DATA else ordinal_para_data(data_inv),
+        "investimento_atualizado": None if atualizado == SEM_VALOR else centavos_para_reais(atualizado),
+    }
+
+
+def _grava_jsonl(caminho, blocos, comprimido=False):
+    abre = gzip.open if comprimido else open
+    argumentos = {"compresslevel": 6} if comprimido else {}
+    linhas = 0
+    codifica = json.JSONEncoder(ensure_ascii=False).encode
+    with abre(caminho, mode="wt", encoding="utf-8", **argumentos) as file:
+        for bloco in blocos:
+            file.write("".join(codifica(_objeto_json(registro)) + "\n" for registro in bloco))
+            linhas += len(bloco)
+    return linhas
+
+
+def _grava_colunar(caminho, blocos):
+    linhas = 0
+    with open(caminho, "wb") as file:
+        file.write(CABECALHO.pack(ASSINATURA, VERSAO))
+        grava_nomes_dos_tipos(file)
+        file.write(struct.pack("<B", len(TIPOS_COLUNAS)))
+        for typecode in TIPOS_COLUNAS:
+            file.write(COLUNA.pack(typecode.encode("ascii"), array.array(typecode).itemsize))
+        for bloco in blocos:
+            file.write(BLOCO.pack(len(bloco)))
+            for typecode, valores in zip(TIPOS_COLUNAS, zip(*bloco)):
+                coluna = array.array(typecode, valores)
+                if sys.byteorder == "big":
+                    coluna.byteswap()
+                coluna.tofile(file)
+            linhas += len(bloco)
+        file.write(BLOCO.pack(0))
+    return linhas
+
+
+def le_colunar(caminho):  # Lê um arquivo colunar bloco a bloco. Gera tuplas de arrays (uma por coluna do ESQUEMA), com os códigos de tipo já traduzidos para os atuais.
+    with open(caminho, "rb") as file:
+        assinatura, versao = CABECALHO.unpack(file.read(CABECALHO.size))
+        if assinatura != ASSINATURA or versao not in (1, VERSAO):
+            raise ValueError(f"{caminho} não é uma exportação colunar válida (versão {versao}).")
+        (quantidade_strings,) = struct.unpack("<I", file.read(4))
+        nomes = []
+        for _ in range(quantidade_strings):
+            (tamanho,) = struct.unpack("<H", file.read(2))
+            nomes.append(file.read(tamanho).decode("utf-8"))
+        traducao = bytearray(range(256))
+        for codigo, nome in enumerate(nomes):
+            traducao[codigo] = CODIGO_TIPO.get(nome, 0)
+        (quantidade_colunas,) = struct.unpack("<B", file.read(1))
+        tipos_colunas = []
+        for _ in range(quantidade_colunas):
+            typecode, itemsize = COLUNA.unpack(file.read(COLUNA.size))
+            tipos_colunas.append((typecode.decode("ascii"), itemsize))
+
+        while True:
+            (linhas,) = BLOCO.unpack(file.read(BLOCO.size))
+            if linhas == 0:
+                return
+            colunas = []
+            for typecode, itemsize in tipos_colunas:
+                coluna = array.array(typecode)
+                coluna.frombytes(file.read(linhas * itemsize))
+                if sys.byteorder == "big":
+                    coluna.byteswap()
+                colunas.append(coluna)
+            colunas[2] = array.array("b", colunas[2].tobytes().translate(traducao))
+            yield colunas_da_versao_1(colunas) if versao == 1 else tuple(colunas)
+
+
+GRAVADORES = {
+    "csv": _grava_csv,
+    "csv.gz": lambda caminho, blocos: _grava_csv(caminho, blocos, comprimido=True),
+    "jsonl": _grava_jsonl,
+    "jsonl.gz": lambda caminho, blocos: _grava_jsonl(caminho, blocos, comprimido=True),
+    "colunar": _grava_colunar,
+}
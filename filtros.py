@@ -0,0 +1,320 @@
+import datetime
+import math
+import re
+from decimal import ROUND_CEILING, ROUND_FLOOR
+
+from armazenamento import (CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, centavos_para_texto, data_para_ordinal, ordinal_para_data, reais_para_centavos,
+                           taxa_para_inteiro, taxa_para_texto)
+
+
+# Filtros compostos: critérios de data, tipo, valor, taxa de juros e data do investimento combinados com E e OU.
+# Um filtro é um dict (o mesmo formato aceito pela API e pelo servidor), com um critério por chave, todos valendo juntos (E):
+#   {"data": ["01/01/2024", "31/03/2024"], "tipo": ["Receita", "Despesa"]}
+#   {"ou": [{"valor": [1000, None]}, {"e": [{"tipo": "Investimento"}, {"taxa_de_juros": [0.01, None]}]}]}
+# Faixas são [mínimo, máximo] (inclusive, None deixa a ponta aberta) ou um valor só (igual a ele); tipo é um nome ou uma lista de nomes.
+# Valor é em reais e taxa em porcentagem, e as pontas são convertidas para os inteiros das colunas (centavos, taxa em ponto fixo):
+# o mínimo arredondado para cima e o máximo para baixo, então "valor 10.005.." começa em 10,01.
+# No menu o mesmo filtro é escrito como texto (ver interpreta):
+#   data 01/01/2024..31/03/2024 e (tipo Receita,Despesa ou valor 1000..)
+#
+# Planejamento: antes de buscar, cada critério estima pelo índice quantos ids vai devolver (IndiceLancamentos.quantidade_na_faixa).
+# Num E, o critério mais seletivo é buscado primeiro no índice; os seguintes são buscados e intersectados se forem pequenos,
+# ou conferidos linha a linha só nos candidatos que sobraram se forem muito maiores (FATOR_CONFERENCIA). Num OU, cada lado é buscado
+# no índice e os conjuntos são unidos. Em nenhum caso os lançamentos são varridos inteiros, a não ser num filtro sem critério nenhum.
+# executa devolve os ids e as linhas do plano, com a estimativa, as linhas examinadas e o resultado de cada passo.
+FAIXAS = ("data", "valor", "taxa_de_juros", "data_investimento")
+DATAS = ("data", "data_investimento")
+CAMPO_DO_REGISTRO = {"data": "data", "valor": "valor", "taxa_de_juros": "taxa", "data_investimento": "data_inv"}
+CODIGO_POR_NOME = {nome.lower(): codigo for nome, codigo in CODIGO_TIPO.items()}
+FATOR_CONFERENCIA = 8  # Conferir uma linha custa umas 8 vezes mais que ler uma entrada do índice.
+
+
+def _ponta(campo, valor, padrao):  # Converte uma ponta da faixa: data 'dd/mm/aaaa' (ou date) para ordinal, valor para centavos e taxa para o ponto fixo.
+    if valor is None or valor == "":
+        return padrao
+    if campo in DATAS:
+        if isinstance(valor, (datetime.date, datetime.datetime)):
+            return valor.toordinal()
+        try:
+            return data_para_ordinal(str(valor))
+        except ValueError:
+            raise ValueError(f"Data inválida no filtro de {campo}: {valor!r}") from None
+    converte = reais_para_centavos if campo == "valor" else taxa_para_inteiro
+    try:
+        return converte(valor, ROUND_CEILING if padrao < 0 else ROUND_FLOOR)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido no filtro de {campo}: {valor!r}") from None
+
+
+def _formata(campo, valor):
+    if campo in DATAS:
+        return ordinal_para_data(valor)
+    return centavos_para_texto(valor) if campo == "valor" else taxa_para_texto(valor)
+
+
+class Faixa:  # minimo <= campo <= maximo (um campo de FAIXAS).
+    def __init__(self, campo, minimo=-math.inf, maximo=math.inf):
+        self.campo = campo
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def estimativa(self, indices):
+        return indices.quantidade_na_faixa(self.campo, self.minimo, self.maximo)
+
+    def busca(self, indices):
+        return indices.ids_na_faixa(self.campo, self.minimo, self.maximo)
+
+    def confere(self, registro):
+        valor = getattr(registro, CAMPO_DO_REGISTRO[self.campo])
+        if (self.campo == "data_investimento" and valor == SEM_DATA) or (self.campo == "taxa_de_juros" and valor == SEM_VALOR):
+            return False  # Campo vazio nunca está na faixa.
+        return self.minimo <= valor <= self.maximo
+
+    def sql(self):  # (condição, parâmetros) equivalentes no banco SQLite.
+        if self.minimo == self.maximo:
+            return f"{self.campo} = ?", [self.minimo]
+        condicoes, parametros = [], []
+        if self.minimo != -math.inf:
+            condicoes.append(f"{self.campo} >= ?")
+            parametros.append(self.minimo)
+        if self.maximo != math.inf:
+            condicoes.append(f"{self.campo} <= ?")
+            parametros.append(self.maximo)
+        if not condicoes:
+            return f"{self.campo} IS NOT NULL", []
+        return " AND ".join(condicoes), parametros
+
+    def __str__(self):
+        if self.minimo == -math.inf and self.maximo == math.inf:  # Faixa aberta dos dois lados: só exige o campo preenchido.
+            return f"{self.campo} preenchido"
+        if self.minimo == self.maximo:
+            return f"{self.campo} = {_formata(self.campo, self.minimo)}"
+        if self.maximo == math.inf:
+            return f"{self.campo} >= {_formata(self.campo, self.minimo)}"
+        if self.minimo == -math.inf:
+            return f"{self.campo} <= {_formata(self.campo, self.maximo)}"
+        return f"{self.campo} entre {_formata(self.campo, self.minimo)} e {_formata(self.campo, self.maximo)}"
+
+
+class Tipos:  # tipo em um conjunto de códigos.
+    def __init__(self, codigos):
+        self.codigos = tuple(sorted(set(codigos)))
+
+    def estimativa(self, indices):
+        return sum(indices.quantidade_por_tipo(codigo) for codigo in self.codigos)
+
+    def busca(self, indices):
+        if len(self.codigos) == 1:
+            return indices.ids_do_tipo(self.codigos[0])
+        ids = set()
+        for codigo in self.codigos:
+            ids.update(indices.ids_do_tipo(codigo))
+        return ids
+
+    def confere(self, registro):
+        return registro.tipo in self.codigos
+
+    def sql(self):
+        return f"tipo IN ({', '.join('?' * len(self.codigos))})", list(self.codigos)
+
+    def __str__(self):
+        nomes = ", ".join(TIPOS[codigo] for codigo in self.codigos)
+        return f"tipo = {nomes}" if len(self.codigos) == 1 else f"tipo em {nomes}"
+
+
+class E:  # Todos os filhos valem.
+    def __init__(self, filhos):
+        self.filhos = filhos
+
+    def estimativa(self, indices):
+        return min(filho.estimativa(indices) for filho in self.filhos)
+
+    def confere(self, registro):
+        return all(filho.confere(registro) for filho in self.filhos)
+
+    def sql(self):
+        partes = [filho.sql() for filho in self.filhos]
+        return " AND ".join(f"({condicao})" for condicao, _ in partes), [parametro for _, parametros in partes for parametro in parametros]
+
+    def __str__(self):
+        return "(" + " e ".join(map(str, self.filhos)) + ")"
+
+
+class Ou:  # Pelo menos um dos filhos vale.
+    def __init__(self, filhos):
+        self.filhos = filhos
+
+    def estimativa(self, indices):
+        return sum(filho.estimativa(indices) for filho in self.filhos)
+
+    def confere(self, registro):
+        return any(filho.confere(registro) for filho in self.filhos)
+
+    def sql(self):
+        partes = [filho.sql() for filho in self.filhos]
+        return " OR ".join(f"({condicao})" for condicao, _ in partes), [parametro for _, parametros in partes for parametro in parametros]
+
+    def __str__(self):
+        return "(" + " ou ".join(map(str, self.filhos)) + ")"
+
+
+def monta(filtro):  # Converte o dict do filtro para a árvore de critérios (Faixa, Tipos, E, Ou). Filtro vazio vira None (todos os lançamentos).
+    if not isinstance(filtro, dict):
+        raise ValueError(f"Filtro inválido: {filtro!r}")
+    filhos = []
+    for chave, valor in filtro.items():
+        if chave in ("e", "ou"):
+            if not isinstance(valor, list) or not valor:
+                raise ValueError(f"'{chave}' precisa de uma lista de filtros.")
+            partes = [monta(parte) for parte in valor]
+            if None in partes:  # Um filtro vazio vale para todos: some do E e faz o OU valer para todos.
+                if chave == "ou":
+                    return None
+                partes = [parte for parte in partes if parte is not None]
+            if partes:
+                filhos.append(partes[0] if len(partes) == 1 else (E if chave == "e" else Ou)(partes))
+        elif chave == "tipo":
+            nomes = valor if isinstance(valor, (list, tuple)) else [valor]
+            codigos = []
+            for nome in nomes:
+                if str(nome).lower() not in CODIGO_POR_NOME:
+                    raise ValueError(f"Tipo de lançamento inválido: {nome!r}")
+                codigos.append(CODIGO_POR_NOME[str(nome).lower()])
+            filhos.append(Tipos(codigos))
+        elif chave in FAIXAS:
+            if isinstance(valor, (list, tuple)):
+                if len(valor) != 2:
+                    raise ValueError(f"A faixa de {chave} precisa de [mínimo, máximo].")
+                minimo, maximo = valor
+            else:
+                minimo = maximo = valor
+                if valor is None:
+                    raise ValueError(f"Faltou o valor do filtro de {chave}.")
+            filhos.append(Faixa(chave, _ponta(chave, minimo, -math.inf), _ponta(chave, maximo, math.inf)))
+        else:
+            raise ValueError(f"Critério de filtro desconhecido: {chave!r}")
+    if not filhos:
+        return None
+    return filhos[0] if len(filhos) == 1 else E(filhos)
+
+
+def faixa_de_datas(no):  # (mínimo, máximo) ordinais de data que o filtro (árvore já montada) pode aceitar; None nas pontas abertas.
+    # Usado para gerar só as ocorrências das recorrências que o filtro pode pegar (ver recorrencias.py): E intersecta as faixas e OU junta.
+    if isinstance(no, Faixa) and no.campo == "data":
+        return (None if no.minimo == -math.inf else no.minimo), (None if no.maximo == math.inf else no.maximo)
+    if isinstance(no, (E, Ou)):
+        faixas = [faixa_de_datas(filho) for filho in no.filhos]
+        minimos, maximos = [minimo for minimo, _ in faixas], [maximo for _, maximo in faixas]
+        if isinstance(no, E):
+            return max((minimo for minimo in minimos if minimo is not None), default=None), min((maximo for maximo in maximos if maximo is not None), default=None)
+        return (None if None in minimos else min(minimos)), (None if None in maximos else max(maximos))
+    return None, None
+
+
+def _resolve(no, indices, nivel, plano):  # Busca os ids do nó pelos índices e anota os passos no plano. Devolve um conjunto (ou view de dict).
+    if isinstance(no, Ou):
+        linha = len(plano)
+        plano.append(None)
+        ids = set()
+        for filho in no.filhos:
+            ids.update(_resolve(filho, indices, nivel + 1, plano))
+        plano[linha] = (nivel, "OU (união)", no.estimativa(indices), 0, len(ids))
+        return ids
+    if isinstance(no, E):
+        linha = len(plano)
+        plano.append(None)
+        filhos = sorted(((filho.estimativa(indices), ordem, filho) for ordem, filho in enumerate(no.filhos)), key=lambda item: item[:2])
+        ids = _resolve(filhos[0][2], indices, nivel + 1, plano)
+        for estimativa, _, filho in filhos[1:]:
+            if not ids:
+                plano.append((nivel + 1, f"pula {filho} (nenhum candidato)", estimativa, 0, 0))
+            elif estimativa <= FATOR_CONFERENCIA * len(ids):
+                outros = _resolve(filho, indices, nivel + 1, plano)
+                ids = {id_ for id_ in ids if id_ in outros}
+            else:
+                registro_por_id = indices.lancamentos.registro_por_id
+                examinadas = len(ids)
+                ids = {id_ for id_ in ids if filho.confere(registro_por_id(id_))}
+                plano.append((nivel + 1, f"confere {filho}", estimativa, examinadas, len(ids)))
+        plano[linha] = (nivel, "E (interseção)", min(item[0] for item in filhos), 0, len(ids))
+        return ids
+    ids = no.busca(indices)
+    plano.append((nivel, f"índice {no}", no.estimativa(indices), len(ids), len(ids)))
+    return ids
+
+
+def executa(filtro, indices):  # (ids em ordem crescente, linhas do plano) de um filtro (dict ou árvore já montada), pelos índices em memória.
+    no = monta(filtro) if isinstance(filtro, dict) else filtro
+    if no is None:
+        ids = list(indices.lancamentos)
+        return ids, [f"varredura de todos os lançamentos: {len(ids)} linhas examinadas, {len(ids)} resultados"]
+    plano = []
+    ids = sorted(_resolve(no, indices, 0, plano))
+    examinadas = sum(passo[3] for passo in plano)
+    linhas = [f"{len(ids)} resultados, {examinadas} linhas examinadas"]
+    for nivel, descricao, estimativa, examinadas, resultado in plano:
+        detalhe = f"estimativa {estimativa}, resultado {resultado}" if not examinadas else f"estimativa {estimativa}, examinadas {examinadas}, resultado {resultado}"
+        linhas.append(f"{'  ' * nivel}{descricao}  [{detalhe}]")
+    return ids, linhas
+
+
+# ---- filtro escrito como texto (menu) ----
+
+ALIASES = {"taxa": "taxa_de_juros", "investimento": "data_investimento"}
+_TOKENS = re.compile(r"\(|\)|[^\s()]+")
+_VIRGULA = re.compile(r"\s*,\s*")
+
+
+def interpreta(texto):  # Converte o filtro escrito no menu para o dict do filtro. ValueError se não entender.
+    # Critério: <campo> <valor>, com faixas 'a..b', 'a..' ou '..b'; tipo aceita vários nomes separados por vírgula.
+    # 'e' vale antes de 'ou'; parênteses agrupam. Os espaços em volta das vírgulas são tirados antes, então 'tipo Receita, Despesa' também vale.
+    tokens = _TOKENS.findall(_VIRGULA.sub(",", texto))
+    posicao = 0
+
+    def proximo():
+        return tokens[posicao].lower() if posicao < len(tokens) else None
+
+    def expressao():
+        nonlocal posicao
+        partes = [termo()]
+        while proximo() == "ou":
+            posicao += 1
+            partes.append(termo())
+        return partes[0] if len(partes) == 1 else {"ou": partes}
+
+    def termo():
+        nonlocal posicao
+        partes = [fator()]
+        while proximo() == "e":
+            posicao += 1
+            partes.append(fator())
+        return partes[0] if len(partes) == 1 else {"e": partes}
+
+    def fator():
+        nonlocal posicao
+        if proximo() == "(":
+            posicao += 1
+            dentro = expressao()
+            if proximo() != ")":
+                raise ValueError("Faltou fechar o parêntese.")
+            posicao += 1
+            return dentro
+        if posicao + 1 >= len(tokens):
+            raise ValueError("Filtro incompleto: cada critério é '<campo> <valor>'.")
+        campo, valor = ALIASES.get(proximo(), proximo()), tokens[posicao + 1]
+        posicao += 2
+        if campo == "tipo":
+            return {"tipo": valor.split(",")}
+        if campo not in FAIXAS:
+            raise ValueError(f"Campo desconhecido: {tokens[posicao - 2]!r} (use data, tipo, valor, taxa ou investimento).")
+        if ".." in valor:
+            minimo, maximo = valor.split("..", 1)
+            return {campo: [minimo or None, maximo or None]}
+        return {campo: valor}
+
+    if not tokens:
+        return {}
+    filtro = expressao()
+    if posicao != len(tokens):
+        raise ValueError(f"Não entendi o filtro a partir de {tokens[posicao]!r}.")
+    return filtro
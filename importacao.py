@@ -0,0 +1,183 @@
+import array
+import csv
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import struct
+import time
+
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR, data_para_ordinal, reais_para_centavos, taxa_para_inteiro
+from exportacao import formato_pelo_nome
+
+
+# Importação em massa de extratos (CSV ou JSON Lines, comprimidos com gzip ou não) para o livro-caixa.
+# O arquivo é lido em fluxo, linha a linha, e os lançamentos entram em lotes de TAMANHO_LOTE (incluir_em_lote do armazenamento):
+# a memória usada não depende do tamanho do extrato, só do livro-caixa que já existe. Depois de cada lote chama 'ao_gravar_lote'
+# (normalmente o salvamento do diário, ou o COMMIT no banco SQLite), para as alterações pendentes não crescerem com o extrato.
+#
+# Cada linha tem os campos do registros.csv (data, tipo, valor e, nos investimentos, taxa_de_juros e data_investimento); o id e o
+# investimento_atualizado do arquivo são ignorados. As regras são as do criar_registro: despesa negativa (receita e investimento positivos),
+# campos de investimento só no investimento, data do investimento igual à do lançamento quando não vier. Datas em dd/mm/aaaa ou aaaa-mm-dd,
+# valores com ponto ou vírgula decimal. Linhas inválidas são puladas e contadas, com as primeiras mensagens de erro guardadas.
+# Os ids novos saem de um contador que começa em lancamentos.proximo_id(), O(1) por lançamento.
+#
+# Duplicados: um lançamento do extrato que já está no livro-caixa (mesma data, tipo, valor e taxa) é pulado. O livro-caixa vira um
+# IndiceDeConteudo, com o hash desses campos de cada lançamento. Cada lançamento existente só "casa" com uma linha do extrato, então
+# importar o mesmo extrato de novo não inclui nada, e duas compras iguais no mesmo dia continuam sendo duas.
+TAMANHO_LOTE = 10_000
+MAXIMO_ERROS = 100  # Mensagens de erro guardadas no resumo; as outras linhas inválidas só são contadas.
+CODIGO_POR_NOME = {nome.lower(): codigo for nome, codigo in CODIGO_TIPO.items()}
+DESPESA = CODIGO_TIPO["Despesa"]
+INVESTIMENTO = CODIGO_TIPO["Investimento"]
+FORMATOS = ("csv", "csv.gz", "jsonl", "jsonl.gz")
+
+
+class IndiceDeConteudo:  # Multiconjunto de hashes de 64 bits numa tabela de endereçamento aberto (array('q')), 16 bytes por lançamento.
+    # Um dict ou set de ints do Python gastaria umas 4 vezes mais por entrada. Cada hash incluído ocupa uma posição; 'consome' troca a
+    # primeira posição com o hash por CONSUMIDO, que não interrompe a sondagem das outras posições (linear, a partir de hash & mascara).
+    VAZIO = 0
+    CONSUMIDO = 1
+
+    def __init__(self, quantidade):
+        capacidade = 1024
+        while capacidade < 2 * quantidade:  # No máximo metade ocupada, para as sondagens ficarem curtas.
+            capacidade *= 2
+        self.mascara = capacidade - 1
+        self.tabela = array.array("q", bytes(8 * capacidade))
+
+    @staticmethod
+    def _hash(chave):  # 64 bits do BLAKE2b da chave (data, tipo, valor, taxa).
+        # O hash() do Python não serve: o de inteiros é quase a identidade (hash(-1) == hash(-2)), e chaves diferentes viram o mesmo valor.
+        valor = int.from_bytes(hashlib.blake2b(struct.pack("<qqqq", *chave), digest_size=8).digest(), "little", signed=True)
+        return valor + 2 if valor in (0, 1) else valor  # 0 e 1 são reservados para VAZIO e CONSUMIDO.
+
+    def inclui(self, chave):
+        valor = self._hash(chave)
+        tabela, mascara = self.tabela, self.mascara
+        posicao = valor & mascara
+        while tabela[posicao] != self.VAZIO:
+            posicao = (posicao + 1) & mascara
+        tabela[posicao] = valor
+
+    def consome(self, chave):  # Tira uma ocorrência da chave. Retorna True se havia uma (o lançamento é duplicado).
+        valor = self._hash(chave)
+        tabela, mascara = self.tabela, self.mascara
+        posicao = valor & mascara
+        while True:
+            atual = tabela[posicao]
+            if atual == valor:
+                tabela[posicao] = self.CONSUMIDO
+                return True
+            if atual == self.VAZIO:
+                return False
+            posicao = (posicao + 1) & mascara
+
+
+def indice_do_livro(lancamentos):  # IndiceDeConteudo com a chave (data, tipo, valor, taxa) de todos os lançamentos, lidos em blocos.
+    indice = IndiceDeConteudo(len(lancamentos))
+    for bloco in lancamentos.registros_em_blocos():
+        for _, data, tipo, valor, taxa, _, _ in bloco:
+            indice.inclui((data, tipo, valor, taxa))
+    return indice
+
+
+def _data(texto):  # 'dd/mm/aaaa' ou 'aaaa-mm-dd' -> ordinal.
+    texto = texto.strip()
+    try:
+        if "-" in texto:
+            return datetime.date.fromisoformat(texto).toordinal()
+        return data_para_ordinal(texto)
+    except (ValueError, TypeError):
+        raise ValueError(f"Data inválida: {texto!r}") from None
+
+
+def _numero(texto):  # Aceita número ou texto com ponto ou vírgula decimal ("12.34" ou "12,34").
+    if isinstance(texto, str) and "," in texto and "." not in texto:
+        return texto.replace(",", ".")
+    return texto
+
+
+def normaliza(linha):  # Converte uma linha do extrato (dict) para os valores crus das colunas, pelas regras do criar_registro. ValueError se for inválida.
+    tipo = linha.get("tipo")
+    codigo = CODIGO_POR_NOME.get(str(tipo).strip().lower())
+    if codigo is None:
+        raise ValueError(f"Tipo de lançamento inválido: {tipo!r}")
+    if not linha.get("data") or linha.get("valor") in (None, ""):
+        raise ValueError("Data e valor são obrigatórios.")
+    data = _data(linha["data"])
+    valor = abs(reais_para_centavos(_numero(linha["valor"])))
+    if codigo == DESPESA:
+        valor = -valor
+    if codigo != INVESTIMENTO:
+        return data, codigo, valor, SEM_VALOR, SEM_DATA, SEM_VALOR
+    taxa = linha.get("taxa_de_juros")
+    data_investimento = linha.get("data_investimento")
+    return (data, codigo, valor, SEM_VALOR if taxa in (None, "") else taxa_para_inteiro(_numero(taxa)),
+            _data(data_investimento) if data_investimento else data, SEM_VALOR)
+
+
+def _linhas(caminho, formato):  # Gera (número da linha no arquivo, dict ou erro de leitura) em fluxo.
+    texto = gzip.open(caminho, "rt", encoding="utf-8-sig", newline="") if formato.endswith(".gz") else open(caminho, encoding="utf-8-sig", newline="")
+    with texto as file:
+        if formato.startswith("csv"):
+            leitor = csv.DictReader(file)
+            for linha in leitor:
+                yield leitor.line_num, linha
+            return
+        for numero, bruta in enumerate(file, start=1):
+            if not bruta.strip():
+                continue
+            try:
+                linha = json.loads(bruta)
+            except ValueError as erro:
+                yield numero, ValueError(f"JSON inválido: {erro}")
+                continue
+            yield numero, linha if isinstance(linha, dict) else ValueError("A linha não é um objeto JSON.")
+
+
+def importa(lancamentos, caminho, formato=None, ignorar_duplicados=True, ao_gravar_lote=None, tamanho_lote=TAMANHO_LOTE):  # Importa o extrato e devolve o resumo (dict).
+    # Resumo: lidas, importadas, duplicadas, invalidas, erros (até MAXIMO_ERROS pares [linha, mensagem]), segundos e linhas_por_segundo.
+    formato = formato or formato_pelo_nome(caminho)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de importação desconhecido: {formato!r} (use {', '.join(FORMATOS)}).")
+    if not os.path.exists(caminho):
+        raise ValueError(f"Arquivo {caminho} não encontrado.")
+    inicio = time.perf_counter()
+    indice = indice_do_livro(lancamentos) if ignorar_duplicados and len(lancamentos) else None
+    proximo_id = lancamentos.proximo_id()
+    resumo = {"lidas": 0, "importadas": 0, "duplicadas": 0, "invalidas": 0, "erros": []}
+    lote = []
+
+    def grava():
+        lancamentos.incluir_em_lote(lote)
+        resumo["importadas"] += len(lote)
+        lote.clear()
+        if ao_gravar_lote is not None:
+            ao_gravar_lote()
+
+    for numero, linha in _linhas(caminho, formato):
+        resumo["lidas"] += 1
+        try:
+            if isinstance(linha, Exception):
+                raise linha
+            valores = normaliza(linha)
+        except (ValueError, TypeError, AttributeError) as erro:
+            resumo["invalidas"] += 1
+            if len(resumo["erros"]) < MAXIMO_ERROS:
+                resumo["erros"].append([numero, str(erro)])
+            continue
+        if indice is not None and indice.consome(valores[:4]):
+            resumo["duplicadas"] += 1
+            continue
+        lote.append((proximo_id, valores))
+        proximo_id += 1
+        if len(lote) >= tamanho_lote:
+            grava()
+    if lote:
+        grava()
+
+    resumo["segundos"] = time.perf_counter() - inicio
+    resumo["linhas_por_segundo"] = resumo["lidas"] / resumo["segundos"] if resumo["segundos"] else 0.0
+    return resumo
@@ -0,0 +1,226 @@
+import array
+import bisect
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR
+
+from armazenamento import REMOVIDO, SEM_DATA, SEM_VALOR, reais_para_centavos
+from filtros import executa
+
+
+class ListaOrdenada:  # Lista ordenada de (chave, id) respondida por bisseção, com as inclusões e exclusões acumuladas até a próxima consulta.
+    # Assim carregar um arquivo inteiro custa uma ordenação só, em vez de uma inserção ordenada por linha.
+    LIMITE_REORDENAR = 1024  # Acima dessa quantidade de mudanças pendentes é mais barato reordenar a lista inteira.
+
+    def __init__(self, itens=()):
+        self.itens = sorted(itens)
+        self._inclusoes = set()
+        self._exclusoes = set()
+
+    def inclui(self, chave):
+        if chave in self._exclusoes:  # Ainda está na lista ordenada, basta desistir da exclusão.
+            self._exclusoes.discard(chave)
+        else:
+            self._inclusoes.add(chave)
+
+    def retira(self, chave):
+        if chave in self._inclusoes:  # Ainda nem tinha entrado na lista ordenada.
+            self._inclusoes.discard(chave)
+        else:
+            self._exclusoes.add(chave)
+
+    def _aplica_pendentes(self):  # Leva as inclusões e exclusões acumuladas para a lista ordenada.
+        if not self._inclusoes and not self._exclusoes:
+            return
+        if len(self._inclusoes) + len(self._exclusoes) > self.LIMITE_REORDENAR:
+            exclusoes = self._exclusoes
+            self.itens = [chave for chave in self.itens if chave not in exclusoes]
+            self.itens.extend(self._inclusoes)
+            self.itens.sort()
+        else:
+            for chave in self._exclusoes:
+                posicao = bisect.bisect_left(self.itens, chave)
+                if posicao < len(self.itens) and self.itens[posicao] == chave:
+                    del self.itens[posicao]
+            for chave in self._inclusoes:
+                bisect.insort(self.itens, chave)
+        self._inclusoes = set()
+        self._exclusoes = set()
+
+    def posicoes(self, minimo, maximo):  # (início, fim) da fatia de itens com minimo <= chave <= maximo.
+        self._aplica_pendentes()
+        return bisect.bisect_left(self.itens, (minimo, -math.inf)), bisect.bisect_right(self.itens, (maximo, math.inf))
+
+    def quantidade(self, minimo, maximo):
+        inicio, fim = self.posicoes(minimo, maximo)
+        return fim - inicio
+
+    def ids(self, minimo, maximo):  # Conjunto dos ids com minimo <= chave <= maximo.
+        inicio, fim = self.posicoes(minimo, maximo)
+        return {id_ for _, id_ in self.itens[inicio:fim]}
+
+
+SEM_CHAVES = (None, None, None, None, None)  # Chaves de um lançamento que não existe (antes de uma inclusão, depois de uma exclusão).
+
+
+def _chaves(registro):  # Campos indexados de um Registro: (data, tipo, valor, taxa ou None, data do investimento ou None).
+    if registro is None:
+        return SEM_CHAVES
+    taxa = registro.taxa if registro.taxa != SEM_VALOR else None
+    data_inv = registro.data_inv if registro.data_inv != SEM_DATA else None
+    return registro.data, registro.tipo, registro.valor, taxa, data_inv
+
+
+class IndiceLancamentos:  # Índices secundários dos lançamentos, mantidos a cada inclusão, edição ou exclusão (é um observador do armazenamento colunar).
+    # por_data:  dict ordinal da data -> dict de ids (usado como conjunto ordenado por inclusão), índice hash para data igual;
+    #            'datas' é a lista ordenada das datas que têm lançamento, para faixas de data, e '_contagem' uma árvore de Fenwick
+    #            com a quantidade de ids de cada uma (na posição dela em 'datas' mais 1): quantos ids uma faixa de datas tem sai em O(log n).
+    #            Uma data nova ou que some muda as posições, então a árvore é remontada (O(datas distintas)) na consulta seguinte.
+    # por_tipo:  dict código do tipo -> dict de ids, uma lista de ocorrências por tipo.
+    # por_valor, por_taxa, por_data_investimento: ListaOrdenada de (valor, id), respondidas por bisseção para faixas.
+    #            As chaves são os inteiros das colunas (centavos, taxa em ponto fixo): as faixas chegam já convertidas (ver filtros._ponta).
+    #            Taxa e data do investimento só têm os lançamentos com o campo preenchido (os investimentos).
+    # Os filtros compostos (filtros.py) usam quantidade_na_faixa para estimar quantos ids cada critério devolve antes de buscá-los.
+    def __init__(self, lancamentos):
+        self.lancamentos = lancamentos
+        self.recriar()
+        lancamentos.observadores.append(self)
+
+    def recriar(self):  # Monta todos os índices do zero, varrendo as colunas.
+        self.por_data = {}
+        self.por_tipo = {}
+        valores, taxas, datas_inv = [], [], []
+        lancamentos = self.lancamentos
+        for id_, data, tipo, valor, taxa, data_inv in zip(lancamentos.ids, lancamentos.datas, lancamentos.tipos, lancamentos.valores,
+                                                          lancamentos.taxas, lancamentos.datas_inv):
+            if tipo != REMOVIDO:
+                self.por_data.setdefault(data, {})[id_] = None
+                self.por_tipo.setdefault(tipo, {})[id_] = None
+                valores.append((valor, id_))
+                if taxa != SEM_VALOR:
+                    taxas.append((taxa, id_))
+                if data_inv != SEM_DATA:
+                    datas_inv.append((data_inv, id_))
+        self.datas = sorted(self.por_data)
+        self._contagem = None
+        self.por_valor = ListaOrdenada(valores)
+        self.por_taxa = ListaOrdenada(taxas)
+        self.por_data_investimento = ListaOrdenada(datas_inv)
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):  # Só mexe nos índices dos campos que mudaram (numa troca de taxa, só no índice de taxa).
+        data_antes, tipo_antes, valor_antes, taxa_antes, inv_antes = _chaves(antes)
+        data_depois, tipo_depois, valor_depois, taxa_depois, inv_depois = _chaves(depois)
+        id_ = antes.id if antes is not None else depois.id
+        if data_antes != data_depois:
+            if data_antes is not None:
+                self._retira(self.por_data, data_antes, id_)
+                if data_antes not in self.por_data:
+                    del self.datas[bisect.bisect_left(self.datas, data_antes)]
+                    self._contagem = None
+                else:
+                    self._conta(data_antes, -1)
+            if data_depois is not None:
+                if data_depois not in self.por_data:
+                    bisect.insort(self.datas, data_depois)
+                    self._contagem = None
+                else:
+                    self._conta(data_depois, 1)
+                self.por_data.setdefault(data_depois, {})[id_] = None
+        if tipo_antes != tipo_depois:
+            if tipo_antes is not None:
+                self._retira(self.por_tipo, tipo_antes, id_)
+            if tipo_depois is not None:
+                self.por_tipo.setdefault(tipo_depois, {})[id_] = None
+        for lista, chave_antes, chave_depois in ((self.por_valor, valor_antes, valor_depois), (self.por_taxa, taxa_antes, taxa_depois),
+                                                 (self.por_data_investimento, inv_antes, inv_depois)):
+            if chave_antes != chave_depois:
+                if chave_antes is not None:
+                    lista.retira((chave_antes, id_))
+                if chave_depois is not None:
+                    lista.inclui((chave_depois, id_))
+
+    def limpo(self):
+        self.recriar()
+
+    def _conta(self, data, diferenca):  # Soma 'diferenca' na quantidade de uma data que já está em 'datas', em O(log n).
+        contagem = self._contagem
+        if contagem is None:
+            return
+        posicao = bisect.bisect_left(self.datas, data) + 1
+        while posicao < len(contagem):
+            contagem[posicao] += diferenca
+            posicao += posicao & -posicao
+
+    def _monta_contagem(self):  # Remonta a árvore de Fenwick das quantidades por data, em O(datas distintas).
+        contagem = array.array("q", [0])
+        contagem.extend(len(self.por_data[data]) for data in self.datas)
+        for posicao in range(1, len(contagem)):
+            acima = posicao + (posicao & -posicao)
+            if acima < len(contagem):
+                contagem[acima] += contagem[posicao]
+        self._contagem = contagem
+
+    def _quantidade_ate(self, posicao):  # Quantos ids têm as datas das posições 0..posicao-1 de 'datas'.
+        contagem = self._contagem
+        total = 0
+        while posicao > 0:
+            total += contagem[posicao]
+            posicao -= posicao & -posicao
+        return total
+
+    @staticmethod
+    def _retira(indice, chave, id_):
+        ids = indice.get(chave)
+        if ids is not None:
+            ids.pop(id_, None)
+            if not ids:
+                del indice[chave]
+
+    # ---- consultas, todas retornam os ids em ordem crescente ----
+
+    def ids_por_data(self, ordinal):
+        return sorted(self.por_data.get(ordinal, ()))
+
+    def ids_por_tipo(self, codigo):
+        return sorted(self.por_tipo.get(codigo, ()))
+
+    def ids_por_faixa_de_valor(self, minimo, maximo):  # Ids com minimo <= valor <= maximo (em reais), encontrados por bisseção na lista ordenada.
+        return sorted(self.por_valor.ids(reais_para_centavos(minimo, ROUND_CEILING), reais_para_centavos(maximo, ROUND_FLOOR)))
+
+    def consulta(self, filtro):  # Ids (em ordem crescente) que atendem um filtro composto, e as linhas do plano usado (ver filtros.py).
+        return executa(filtro, self)
+
+    # ---- acesso usado pelo planejador dos filtros compostos; devolvem conjuntos (ou views de dict), sem ordenar ----
+
+    def _faixa_de_datas(self, minimo, maximo):
+        return self.datas[bisect.bisect_left(self.datas, minimo):bisect.bisect_right(self.datas, maximo)]
+
+    def quantidade_na_faixa(self, campo, minimo, maximo):  # Quantos lançamentos têm o campo ("data", "valor", "taxa_de_juros" ou "data_investimento") na faixa, em O(log n).
+        if campo == "data":
+            if self._contagem is None:
+                self._monta_contagem()
+            if minimo > maximo:
+                return 0
+            return self._quantidade_ate(bisect.bisect_right(self.datas, maximo)) - self._quantidade_ate(bisect.bisect_left(self.datas, minimo))
+        return self._listas()[campo].quantidade(minimo, maximo)
+
+    def ids_na_faixa(self, campo, minimo, maximo):
+        if campo != "data":
+            return self._listas()[campo].ids(minimo, maximo)
+        datas = self._faixa_de_datas(minimo, maximo)
+        if len(datas) == 1:
+            return self.por_data[datas[0]].keys()
+        ids = set()
+        for data in datas:
+            ids.update(self.por_data[data])
+        return ids
+
+    def quantidade_por_tipo(self, codigo):
+        return len(self.por_tipo.get(codigo, ()))
+
+    def ids_do_tipo(self, codigo):
+        return self.por_tipo.get(codigo, {}).keys()
+
+    def _listas(self):
+        return {"valor": self.por_valor, "taxa_de_juros": self.por_taxa, "data_investimento": self.por_data_investimento}
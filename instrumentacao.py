@@ -0,0 +1,136 @@
+import atexit
+import builtins
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+
+
+# Medição das operações do livro-caixa: quantidade de chamadas, tempo total, p50/p99 e linhas tocadas por operação.
+# As funções medidas são marcadas com @medido("nome"). Desligada (o padrão), a marcação custa só um teste de booleano por chamada.
+# Liga com 'python main.py --perfil' ou ECOBALANCE_PERFIL=1, e mostra o resumo na saída de erro ao sair do programa.
+# Opcionalmente grava um trace JSON (formato "Trace Event", abre no chrome://tracing ou no Perfetto) e um perfil do cProfile:
+#   ECOBALANCE_PERFIL_TRACE=trace.json  ou  --perfil-trace trace.json
+#   ECOBALANCE_PERFIL_CPROFILE=perfil.prof  ou  --perfil-cprofile perfil.prof  (ler com python -m pstats perfil.prof)
+# O tempo esperando o usuário digitar (input) é descontado da operação, senão editar e excluir mediriam a pessoa e não o programa.
+_ativa = False
+_operacoes = {}  # nome -> {"tempos": [segundos de cada chamada], "linhas": total de linhas tocadas}
+_pilha = []  # Operações em andamento, da mais externa para a mais interna: [nome, linhas, segundos esperando input]
+_eventos = None  # Eventos do trace JSON, quando pedido.
+_caminho_trace = None
+_perfil = None
+_caminho_cprofile = None
+_inicio = 0.0
+_input_original = None
+_contadores = {}  # nome -> função que devolve um dict de contadores, mostrados depois do resumo (o cache de resultados, por exemplo).
+
+
+def ativa():
+    return _ativa
+
+
+def ativar(trace=None, cprofile=None):  # Liga a medição (e o trace/cProfile, se os caminhos forem dados). O resumo sai no fim do programa.
+    global _ativa, _eventos, _caminho_trace, _perfil, _caminho_cprofile, _inicio, _input_original
+    if _ativa:
+        return
+    _ativa = True
+    _inicio = time.perf_counter()
+    if trace:
+        _eventos = []
+        _caminho_trace = trace
+    if cprofile:
+        _caminho_cprofile = cprofile
+        _perfil = cProfile.Profile()
+        _perfil.enable()
+    _input_original = builtins.input
+    builtins.input = _input_medido
+    atexit.register(encerrar)
+
+
+def registra_contadores(nome, funcao):  # Mostra os contadores devolvidos por funcao() no fim do resumo.
+    _contadores[nome] = funcao
+
+
+def ativar_pelo_ambiente():  # Liga a medição se ECOBALANCE_PERFIL=1 ou se algum caminho de trace/cProfile estiver no ambiente.
+    trace = os.environ.get("ECOBALANCE_PERFIL_TRACE")
+    cprofile = os.environ.get("ECOBALANCE_PERFIL_CPROFILE")
+    if os.environ.get("ECOBALANCE_PERFIL") == "1" or trace or cprofile:
+        ativar(trace, cprofile)
+
+
+def _input_medido(prompt=""):  # Substitui o input() enquanto a medição está ligada, contando o tempo de espera na operação atual.
+    inicio = time.perf_counter()
+    try:
+        return _input_original(prompt)
+    finally:
+        if _pilha:
+            _pilha[-1][2] += time.perf_counter() - inicio
+
+
+def medido(nome):  # Decorador: mede cada chamada da função como uma ocorrência da operação 'nome'.
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not _ativa:
+                return funcao(*args, **kwargs)
+            atual = [nome, 0, 0.0]
+            _pilha.append(atual)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                fim = time.perf_counter()
+                _pilha.pop()
+                _registra(atual, inicio, fim)
+        return medida
+    return decorador
+
+
+def conta_linhas(quantidade, operacao=None):  # Soma 'quantidade' nas linhas tocadas pela operação em andamento. 'operacao' troca o nome dela (filtrar vira filtro_data, por exemplo).
+    if _ativa and _pilha:
+        _pilha[-1][1] += quantidade
+        if operacao is not None:
+            _pilha[-1][0] = operacao
+
+
+def _registra(atual, inicio, fim):
+    nome, linhas, espera = atual
+    if _pilha:  # A espera por input também não conta para a operação de fora.
+        _pilha[-1][2] += espera
+    operacao = _operacoes.setdefault(nome, {"tempos": [], "linhas": 0})
+    operacao["tempos"].append(fim - inicio - espera)
+    operacao["linhas"] += linhas
+    if _eventos is not None:
+        _eventos.append({"name": nome, "ph": "X", "pid": os.getpid(), "tid": 0,
+                         "ts": (inicio - _inicio) * 1e6, "dur": (fim - inicio) * 1e6,
+                         "args": {"linhas": linhas, "espera_input_ms": espera * 1e3}})
+
+
+def _percentil(ordenados, fracao):  # Percentil pelo posto mais próximo, numa lista já ordenada.
+    return ordenados[min(len(ordenados) - 1, max(0, int(fracao * len(ordenados) + 0.5) - 1))]
+
+
+def resumo():  # Lista de (operação, chamadas, total, p50, p99, linhas), da operação com mais tempo total para a com menos.
+    linhas = []
+    for nome, operacao in _operacoes.items():
+        tempos = sorted(operacao["tempos"])
+        linhas.append((nome, len(tempos), sum(tempos), _percentil(tempos, 0.50), _percentil(tempos, 0.99), operacao["linhas"]))
+    return sorted(linhas, key=lambda linha: linha[2], reverse=True)
+
+
+def encerrar():  # Mostra o resumo e grava o trace e o perfil pedidos. Chamada automaticamente na saída do programa.
+    if _perfil is not None:
+        _perfil.disable()
+        _perfil.dump_stats(_caminho_cprofile)
+    if _eventos is not None:
+        with open(_caminho_trace, mode="w", encoding="utf-8") as file:
+            json.dump({"traceEvents": _eventos, "displayTimeUnit": "ms"}, file)
+    if not _operacoes:
+        return
+    print(f"\n{'operação':<20} {'chamadas':>8} {'total (ms)':>11} {'p50 (ms)':>10} {'p99 (ms)':>10} {'linhas':>10}", file=sys.stderr)
+    for nome, chamadas, total, p50, p99, linhas in resumo():
+        print(f"{nome:<20} {chamadas:>8} {total * 1e3:>11.2f} {p50 * 1e3:>10.3f} {p99 * 1e3:>10.3f} {linhas:>10}", file=sys.stderr)
+    for nome, funcao in _contadores.items():
+        print(f"{nome}: " + ", ".join(f"{chave} {valor}" for chave, valor in funcao().items()), file=sys.stderr)
@@ -1,17 +1,101 @@
+import argparse  # para as opções de linha de comando (--perfil)
 import csv  # para ler e escrever arquivo csv
 import os  # para checar se o arquivo existe e limpar o terminal
 import datetime
 from tabulate import tabulate  # pra formatar a tabela na hora de mostrar
-from collections import defaultdict
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, LancamentosColunares, centavos_para_reais, data_para_ordinal, ordinal_para_data, reais_para_centavos, taxa_para_inteiro  # guarda os lançamentos em colunas (arrays tipados) com cara de dict
+from rendimento import atualizar_em_lote  # cálculo dos rendimentos de todos os investimentos de uma vez
+from rendimento import taxa_mensal_para_diaria  # noqa: F401 - mudou para rendimento.py mas continua disponível em main
+from agregados import AgregadoMensal, TotaisPorData, totais_em_reais, totais_por_periodo  # totais por mês e por intervalo de datas, mantidos a cada inclusão, edição ou exclusão
+from indices import IndiceLancamentos  # índices por data, tipo, valor, taxa e data do investimento usados nos filtros
+from filtros import faixa_de_datas, interpreta, monta  # filtros compostos com 'e' / 'ou', escritos como texto no menu
+from edicao_em_lote import alterar_em_lote, excluir_em_lote  # a mesma edição ou exclusão em todos os lançamentos de um filtro
+from diario import Diario  # diário de alterações, salvar só acrescenta o que mudou
+from snapshot import carrega_snapshot, snapshot_atualizado  # cópia binária do registros.csv, carrega bem mais rápido
+from carga_paralela import carrega_em_paralelo  # lê arquivos grandes em vários processos
+from paginacao import Paginador, PaginadorMensal, mostra_paginas  # mostra as tabelas uma página por vez
+from banco_sqlite import BancoSQLite  # armazenamento opcional num banco SQLite
+from particoes import LancamentosParticionados, LivroParticionado  # livro-caixa opcional em um arquivo por mês, carregado sob demanda
+from exportacao import exporta  # exportação em fluxo (CSV, CSV.gz, JSON Lines, colunar)
+from importacao import importa  # importação de extratos em lotes, pulando os lançamentos que já existem
+from recorrencias import FREQUENCIAS, Recorrencias  # receitas e despesas fixas guardadas como uma regra só, expandidas sob demanda
+from projecao import ProjecaoCarteira, grade_de_datas  # evolução da carteira de investimentos numa grade de datas
+from autosalvamento import ESPERA, INTERVALO, LIMITE_ALTERACOES, Autosalvamento  # salva o diário numa thread, sem esperar o 'SALVAR'
+from cache import LIMITE_PADRAO, CacheDeResultados, VersaoDoLivro  # resultados dos filtros e do resultado mensal guardados até a próxima mudança
+from instrumentacao import conta_linhas, medido  # medição de cada operação, ligada com --perfil ou ECOBALANCE_PERFIL=1
+import instrumentacao
 
 
 nome_arquivo = "registros.csv"
-# Inicia o dict de dicts lancamentos vazio.
-
-lancamentos = {}
-# O dict lancamentos tem essa estrutura {'id': 'n', 'data': 'dd/mm/aaaa', 'tipo': 'Receita/Despesa/Investimento', 'valor': 'RR.CC', 'taxa_de_juros': 'x.x', 'data_investimento': 'dd/mm/aaaa', 'investimento_atualizado': 'RR.CC'}
+tamanho_carga_paralela = 32 * 2**20  # A partir desse tamanho (em bytes) o registros.csv é lido em paralelo, abaixo dele não compensa abrir os processos.
+autosalvar_intervalo = float(os.environ.get("ECOBALANCE_AUTOSALVAR_INTERVALO", INTERVALO))  # Segundos que uma alteração pode ficar sem salvar; 0 desliga o salvamento automático.
+autosalvar_espera = float(os.environ.get("ECOBALANCE_AUTOSALVAR_ESPERA", ESPERA))  # Segundos sem alteração nova antes de salvar uma rajada de alterações.
+autosalvar_alteracoes = int(os.environ.get("ECOBALANCE_AUTOSALVAR_ALTERACOES", LIMITE_ALTERACOES))  # Salva na hora ao juntar essa quantidade de alterações.
+autosalvamento = None  # Criado pelo roda_programa, depois da carga (ver autosalvamento.py).
+# Inicia o "dict" lancamentos vazio. Por dentro ele é colunar (ver armazenamento.py), mas por fora funciona igual ao dict de dicts antigo.
+
+lancamentos = LancamentosColunares()
+# Cada lancamento tem essa estrutura {'id': 'n', 'data': 'dd/mm/aaaa', 'tipo': 'Receita/Despesa/Investimento', 'valor': 'RR.CC', 'taxa_de_juros': 'x.x', 'data_investimento': 'dd/mm/aaaa', 'investimento_atualizado': 'RR.CC'}
 # Chamamos de "lancamentos" o dict 'maior'.
 # Chamamos de "lancamento" os valores armazenados em cada 'chave' ID do dict lancamentos.
+# Os campos opcionais (taxa_de_juros, data_investimento, investimento_atualizado) só aparecem quando estão preenchidos.
+
+resultado_mensal = AgregadoMensal(lancamentos)
+# Totais de cada mês, atualizados automaticamente sempre que 'lancamentos' muda. É o que a opção 6 mostra.
+
+indices = IndiceLancamentos(lancamentos)
+# Índices por data, tipo, valor, taxa e data do investimento, também atualizados automaticamente. Os filtros consultam os índices em vez de percorrer todos os lançamentos.
+
+totais_por_data = TotaisPorData(lancamentos)
+# Receita, despesa e rendimento de qualquer intervalo de datas (árvores de Fenwick por dia), também atualizados automaticamente. É o que a opção 9 mostra.
+
+diario = Diario(lancamentos, nome_arquivo)
+# Guarda o que mudou desde o último salvamento. Salvar acrescenta essas mudanças no arquivo "registros.csv.diario", a compactação junta tudo de volta no "registros.csv".
+
+banco_sqlite = os.environ.get("ECOBALANCE_SQLITE")
+if banco_sqlite:  # Com ECOBALANCE_SQLITE=registros.db os lançamentos ficam num banco SQLite, que faz sozinho o papel das cinco estruturas acima (ver banco_sqlite.py).
+    nome_arquivo = banco_sqlite
+    lancamentos = resultado_mensal = indices = totais_por_data = diario = BancoSQLite(banco_sqlite)
+
+particoes = None
+if os.environ.get("ECOBALANCE_PARTICOES") == "1" and not banco_sqlite:  # Com ECOBALANCE_PARTICOES=1 cada mês fica num arquivo, e só os meses usados são carregados (ver particoes.py).
+    lancamentos = LancamentosParticionados()
+    indices = IndiceLancamentos(lancamentos)
+    totais_por_data = TotaisPorData(lancamentos)
+    diario = resultado_mensal = particoes = LivroParticionado(lancamentos, AgregadoMensal(lancamentos), indices, nome_arquivo)
+    # O livro particionado faz o papel do diário (salvar regrava só os meses alterados) e do resultado mensal (os meses fora da memória vêm do manifesto).
+
+recorrencias = Recorrencias(nome_arquivo + ".recorrencias")
+# Receitas e despesas recorrentes, uma regra por recorrência. As ocorrências não entram em 'lancamentos': são geradas só para as datas
+# que o filtro, o resultado mensal ou a exportação usam (ver recorrencias.py).
+
+versao_do_livro = lancamentos if banco_sqlite else VersaoDoLivro(lancamentos)
+# Número que muda a cada inclusão, edição, exclusão ou importação. No banco SQLite é o total de linhas alteradas da conexão.
+
+
+def versao_atual():  # Versão de tudo que entra nos resultados em cache: o livro-caixa, as recorrências e o dia de hoje (as recorrências sem fim vão até hoje).
+    return versao_do_livro.versao, recorrencias.versao, datetime.date.today().toordinal()
+
+
+cache = CacheDeResultados(versao_atual, int(float(os.environ.get("ECOBALANCE_CACHE_MB", LIMITE_PADRAO / 2**20)) * 2**20))
+# Resultados dos filtros, do resultado mensal e das páginas já renderizadas (ver cache.py). ECOBALANCE_CACHE_MB=0 desliga o cache.
+instrumentacao.registra_contadores("cache de resultados", cache.estatisticas)
+
+
+def carrega_periodo(data_inicial=None, data_final=None):  # No modo particionado, carrega os meses do período (ordinais; None não limita) antes de consultar os índices ou os totais.
+    if particoes is not None:  # Nos outros modos todos os lançamentos já estão na memória (ou no banco).
+        particoes.garante(data_inicial, data_final)
+
+
+def carrega_investimentos():  # No modo particionado, carrega só os meses com investimentos, antes de recalcular os rendimentos.
+    if particoes is not None:
+        particoes.carrega_investimentos()
+
+
+def carrega_filtro(filtro):  # Carrega só os meses que o filtro composto (dict, ver filtros.py) pode pegar.
+    if particoes is not None:
+        no = monta(filtro)
+        carrega_periodo(*(faixa_de_datas(no) if no is not None else (None, None)))
 
 
 def limpar_terminal():  # Verifica o sistema operacional e faz o comando adequado.
@@ -21,18 +105,10 @@ def limpar_terminal():  # Verifica o sistema operacional e faz o comando adequad
         os.system("clear")
 
 
-def taxa_mensal_para_diaria(taxa_mensal): # Faz a conversão da taxa de juros coletada, mensal para diária.
-    # Converte a taxa mensal para decimal
-    taxa_decimal = taxa_mensal / 100
-    # Aplica a fórmula para converter para a taxa diária
-    taxa_diaria = (1 + taxa_decimal) ** (1 / 30) - 1
-    # Converte a taxa diária de volta para porcentagem
-    return taxa_diaria * 100
-
-
 def is_number(s):  # Tentar converter o valor para float, retorna True ou False. Chamamos em outras funções para verificar se uma entrada poderá ser convertida para número.
     try:
         float(s)
+        taxa_para_inteiro(s)  # Também precisa caber nas colunas inteiras (centavos e taxa em ponto fixo): recusa 'nan', 'inf' e números enormes.
         return True
     except ValueError:
         return False
@@ -47,45 +123,48 @@ def criar_data(dia: int, mes: int, ano: int):  # Tenta criar uma data, retorna a
 
 
 def carrega_de_arquivo(): # Carrega os dados do arquivo "nome_arquivo = registros.csv" para o dict "lancamentos".
+    if snapshot_atualizado(nome_arquivo): # Se o snapshot binário (gravado na compactação) for mais novo que o CSV, carrega por ele, que é bem mais rápido.
+        return carrega_snapshot(nome_arquivo, lancamentos)
+
+    if os.path.getsize(nome_arquivo) >= tamanho_carga_paralela: # Arquivo grande: divide em fatias e lê cada uma num processo.
+        return carrega_em_paralelo(nome_arquivo, lancamentos)
+
     with open(nome_arquivo, mode="r", newline="", encoding="utf-8") as file:  # Abre o arquivo, ele fecha sozinho quando acaba o with.
         reader = csv.DictReader(file)  # Serve para ler o arquivo csv e transformar num dict.
 
         # Lê cada linha e adiciona ao dicionário 'lancamentos'.
         for row in reader: # Cada row é um dict que nem esse: {'id': '1', 'data': '14/08/2024', 'tipo': 'Investimento', 'valor': '55.40', 'taxa_de_juros': '5.0', 'data_investimento': '14/08/2024', 'investimento_atualizado': '50.00'}
             id_ = int(row.pop("id")) # Isso retorna o id e remove ele do dicionário, pq id vai ser a chave no 'lancamentos', e o resto da linha vai ser um dict com os 'valores' da chave 'id'.
-            row["valor"] = float(row["valor"])
-            if row.get("taxa_de_juros"): # tenta acessar a chave 'taxa_de_juros' do dicionário. Se não existir, retorna None, ou seja, False.
-                row["taxa_de_juros"] = float(row["taxa_de_juros"])
-            if row.get("investimento_atualizado"):
-                row["investimento_atualizado"] = float(row["investimento_atualizado"])
-            lancamentos[id_] = row
+            lancamentos[id_] = row # O armazenamento colunar converte valor, taxa e datas e ignora os campos opcionais vazios ("").
 
     return lancamentos
 
 
+@medido("salvamento")
 def salva_em_arquivo(): # Essa função salva os dados alterados no arquivo CSV, ela é executada ao final de cada lançamento do usuário, digitando "Salvar" ou "S" ao final.
-    # Obter os nomes das colunas a partir do primeiro item do dicionário
-    colunas = ["id", "data", "tipo", "valor", "taxa_de_juros", "data_investimento", "investimento_atualizado"]
+    # Só os lançamentos incluídos, editados ou excluídos desde o último salvamento são gravados, no final do diário (ver diario.py).
+    # Quando o diário fica grande ele é compactado de volta no registros.csv numa thread, sem travar o menu.
+    gravadas = diario.salvar()
+    conta_linhas(gravadas)
 
-    # Abrir o arquivo para escrita:
-    with open(nome_arquivo, mode="w", newline="", encoding="utf-8") as file: # O argumento newline="" é usado para evitar linhas em branco extras no arquivo CSV. E encoding="utf-8" garante que o arquivo seja salvo com codificação UTF-8, que suporta caracteres especiais.
-        writer = csv.DictWriter(file, fieldnames=colunas)
+    print(f"Dados salvos em {nome_arquivo}! ({gravadas} alterações gravadas)")
 
-        # Escrever o cabeçalho
-        writer.writeheader()
 
-        # Escrever os dados
-        for id_, valores in lancamentos.items(): # Cria um novo dicionário linha que combina o ID do lançamento com os detalhes do lançamento.
-            linha = {"id": id_, **valores}  # Inicia o dicionário linha com uma chave "id" cujo valor é id_ (o identificador do lançamento). **valores: Desempacota o dicionário valores e insere todas as suas chaves e valores no dicionário linha.
-            writer.writerow(linha)
+@medido("compactacao")
+def compacta_arquivo(): # Junta o diário de alterações no registros.csv, reescrevendo o arquivo inteiro com todos os lançamentos.
+    diario.compactar()
+    conta_linhas(len(lancamentos))
 
-    print(f"Dados salvos em {nome_arquivo}!")
+    print(f"Arquivo {nome_arquivo} compactado!")
 
 
+@medido("carga")
 def checa_arquivo_csv(): # Verifica se o arquivo CSV 'nome_arquivo = "registros.csv"' já existe, se sim, carrega as informações contidas nele, do contrário cria um arquivo "registros.csv".
-    if os.path.exists(nome_arquivo):
+    recorrencias.carregar()  # As regras das recorrências ficam num arquivo à parte, "registros.csv.recorrencias".
+    if os.path.exists(nome_arquivo) or (particoes is not None and os.path.exists(particoes.caminho_manifesto)):
         print(f"Arquivo {nome_arquivo} encontrado, carregando informações!")
-        carrega_de_arquivo()
+        diario.carregar(carrega_de_arquivo)  # Carrega o registros.csv e reaplica as alterações salvas no diário.
+        conta_linhas(len(lancamentos))
     else:
         # criar o arquivo
         print(f"Criando arquivo {nome_arquivo}!")
@@ -93,30 +172,22 @@ def checa_arquivo_csv(): # Verifica se o arquivo CSV 'nome_arquivo = "registros.
         arquivo.close()
 
 
-def atualizar_rendimento(): # Essa função faz a atualização do valor dos investimentos. Chamada no menu principal do programa, pela opção 4.
-    data_atual = datetime.date.today()
-
-    for id_, lancamento in lancamentos.items():
-        if lancamento['tipo'] == 'Investimento':
-            # Converte as datas de string para objeto datetime
-            data_investimento = datetime.datetime.strptime(lancamento['data_investimento'], "%d/%m/%Y").date()
-
-            # Calcula a quantidade de dias entre o investimento e a data atual
-            dias = (data_atual - data_investimento).days
-
-            # Calcula a taxa diária com base na taxa de juros mensal
-            taxa_diaria = taxa_mensal_para_diaria(lancamento['taxa_de_juros']) # Chamada da função que converte taxa de juros mensal para taxa diária.
-
-            # Calcula o montante atual
-            montante = lancamento['valor'] * (1 + (taxa_diaria / 100)) ** dias
-
-            # Atualiza o valor no dicionário
-            lancamento['investimento_atualizado'] = round(montante, 2)
+@medido("revalorizacao")
+def atualizar_rendimento(data_referencia=None): # Essa função faz a atualização do valor dos investimentos. Chamada no menu principal do programa, pela opção 4.
+    # data_referencia: data (datetime.date) em que o valor dos investimentos deve ser calculado. Se não informada, usa a data atual.
+    # Todos os investimentos são recalculados numa passada só pelas colunas, ver rendimento.py (ou com um UPDATE só, no banco SQLite).
+    if banco_sqlite:
+        atualizados = lancamentos.revalorizar(data_referencia)
+    else:
+        carrega_investimentos()  # Todos os investimentos são recalculados, inclusive os dos meses ainda não carregados.
+        atualizados = atualizar_em_lote(lancamentos, data_referencia)
+    conta_linhas(atualizados)
 
     print("Rendimentos atualizados com sucesso!")
 
 
 # Função para criar novos registros financeiros no dict lancamentos, é chamada na função coleta_lancamento.
+@medido("inclusao")
 def criar_registro(tipo, valor, data_registro=None, taxa_de_juros=None, data_investimento=None, investimento_atualizado=None):
     if data_registro is None:  # Se o usuário informar a data, não entra nesse if.
         data_registro = datetime.date.today()
@@ -126,22 +197,20 @@ def criar_registro(tipo, valor, data_registro=None, taxa_de_juros=None, data_inv
     if tipo == "Despesa":
         valor = -abs(valor)  # Converte o valor para negativo
 
-    # ver o máximo valor do dicionário e adicionar 1
-    if lancamentos: # verifica se o dicionário tem elementos
-        id_transacao = max(lancamentos.keys()) + 1
-    else:
-        id_transacao = 1
+    id_transacao = lancamentos.proximo_id()  # Maior id + 1, sem percorrer todos os ids (ver armazenamento.py)
 
-    lancamentos[id_transacao] = {
-        "data": data_registro.strftime("%d/%m/%Y"),#strftime transforma a data datetime.datetime em string "dd/mm/yyyy"
-        "tipo": tipo,
-        "valor": valor,
-    }
+    if tipo not in CODIGO_TIPO:
+        raise ValueError(f"Tipo de lançamento inválido: {tipo!r}")
 
-    if tipo == "Investimento":
-        lancamentos[id_transacao]["taxa_de_juros"] = taxa_de_juros
-        lancamentos[id_transacao]["data_investimento"] = data_investimento.strftime("%d/%m/%Y")
-        lancamentos[id_transacao]["valor"] = valor  # Armazena o valor original do investimento, para ver o montante autalizado, precisará chamar a opção 4 no menu principal.
+    # As datas são gravadas direto como ordinal (ver armazenamento.py), o texto "dd/mm/aaaa" só é montado para mostrar ou gravar no CSV.
+    if tipo == "Investimento":  # Armazena o valor original do investimento, para ver o montante autalizado, precisará chamar a opção 4 no menu principal.
+        taxa = SEM_VALOR if taxa_de_juros is None else taxa_para_inteiro(taxa_de_juros)
+        ordinal_investimento = data_para_ordinal(data_investimento)
+    else:
+        taxa, ordinal_investimento = SEM_VALOR, SEM_DATA
+    # Valor em centavos e taxa em ponto fixo, os inteiros guardados nas colunas (ver armazenamento.py).
+    lancamentos.gravar_valores(id_transacao, (data_para_ordinal(data_registro), CODIGO_TIPO[tipo], reais_para_centavos(valor), taxa, ordinal_investimento, SEM_VALOR))
+    conta_linhas(1)
 
     print(f"Registro {id_transacao} criado com sucesso!")
 
@@ -160,11 +229,19 @@ Digite um número para acessar a função correspondente:
     5) Remover Lançamento
     6) Calcular Resultado Mensal
     7) Exportar Relatório dos Lançamentos
+    8) Projetar Carteira de Investimentos
+    9) Totais por Período (dia, semana, mês, trimestre, ano ou intervalo de datas)
+    10) Editar ou Excluir em Lote (todos os lançamentos de um filtro)
+    11) Importar Extrato (CSV ou JSON Lines)
+    12) Lançamentos Recorrentes (receitas e despesas fixas)
 
     Para salvar, digite 'SALVAR' ou 'S'. Será exportado um arquivo .csv com os registros.
+{aviso_autosalvamento}    Para juntar as alterações salvas no arquivo principal, digite 'COMPACTAR'.
     Para sair, digite 'X'
     """
-    print(texto_menu)
+    # O aviso só aparece com o salvamento automático rodando (no banco SQLite e no modo particionado ele não é ligado).
+    aviso = "    As alterações também são salvas automaticamente, poucos segundos depois de feitas.\n" if autosalvamento is not None else ""
+    print(texto_menu.format(aviso_autosalvamento=aviso))
     opcao_usuario = input(">> ")
     return opcao_usuario
 
@@ -275,12 +352,9 @@ def listar_lancamentos(): # Função para listar os registros e exibir no termin
     # lista de cabeçalhos
     colunas = ["ID", "Data do Lançamento", "Tipo", "Valor", "Tx Juros (mês)", "Data Investimento", "Investimento Atualizado"]
 
-    # lista para armazenar as linhas da tabela
-    tabela = []
-
-    # Preenche a tabela com os dados de 'lancamentos'
-    for id_, lancamento in lancamentos.items():
-        linha = [id_,
+    def monta_linha(id_):  # Só é chamada para as linhas da página que está sendo mostrada.
+        lancamento = lancamentos[id_]
+        return [id_,
             lancamento.get("data", ""),  # tenta acessar a chave 'data' do dicionário. Se não existir, retorna "" (string vazia).
             lancamento.get("tipo", ""),
             lancamento.get("valor", ""),
@@ -288,12 +362,29 @@ def listar_lancamentos(): # Função para listar os registros e exibir no termin
             lancamento.get("data_investimento", ""),
             lancamento.get("investimento_atualizado", ""),
         ]
-        tabela.append(linha)
 
-    # Exibe a tabela de forma visual mais amigável para o usuário.
-    print(tabulate(tabela, headers=colunas, tablefmt="fancy_grid"))
+    # Exibe a tabela de forma visual mais amigável para o usuário, uma página por vez (ver paginacao.py).
+    # No modo particionado, a listagem anda mês a mês e só carrega as partições das páginas mostradas.
+    if particoes is not None:
+        paginador = PaginadorMensal(particoes.meses(), particoes.ids_do_mes, len(lancamentos), particoes.mes_do_id)
+    else:
+        paginador = Paginador.do_armazenamento(lancamentos)
+    mostra_paginas(paginador, colunas, monta_linha, cache, ("listagem",))
+
+
+def mostra_ocorrencias(ocorrencias, chave=None): # Mostra as ocorrências de lançamentos recorrentes (lista de Registro, ver recorrencias.py), uma página por vez.
+    # 'chave' é a da consulta que gerou as ocorrências, para as páginas renderizadas ficarem no cache.
+    # O ID de uma ocorrência é o número da recorrência com sinal negativo: ela não é um lançamento gravado.
+    print(f"\nOcorrências de lançamentos recorrentes ({len(ocorrencias)} ocorrências):")
+    colunas = ["ID", "Data do Lançamento", "Tipo", "Valor"]
 
+    def monta_linha(indice):
+        ocorrencia = ocorrencias[indice]
+        return [ocorrencia.id, ordinal_para_data(ocorrencia.data), TIPOS[ocorrencia.tipo], centavos_para_reais(ocorrencia.valor)]
+    mostra_paginas(Paginador(range(len(ocorrencias)), len(ocorrencias), por_id=False), colunas, monta_linha, cache, None if chave is None else ("recorrentes", chave))
 
+
+@medido("edicao")
 def editar_lancamento(): # Função para editar os lançamentos, para gravar a edição no CSV, precisa "Salvar" ao final, quando retorna ao menu.
     listar_lancamentos()  # Mostrar os lançamentos para que o usuário escolha qual editar
     while True:
@@ -373,55 +464,66 @@ def editar_lancamento(): # Função para editar os lançamentos, para gravar a e
         print("Digite a nova data do investimento (ou pressione Enter para manter a data atual):")
         data_investimento = pergunta_data()
 
-        if not data_investimento:  # Se o usuário não alterar a data, manter a atual
-            data_investimento = datetime.datetime.strptime(lancamento.get('data_investimento', datetime.date.today().strftime("%d/%m/%Y")), "%d/%m/%Y")
-
-        lancamento['taxa_de_juros'] = nova_taxa
-        lancamento['data_investimento'] = data_investimento.strftime("%d/%m/%Y")
-        lancamento['valor'] = lancamento['valor'] if 'valor' in lancamento else novo_valor
-    else:
-        nova_taxa = None
-        lancamento.pop('taxa_de_juros', None)  # Remove a taxa de juros se não for mais um investimento
-        lancamento.pop('data_investimento', None)  # Remove a data de investimento se não for mais um investimento
-        lancamento.pop('investimento_atualizado', None)  # Remove o valor atualizado se não for mais um investimento
-
-    # Atualizar o lançamento
-    lancamento['tipo'] = novo_tipo
-    lancamento['valor'] = novo_valor
-    lancamento['data'] = datetime.date.today().strftime("%d/%m/%Y")  # Atualiza a data de edição
+        registro = lancamentos.registro_por_id(id_lancamento)  # Valores crus, com as datas já como ordinal.
+        if data_investimento:
+            ordinal_investimento = data_para_ordinal(data_investimento)
+        elif registro.data_inv != SEM_DATA:  # Se o usuário não alterar a data, manter a atual
+            ordinal_investimento = registro.data_inv
+        else:
+            ordinal_investimento = datetime.date.today().toordinal()
+        nova_taxa = SEM_VALOR if nova_taxa is None else taxa_para_inteiro(nova_taxa)
+        atualizado = registro.atualizado
+    else:  # Remove a taxa de juros, a data de investimento e o valor atualizado se não for mais um investimento
+        nova_taxa, ordinal_investimento, atualizado = SEM_VALOR, SEM_DATA, SEM_VALOR
 
-    lancamentos[id_lancamento] = lancamento
+    # Atualizar o lançamento de uma vez, com a data de hoje como data de edição
+    lancamentos.gravar_valores(id_lancamento, (datetime.date.today().toordinal(), CODIGO_TIPO[novo_tipo], reais_para_centavos(novo_valor), nova_taxa, ordinal_investimento, atualizado))
+    conta_linhas(1)
 
     print(f"Lançamento {id_lancamento} atualizado com sucesso!")
 
 
+@medido("filtro")
 def filtrar_lancamentos(): # Essa função é chamada na opção consultar lançamentos, caso o usuário não deseje filtrar, serão exibidos todos os lançamentos.
     limpar_terminal()
     print("Escolha e digite uma opção para o critério de filtro:")
     print("1) Filtrar por Data")
     print("2) Filtrar por Tipo")
     print("3) Filtrar por Valor")
+    print("4) Filtro composto (data, tipo, valor, taxa e data do investimento com 'e' / 'ou')")
     print("Ou pressione ENTER para exibir todos os registros")
     opcao = input(">> ")
     if not opcao:
         listar_lancamentos()
+        ocorrencias = cache.obter(("ocorrencias",), lambda: recorrencias.filtradas({}))  # Sem filtro, as ocorrências até hoje.
+        if ocorrencias:
+            mostra_ocorrencias(ocorrencias, ("ocorrencias",))
         return
 
-    resultados = []
+    filtro = None  # O mesmo critério como filtro composto, para as ocorrências das recorrências (None: nenhuma pode atender).
 
     if opcao == "1":
         print("Digite a data no formato dd/mm/yyyy:")
         data_filtro = input(">> ")
-        for id_, lancamento in lancamentos.items():
-            if lancamento.get("data") == data_filtro:
-                resultados.append([id_, lancamento])
+        entrada = data_filtro
+        try:
+            ordinal_filtro = data_para_ordinal(data_filtro)
+        except ValueError:  # Data digitada fora do formato, nenhum lançamento pode ter essa data.
+            ordinal_filtro = None
+        if ordinal_filtro is not None:
+            filtro = {"data": data_filtro}
+        consulta = lambda: (indices.ids_por_data(ordinal_filtro) if ordinal_filtro is not None else [], None)
 
     elif opcao == "2":
         print("Digite o tipo de lançamento ('Receita', 'Despesa' ou 'Investimento'):")
         tipo_filtro = input(">> ")
-        for id_, lancamento in lancamentos.items():
-            if lancamento.get("tipo").lower() == tipo_filtro.lower():
-                resultados.append([id_, lancamento])
+        entrada = tipo_filtro.lower()
+        codigo_filtro = None
+        for tipo, codigo in CODIGO_TIPO.items():
+            if tipo.lower() == tipo_filtro.lower():
+                codigo_filtro = codigo
+                filtro = {"tipo": tipo}
+        consulta = lambda: (indices.ids_por_tipo(codigo_filtro) if codigo_filtro is not None else [], None)
 
     elif opcao == "3":
         print("Digite o valor mínimo:")
@@ -434,25 +536,59 @@ def filtrar_lancamentos(): # Essa função é chamada na opção consultar lanç
             valor_minimo = float(valor_minimo)
             valor_maximo = float(valor_maximo)
 
-            for id_, lancamento in lancamentos.items():
-                valor = lancamento.get("valor", 0)
-                if valor_minimo <= valor <= valor_maximo:
-                    resultados.append([id_, lancamento])
+            entrada = (valor_minimo, valor_maximo)
+            filtro = {"valor": [valor_minimo, valor_maximo]}
+            consulta = lambda: (indices.ids_por_faixa_de_valor(valor_minimo, valor_maximo), None)
         else:
             print("Valores inválidos para o filtro de valor.")
             return
 
+    elif opcao == "4":
+        print("Digite o filtro, por exemplo:  data 01/01/2024..31/03/2024 e (tipo Receita, Despesa ou valor 1000..)")
+        print("Cada critério é '<campo> <valor>'. Campos: data, tipo, valor, taxa e investimento (data do investimento).")
+        print("Faixas 'a..b', 'a..' ou '..b', sem espaços; o tipo aceita vários nomes separados por vírgula.")
+        print("Junte critérios com 'e' e 'ou' ('e' vale antes de 'ou') e agrupe com parênteses.")
+        print("Comece com 'explicar' para ver também o plano usado na consulta.")
+        texto = input(">> ").strip()
+        explicar = texto.lower().startswith("explicar")  # Com o plano, a consulta roda de novo: o plano guardado no cache falaria de linhas que não foram examinadas agora.
+        if explicar:
+            texto = texto[len("explicar"):]
+        entrada = texto.strip()
+        try:
+            filtro = interpreta(texto)
+        except ValueError as erro:
+            print(f"Filtro inválido: {erro}")
+            return
+        consulta = lambda: indices.consulta(filtro)
+
     else:
         print("Opção de filtro inválida.")
         return
 
-    # Exibe os resultados do filtro
+    def calcula():  # (ids dos lançamentos, ocorrências das recorrências, plano); as ocorrências são geradas só na faixa de datas do filtro.
+        ids, plano = consulta()
+        return ids, (recorrencias.filtradas(filtro) if filtro is not None else []), plano
+    chave = ("filtro", opcao, entrada)  # O mesmo filtro de novo, sem mudança no livro-caixa, sai do cache (ver cache.py).
+    try:
+        if filtro is not None:
+            carrega_filtro(filtro)  # No modo particionado, só os meses do filtro de data; os outros filtros precisam de todos.
+        resultados, ocorrencias, plano = calcula() if opcao == "4" and explicar else cache.obter(chave, calcula)
+    except ValueError as erro:
+        print(f"Filtro inválido: {erro}")
+        return
+    if opcao == "4" and explicar:
+        print("\nPlano da consulta:")
+        print("\n".join(plano))
+    conta_linhas(len(resultados) + len(ocorrencias), {"1": "filtro_data", "2": "filtro_tipo", "3": "filtro_valor", "4": "filtro_composto"}[opcao])
+
+    # Exibe os resultados do filtro ('resultados' é a lista de ids, em ordem crescente), uma página por vez.
     if resultados:
         print(f"\nLançamentos encontrados para o critério escolhido ({len(resultados)} resultados):")
         colunas = ["ID", "Data do Lançamento", "Tipo", "Valor", "Taxa de Juros", "Data Investimento", "Investimento Atualizado"]
-        tabela = []
-        for id_, lancamento in resultados:
-            linha = [
+
+        def monta_linha(id_):
+            lancamento = lancamentos[id_]
+            return [
                 id_,
                 lancamento.get("data", ""),
                 lancamento.get("tipo", ""),
@@ -461,9 +597,10 @@ def filtrar_lancamentos(): # Essa função é chamada na opção consultar lanç
                 lancamento.get("data_investimento", ""),
                 lancamento.get("investimento_atualizado", ""),
             ]
-            tabela.append(linha)
-        print(tabulate(tabela, headers=colunas, tablefmt="fancy_grid"))
-    else:
+        mostra_paginas(Paginador(resultados, len(resultados)), colunas, monta_linha, cache, chave)
+    if ocorrencias:
+        mostra_ocorrencias(ocorrencias, chave)
+    if not resultados and not ocorrencias:
         print("Nenhum lançamento encontrado para o critério escolhido.")
 
 
@@ -482,6 +619,7 @@ def excluir_lancamento_por_id(): # Função chamada dentro da função remover_l
                 confirmacao = input(f"Tem certeza que deseja excluir o lançamento {id_exclusao}? (S/N): ")
                 if confirmacao.upper() == 'S':
                     del lancamentos[id_exclusao]
+                    conta_linhas(1)
                     print(f"Lançamento {id_exclusao} excluído com sucesso!")
                 else:
                     print("Exclusão cancelada.")
@@ -492,6 +630,7 @@ def excluir_lancamento_por_id(): # Função chamada dentro da função remover_l
             print("ID inválido. Por favor, insira um número válido.")
 
 
+@medido("exclusao")
 def remover_lancamento():
     listar_lancamentos()  # Mostrar os lançamentos para o usuário escolher qual excluir
 
@@ -501,7 +640,8 @@ def remover_lancamento():
 
         if opcao_exclusao == 'D':  # Se o usuário digitar D, vai ter que informar a data para localizar o registro
             data_exclusao = pergunta_data()
-            lancamentos_a_excluir = [id_ for id_, lancamento in lancamentos.items() if lancamento.get('data') == data_exclusao.strftime("%d/%m/%Y")]
+            carrega_periodo(data_para_ordinal(data_exclusao), data_para_ordinal(data_exclusao))
+            lancamentos_a_excluir = indices.ids_por_data(data_para_ordinal(data_exclusao))  # Consulta o índice por data em vez de percorrer todos os lançamentos.
 
             if len(lancamentos_a_excluir) > 1:  # Se naquela data tiver mais de um registro, ele vai ter que informar o ID do registro a excluir
                 print("Há mais de um lançamento nessa data. Informe o ID do lançamento a ser excluído:")
@@ -518,6 +658,7 @@ def remover_lancamento():
 
                         if confirmacao == 'S':
                             del lancamentos[id_lancamentos]
+                            conta_linhas(1)
                             print(f"Lançamento {id_lancamentos} removido com sucesso!")
                             break  # Sai do loop após a exclusão
                         else:
@@ -533,6 +674,7 @@ def remover_lancamento():
 
                 if confirmacao == 'S':
                     del lancamentos[id_lancamentos]
+                    conta_linhas(1)
                     print(f"Lançamento {id_lancamentos} removido com sucesso!")
                 else:
                     print("Operação cancelada.")
@@ -553,72 +695,264 @@ def remover_lancamento():
 
 
 # Calcula resultado mensal - essa função calcula o resultado das operações no perído de um mês. Considerando receitas, despesas e investimentos do período. Exibe os resultados por mês no terminal.
-from collections import defaultdict
 import datetime
 from tabulate import tabulate
 
-def calcular_resultado_mensal(): # Exibe no terminal os resultados por mês, considerando os registros existentes no registros.csv
-    resultados_mensais = defaultdict(lambda: {"Receita": 0, "Despesa": 0, "Resultado": 0})
-
-    for lancamento in lancamentos.values():
-        # Extrai o mês e o ano do lançamento
-        data_lancamento = datetime.datetime.strptime(lancamento["data"], "%d/%m/%Y")
-        mes_ano = data_lancamento.strftime("%m/%Y")
-
-        if lancamento["tipo"] == "Receita":
-            resultados_mensais[mes_ano]["Receita"] += lancamento["valor"]
-        elif lancamento["tipo"] == "Despesa":
-            resultados_mensais[mes_ano]["Despesa"] += lancamento["valor"]
-        elif lancamento["tipo"] == "Investimento":
-            # Verifica se o valor do investimento foi atualizado
-            if lancamento.get("investimento_atualizado") is None:
-                print(f"Atenção: O investimento realizado em {lancamento['data']} não foi atualizado.")
-                print("Por favor, atualize os investimentos antes de calcular o resultado mensal.")
-                return
-            resultados_mensais[mes_ano]["Receita"] += lancamento["investimento_atualizado"] - lancamento["valor"]
-
-        # Atualiza o resultado do mês (receitas - despesas)
-        resultados_mensais[mes_ano]["Resultado"] = (resultados_mensais[mes_ano]["Receita"] + resultados_mensais[mes_ano]["Despesa"])
+@medido("resultado_mensal")
+def calcular_resultado_mensal(conferir=False): # Exibe no terminal os resultados por mês, considerando os registros existentes no registros.csv
+    # Os totais já estão prontos em 'resultado_mensal' (ver agregados.py), aqui só são exibidos.
+    # Com conferir=True (ou a variável de ambiente ECOBALANCE_CONFERIR=1) os totais mantidos são comparados com um recálculo completo.
+    if conferir or os.environ.get("ECOBALANCE_CONFERIR") == "1":
+        divergencias = resultado_mensal.conferir()
+        for mes_ano, mantido, recalculado in divergencias:
+            print(f"Atenção: total de {mes_ano} divergente, mantido {mantido} e recalculado {recalculado}.")
+        if not divergencias:
+            print("Conferência dos totais mensais: OK.")
+
+    # Verifica se o valor dos investimentos foi atualizado
+    data_pendente = resultado_mensal.investimento_pendente()
+    if data_pendente is not None:
+        print(f"Atenção: O investimento realizado em {data_pendente} não foi atualizado.")
+        print("Por favor, atualize os investimentos antes de calcular o resultado mensal.")
+        return
 
     # Exibe os resultados mensais
     print("\nResultados Mensais:")
     colunas = ["Mês/Ano", "Receita Total", "Despesa Total", "Resultado"]
-    tabela = []
 
-    for mes_ano, resultado in sorted(resultados_mensais.items()):
-        linha = [mes_ano,
-            f"R$ {resultado['Receita']:.2f}",
-            f"R$ {resultado['Despesa']:.2f}",
-            f"R$ {resultado['Resultado']:.2f}",]
+    def monta_tabela():  # (linhas, texto da tabela), guardados no cache até a próxima mudança no livro-caixa ou nas recorrências.
+        tabela = []
+        # As recorrências entram por conta, mês a mês, sem gerar as ocorrências (ver recorrencias.py).
+        for mes_ano, receita, despesa, resultado in recorrencias.com_resultado_mensal(resultado_mensal.resultados()):
+            linha = [mes_ano,
+                f"R$ {receita:.2f}",
+                f"R$ {despesa:.2f}",
+                f"R$ {resultado:.2f}",]
+
+            tabela.append(linha)
+        return len(tabela), tabulate(tabela, headers=colunas, tablefmt="fancy_grid")
 
-        tabela.append(linha)
+    quantidade, texto = cache.obter(("resultado_mensal",), monta_tabela)
+    conta_linhas(quantidade)
 
-    print(tabulate(tabela, headers=colunas, tablefmt="fancy_grid"))
+    print(texto)
 
 
 
-def exportar_relatorio(lancamentos, nome_relatorio='meu_relatorio.csv'): # Exporta o relatório com as informações guardadas no dict lancamentos.
+@medido("exportacao")
+def exportar_relatorio(lancamentos, nome_relatorio='meu_relatorio.csv', formato=None, data_inicial=None, data_final=None, tipo=None): # Exporta o relatório com as informações guardadas no dict lancamentos.
+    # O formato vem da extensão (.csv, .csv.gz, .jsonl, .jsonl.gz ou .ecol) ou do argumento 'formato'. data_inicial, data_final ('dd/mm/aaaa') e tipo
+    # exportam só uma parte. Os lançamentos são gravados em blocos, sem montar o relatório inteiro na memória (ver exportacao.py).
 
-    if not lancamentos:
+    if not lancamentos and not recorrencias:
         print('Não há dados para exportar.')
         return
 
-    colunas = list(next(iter(lancamentos.values())).keys()) # Obtém os nomes das colunas a partir das chaves do primeiro dicionário dentro de lancamentos.
+    linhas, segundos = exporta(lancamentos, nome_relatorio, formato, data_inicial, data_final, tipo, recorrencias=recorrencias)  # As ocorrências das recorrências vão no fim.
+
+    conta_linhas(linhas)
+    print(f"Relatório exportado com sucesso para {nome_relatorio}! ({linhas} lançamentos, {linhas / segundos if segundos else 0:.0f} por segundo)")
+
+
+@medido("projecao")
+def projetar_carteira(data_inicial=None, data_final=None, passo=None): # Mostra o total da carteira de investimentos em cada data de uma grade, no passado ou no futuro. Chamada no menu principal, pela opção 8.
+    # Sem argumentos, pergunta o período e o passo (diário, mensal ou a cada N dias). A conta é feita de uma vez para a grade inteira, ver projecao.py.
+    if data_inicial is None:
+        print("Digite a data inicial no formato dd/mm/yyyy (ENTER para hoje):")
+        data_inicial = input(">> ") or datetime.date.today()
+    if data_final is None:
+        print("Digite a data final no formato dd/mm/yyyy:")
+        data_final = input(">> ")
+    if passo is None:
+        print("Digite o passo: 'D' para diário, 'M' para mensal ou um número de dias (ENTER para mensal):")
+        resposta = input(">> ").strip().upper()
+        passo = int(resposta) if resposta.isdigit() else {"D": "diario"}.get(resposta, "mensal")
+
+    try:
+        projecao = ProjecaoCarteira(lancamentos, grade_de_datas(data_inicial, data_final, passo))
+    except ValueError as erro:  # Data fora do formato, período invertido ou passo inválido.
+        print(f"Não foi possível projetar a carteira: {erro}")
+        return
+    if not len(projecao):
+        print("Não há investimentos para projetar.")
+        return
+    linhas = projecao.linhas_dos_totais()
+    conta_linhas(len(projecao) * len(linhas))
+
+    print(f"\nProjeção de {len(projecao)} investimentos:")
+    mostra_paginas(Paginador(range(len(linhas)), len(linhas), por_id=False), ["Data", "Total da Carteira"],
+                   lambda indice: [linhas[indice][0], f"R$ {linhas[indice][1]:.2f}"])
+
+
+@medido("totais_periodo")
+def calcular_totais_por_periodo(data_inicial=None, data_final=None, periodo=None): # Mostra receita, despesa, rendimento e resultado de um intervalo de datas. Chamada no menu principal, pela opção 9.
+    # O intervalo pode sair inteiro ou agrupado por dia, semana, mês, trimestre ou ano. Cada total custa O(log n), ver agregados.TotaisPorData.
+    if data_inicial is None:
+        print("Digite a data inicial no formato dd/mm/yyyy (ENTER para desde o primeiro lançamento):")
+        data_inicial = input(">> ")
+    if data_final is None:
+        print("Digite a data final no formato dd/mm/yyyy (ENTER para até o último lançamento):")
+        data_final = input(">> ")
+    if periodo is None:
+        print("Agrupar por 'D' dia, 'S' semana, 'M' mês, 'T' trimestre ou 'A' ano (ENTER para só o total do intervalo):")
+        periodo = {"D": "dia", "S": "semana", "M": "mes", "T": "trimestre", "A": "ano"}.get(input(">> ").strip().upper())
+
+    try:
+        inicio = data_para_ordinal(data_inicial) if data_inicial else None
+        fim = data_para_ordinal(data_final) if data_final else None
+    except ValueError:
+        print("Data inválida, use o formato dd/mm/yyyy.")
+        return
+    if resultado_mensal.investimento_pendente() is not None:
+        print("Atenção: há investimentos não atualizados, o rendimento deles fica fora dos totais (use a opção 4).")
+    carrega_periodo(inicio, fim)
+
+    if periodo:
+        linhas = totais_por_periodo(totais_por_data, periodo, inicio, fim)
+    else:
+        centavos = totais_por_data.centavos_entre(inicio, fim)  # Soma do resultado em centavos, exata.
+        receita, despesa, rendimento, quantidade = totais_em_reais(centavos)
+        linhas = [("Total", receita, despesa, rendimento, centavos_para_reais(sum(centavos[:3])))] if quantidade else []
+    if not linhas:
+        print("Nenhum lançamento encontrado no intervalo.")
+        return
+    conta_linhas(len(linhas))
+
+    colunas = ["Período", "Receita Total", "Despesa Total", "Rendimento", "Resultado"]
+    mostra_paginas(Paginador(range(len(linhas)), len(linhas), por_id=False), colunas,
+                   lambda indice: [linhas[indice][0], *(f"R$ {valor:.2f}" for valor in linhas[indice][1:])])
 
-    with open(nome_relatorio, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=colunas)
 
-        writer.writeheader()
+@medido("edicao_em_lote")
+def editar_em_lote(): # Exclui, troca o tipo ou troca a taxa de juros de todos os lançamentos de um filtro composto, com uma confirmação só. Chamada no menu principal, pela opção 10.
+    print("Digite o filtro dos lançamentos, por exemplo:  data 01/01/2024..31/01/2024 e tipo Despesa e valor ..-1000")
+    print("Campos: data, tipo, valor, taxa e investimento (data do investimento); faixas 'a..b', 'a..' ou '..b'.")
+    print("Para aplicar em todos os lançamentos, digite 'todos'.")
+    texto = input(">> ").strip()
+    try:
+        filtro = {} if texto.lower() == "todos" else interpreta(texto)
+        if monta(filtro) is None and texto.lower() != "todos":  # ENTER sem filtro não pode virar uma exclusão de tudo.
+            print("Filtro vazio: digite um critério, ou 'todos' para aplicar em todos os lançamentos.")
+            return
+        carrega_filtro(filtro)
+        ids, _ = indices.consulta(filtro)
+    except ValueError as erro:
+        print(f"Filtro inválido: {erro}")
+        return
+    if not ids:
+        print("Nenhum lançamento encontrado para o filtro.")
+        return
+    print(f"{len(ids)} lançamentos encontrados (do ID {ids[0]} ao {ids[-1]}).")
+    print("Digite 'E' para excluir todos, 'T' para trocar o tipo ou 'J' para trocar a taxa de juros dos investimentos (ENTER cancela):")
+    acao = input(">> ").upper()
+
+    codigo = taxa = None
+    if acao == "T":
+        print("Digite o novo tipo: 'r' para receita, 'i' para investimento, 'd' para despesa.")
+        codigo = {"R": CODIGO_TIPO["Receita"], "I": CODIGO_TIPO["Investimento"], "D": CODIGO_TIPO["Despesa"]}.get(input(">> ").upper())
+        if codigo is None:
+            print("Opção de tipo de lançamento inválida.")
+            return
+    elif acao == "J":
+        print("Digite o novo valor percentual da taxa de juros mensal:")
+        taxa_digitada = input(">> ")
+        if not is_number(taxa_digitada):
+            print("Valor de taxa inválido.")
+            return
+        taxa = taxa_para_inteiro(taxa_digitada)
+    elif acao != "E":
+        print("Operação cancelada.")
+        return
+
+    confirmacao = input(f"Tem certeza que deseja alterar os {len(ids)} lançamentos? [S/N]").upper()
+    if confirmacao != "S":
+        print("Operação cancelada.")
+        return
+    if acao == "E":
+        quantidade = excluir_em_lote(lancamentos, ids)
+        print(f"{quantidade} lançamentos excluídos com sucesso!")
+    else:
+        quantidade = alterar_em_lote(lancamentos, ids, codigo, taxa)
+        print(f"{quantidade} lançamentos atualizados com sucesso!")
+    conta_linhas(quantidade)
 
-        for registro in lancamentos.values():
-            writer.writerow(registro)
 
-    print(f"Relatório exportado com sucesso para {nome_relatorio}!")
+@medido("importacao")
+def importar_extrato(nome_extrato=None): # Inclui os lançamentos de um extrato (CSV ou JSON Lines, com gzip ou não), pulando os que já existem. Chamada no menu principal, pela opção 11.
+    # O extrato é lido em fluxo e gravado em lotes; depois de cada lote as alterações são salvas, como no 'SALVAR' (ver importacao.py).
+    if nome_extrato is None:
+        print("Digite o nome do arquivo do extrato (.csv, .csv.gz, .jsonl ou .jsonl.gz):")
+        nome_extrato = input(">> ").strip()
+    try:
+        resumo = importa(lancamentos, nome_extrato, ao_gravar_lote=diario.salvar)
+    except ValueError as erro:
+        print(f"Não foi possível importar o extrato: {erro}")
+        return
+
+    conta_linhas(resumo["lidas"])
+    print(f"{resumo['importadas']} lançamentos importados de {nome_extrato}, {resumo['duplicadas']} já existentes e {resumo['invalidas']} inválidos "
+          f"({resumo['lidas']} linhas, {resumo['linhas_por_segundo']:.0f} por segundo).")
+    for linha, mensagem in resumo["erros"][:10]:
+        print(f"  Linha {linha}: {mensagem}")
+
+
+@medido("recorrencias")
+def gerenciar_recorrencias(): # Lista, inclui e exclui as receitas e despesas recorrentes (ver recorrencias.py). Chamada no menu principal, pela opção 12.
+    # Uma recorrência é gravada como uma regra só; as ocorrências aparecem nos filtros, no resultado mensal e na exportação sem virar lançamentos.
+    if recorrencias:
+        colunas = ["Nº", "Tipo", "Valor", "Frequência", "Data Inicial", "Data Final"]
+        tabela = [[regra.numero, TIPOS[regra.tipo], centavos_para_reais(regra.valor), regra.frequencia, ordinal_para_data(regra.inicio),
+                   ordinal_para_data(regra.fim) if regra.fim != SEM_DATA else "sem fim"] for regra in recorrencias]
+        print(tabulate(tabela, headers=colunas, tablefmt="fancy_grid"))
+    else:
+        print("Nenhum lançamento recorrente cadastrado.")
+    print("Digite 'I' para incluir uma recorrência, 'E' para excluir (ENTER volta ao menu):")
+    acao = input(">> ").upper()
+
+    if acao == "E":
+        print("Digite o número da recorrência que deseja excluir:")
+        numero = input(">> ")
+        if not numero.isdigit() or int(numero) not in recorrencias.regras:
+            print("Recorrência não encontrada.")
+            return
+        recorrencias.excluir(int(numero))
+        print(f"Recorrência {numero} excluída com sucesso!")
+    elif acao == "I":
+        print("Digite 'r' para receita ou 'd' para despesa:")
+        codigo = {"R": CODIGO_TIPO["Receita"], "D": CODIGO_TIPO["Despesa"]}.get(input(">> ").upper())
+        if codigo is None:
+            print("Opção de tipo de lançamento inválida.")
+            return
+        print("Digite o valor de cada ocorrência:")
+        valor = input(">> ")
+        if not is_number(valor):
+            print("Valor inválido.")
+            return
+        print(f"Digite a frequência ({', '.join(FREQUENCIAS)}):")
+        frequencia = input(">> ").strip().lower()
+        if frequencia not in FREQUENCIAS:
+            print("Frequência inválida.")
+            return
+        print("Data da primeira ocorrência:")
+        inicio = data_para_ordinal(pergunta_data())
+        print("Digite a data final no formato dd/mm/aaaa (ou pressione Enter para não ter fim):")
+        texto_fim = input(">> ").strip()
+        try:
+            fim = data_para_ordinal(texto_fim) if texto_fim else SEM_DATA
+            numero = recorrencias.incluir(codigo, reais_para_centavos(valor), frequencia, inicio, fim)
+        except ValueError as erro:
+            print(f"Recorrência inválida: {erro}")
+            return
+        print(f"Recorrência {numero} criada com sucesso!")
+    conta_linhas(len(recorrencias))
 
 
 def roda_programa():
     limpar_terminal()
     checa_arquivo_csv()  # se não existir, essa função cria o arquivo. Se existir, carrega as informações dele.
+    global autosalvamento
+    if autosalvar_intervalo > 0 and not banco_sqlite and particoes is None:  # No banco SQLite salvar é o COMMIT da conexão, que não pode ser usada em outra thread; as partições são lidas das colunas ao salvar.
+        autosalvamento = Autosalvamento(lancamentos, diario, autosalvar_intervalo, autosalvar_espera, autosalvar_alteracoes).iniciar()
 
     while True:
         opcao = recebe_opcao_do_menu()
@@ -643,11 +977,52 @@ def roda_programa():
         elif opcao == "7":
             # print(f"Opção {opcao} selecionada.")
             exportar_relatorio(lancamentos)
+        elif opcao == "8":
+            projetar_carteira()
+        elif opcao == "9":
+            calcular_totais_por_periodo()
+        elif opcao == "10":
+            editar_em_lote()
+        elif opcao == "11":
+            importar_extrato()
+        elif opcao == "12":
+            gerenciar_recorrencias()
+        elif opcao.upper() == "COMPACTAR":
+            compacta_arquivo()
         elif opcao != "" and opcao.upper() in "SALVAR":
             print(f"Opção SALVAR selecionada.")
             salva_em_arquivo()
         else:
+            if autosalvamento is not None:
+                autosalvamento.encerrar()  # Para a thread do salvamento automático e salva o que faltou.
+            elif diario.alteracoes_pendentes():  # Sem salvamento automático, o que não foi salvo se perderia na saída.
+                print(f"Há {diario.alteracoes_pendentes()} alterações não salvas. Salvar antes de sair? (S/N)")
+                if input(">> ").strip().upper() != "N":
+                    salva_em_arquivo()
+            diario.aguardar()  # Se uma compactação estiver rodando, espera ela terminar antes de sair.
             print("Até a próxima!")
             break
 
-roda_programa()
\ No newline at end of file
+if __name__ == "__main__": # Só roda o menu quando o arquivo é executado direto; os processos da carga paralela importam este módulo sem abrir o menu.
+    parser = argparse.ArgumentParser(description="EcoBalance: controle de receitas, despesas e investimentos.")
+    parser.add_argument("--perfil", action="store_true", help="mede cada operação e mostra o resumo ao sair (ou ECOBALANCE_PERFIL=1)")
+    parser.add_argument("--perfil-trace", metavar="ARQUIVO", help="grava também um trace JSON das operações")
+    parser.add_argument("--perfil-cprofile", metavar="ARQUIVO", help="grava também o perfil do cProfile")
+    parser.add_argument("--autosalvar-intervalo", type=float, default=autosalvar_intervalo, metavar="SEGUNDOS",
+                        help=f"tempo máximo de uma alteração sem salvar, 0 desliga o salvamento automático (padrão: {autosalvar_intervalo:g})")
+    parser.add_argument("--autosalvar-espera", type=float, default=autosalvar_espera, metavar="SEGUNDOS",
+                        help=f"salva depois desse tempo sem alteração nova (padrão: {autosalvar_espera:g})")
+    parser.add_argument("--autosalvar-alteracoes", type=int, default=autosalvar_alteracoes, metavar="N",
+                        help=f"salva na hora ao juntar N alterações (padrão: {autosalvar_alteracoes})")
+    parser.add_argument("--cache-mb", type=float, default=cache.limite_bytes / 2**20, metavar="MIB",
+                        help=f"memória do cache de resultados dos filtros e relatórios, 0 desliga (padrão: {cache.limite_bytes / 2**20:g})")
+    argumentos = parser.parse_args()
+    cache.limite_bytes = int(argumentos.cache_mb * 2**20)
+    autosalvar_intervalo = argumentos.autosalvar_intervalo
+    autosalvar_espera = argumentos.autosalvar_espera
+    autosalvar_alteracoes = argumentos.autosalvar_alteracoes
+    if argumentos.perfil or argumentos.perfil_trace or argumentos.perfil_cprofile:
+        instrumentacao.ativar(argumentos.perfil_trace, argumentos.perfil_cprofile)
+    else:
+        instrumentacao.ativar_pelo_ambiente()
+    roda_programa()
\ No newline at end of file
@@ -0,0 +1,215 @@
+import bisect
+
+from tabulate import tabulate  # pra formatar a tabela na hora de mostrar
+
+from armazenamento import REMOVIDO
+from instrumentacao import conta_linhas, medido
+
+
+# Mostra tabelas de lançamentos uma página por vez, para a listagem continuar rápida com milhões de linhas.
+# Só as linhas da página são lidas e formatadas, e o tabulate calcula a largura das colunas só com elas.
+# A página é andada por posição numa sequência de ids em ordem crescente: a coluna 'ids' do armazenamento colunar
+# (pulando as posições removidas) ou a lista de ids de um filtro. Ir até um id é uma bisseção nessa sequência.
+# As tabelas de linhas geradas (ocorrências de recorrências, projeção, totais por período) são paginadas por posição, com por_id=False:
+# nelas um número digitado é o número da página, já que as posições não são ids.
+# No livro-caixa particionado (ver particoes.py), o PaginadorMensal anda mês a mês e só carrega a partição do mês da página.
+TAMANHO_PAGINA = 20
+
+
+class Paginador:  # Anda pelas páginas de uma sequência de ids em ordem crescente. 'vivo(posicao)' diz se a posição conta (por padrão todas contam).
+    # Com por_id=False a sequência é de posições de linhas geradas, não de ids: só a navegação por número de página vale.
+    def __init__(self, ids, total, vivo=None, tamanho_pagina=TAMANHO_PAGINA, por_id=True):
+        self.ids = ids
+        self.total = total
+        self.vivo = vivo or (lambda posicao: True)
+        self.tamanho_pagina = tamanho_pagina
+        self.por_id = por_id
+        self.inicio = 0  # Posição da primeira linha da página atual.
+        self.posicoes = []  # Posições das linhas da página atual.
+        self.fim = 0  # Posição logo depois da última linha da página atual.
+        self._vai_para(0)
+
+    @classmethod
+    def do_armazenamento(cls, lancamentos, tamanho_pagina=TAMANHO_PAGINA):  # Páginas de todos os lançamentos, direto das colunas.
+        if not hasattr(lancamentos, "tipos"):  # Banco SQLite (ver banco_sqlite.py): os ids vêm do banco aos poucos e não há posições removidas.
+            return cls(lancamentos.sequencia_de_ids(), len(lancamentos), tamanho_pagina=tamanho_pagina)
+        tipos = lancamentos.tipos
+        return cls(lancamentos.ids, len(lancamentos), lambda posicao: tipos[posicao] != REMOVIDO, tamanho_pagina)
+
+    def _vai_para(self, inicio):  # Monta a página que começa na primeira posição válida a partir de 'inicio'.
+        posicoes = []
+        posicao = inicio
+        while posicao < len(self.ids) and len(posicoes) < self.tamanho_pagina:
+            if self.vivo(posicao):
+                posicoes.append(posicao)
+            posicao += 1
+        self.inicio = posicoes[0] if posicoes else inicio
+        self.posicoes = posicoes
+        self.fim = posicao
+
+    def ids_da_pagina(self):
+        return [self.ids[posicao] for posicao in self.posicoes]
+
+    def chave_da_pagina(self):  # Identifica a página atual no cache de páginas renderizadas.
+        return self.inicio
+
+    def tem_anterior(self):
+        return any(self.vivo(posicao) for posicao in range(self.inicio - 1, -1, -1))
+
+    def tem_proxima(self):
+        posicao = self.fim
+        while posicao < len(self.ids):
+            if self.vivo(posicao):
+                return True
+            posicao += 1
+        return False
+
+    def proxima(self):  # Avança uma página. Retorna False se já estava na última.
+        if not self.tem_proxima():
+            return False
+        self._vai_para(self.fim)
+        return True
+
+    def anterior(self):  # Volta uma página. Retorna False se já estava na primeira.
+        posicao = self.inicio - 1
+        contadas = 0
+        inicio = None
+        while posicao >= 0 and contadas < self.tamanho_pagina:
+            if self.vivo(posicao):
+                inicio = posicao
+                contadas += 1
+            posicao -= 1
+        if inicio is None:
+            return False
+        self._vai_para(inicio)
+        return True
+
+    def ir_para_id(self, id_):  # Vai para a página que começa no id (ou no primeiro id maior que ele, se não existir).
+        # Retorna False, ficando na última página, se não houver id a partir dele.
+        if not self.por_id:
+            raise ValueError("Esta tabela não é paginada por id.")
+        self._vai_para(bisect.bisect_left(self.ids, id_))
+        if self.posicoes:
+            return True
+        self.anterior()
+        return False
+
+    def numero_da_pagina(self):  # Número (a partir de 1) da página atual, contando as posições válidas antes dela.
+        return sum(1 for posicao in range(self.inicio) if self.vivo(posicao)) // self.tamanho_pagina + 1
+
+    def ir_para_pagina(self, numero):  # Vai para a página de número 'numero' (a partir de 1). Retorna False se ela não existir.
+        inicio = self.inicio
+        self._vai_para(0)
+        for _ in range(numero - 1):
+            if not self.proxima():
+                numero = 0
+                break
+        if numero < 1:  # Fica na página em que estava.
+            self._vai_para(inicio)
+            return False
+        return True
+
+
+class PaginadorMensal:  # Anda pelas páginas mês a mês, com a mesma interface do Paginador (por id). Só os meses das páginas mostradas são lidos.
+    # 'meses' são as chaves dos meses em ordem, 'ids_do_mes(mes)' carrega o mês e devolve os ids dele em ordem crescente e 'mes_do_id(id_)'
+    # devolve o mês do lançamento (ou None se ele não existir). Os meses sem lançamentos são pulados.
+    def __init__(self, meses, ids_do_mes, total, mes_do_id, tamanho_pagina=TAMANHO_PAGINA):
+        self.meses = list(meses)
+        self.ids_do_mes = ids_do_mes
+        self.total = total
+        self.mes_do_id = mes_do_id
+        self.tamanho_pagina = tamanho_pagina
+        self.por_id = True
+        self.indice = 0  # Posição do mês atual em 'meses'.
+        self.pagina = Paginador([], 0, tamanho_pagina=tamanho_pagina)  # Páginas do mês atual.
+        self._abre_mes(0, 1)
+
+    def _abre_mes(self, indice, passo):  # Vai para o primeiro mês com lançamentos a partir de 'indice', andando 'passo' (1 ou -1). Retorna False se não houver.
+        while 0 <= indice < len(self.meses):
+            ids = self.ids_do_mes(self.meses[indice])
+            if ids:
+                self.indice = indice
+                self.pagina = Paginador(ids, len(ids), tamanho_pagina=self.tamanho_pagina)
+                return True
+            indice += passo
+        return False
+
+    def ids_da_pagina(self):
+        return self.pagina.ids_da_pagina()
+
+    def chave_da_pagina(self):
+        return (self.meses[self.indice] if self.meses else None, self.pagina.inicio)
+
+    def tem_proxima(self):  # Sem ler os meses seguintes: um mês que ficou sem lançamentos só é descoberto ao avançar.
+        return self.pagina.tem_proxima() or self.indice + 1 < len(self.meses)
+
+    def tem_anterior(self):
+        return self.pagina.tem_anterior() or self.indice > 0
+
+    def proxima(self):
+        if self.pagina.proxima():
+            return True
+        return self._abre_mes(self.indice + 1, 1)
+
+    def anterior(self):  # Volta uma página; da primeira página do mês, vai para a última do mês anterior.
+        if self.pagina.anterior():
+            return True
+        if not self._abre_mes(self.indice - 1, -1):
+            return False
+        while self.pagina.proxima():
+            pass
+        return True
+
+    def ir_para_id(self, id_):  # Vai para a página do mês do lançamento que começa nele. Retorna False se o id não existir.
+        mes = self.mes_do_id(id_)
+        if mes is None or mes not in self.meses:
+            return False
+        self._abre_mes(self.meses.index(mes), 1)
+        return self.pagina.ir_para_id(id_)
+
+
+@medido("renderizacao")
+def mostra_pagina(paginador, colunas, monta_linha, cache=None, chave=None):  # Formata e mostra só a página atual. Retorna os ids mostrados.
+    # Com 'cache' (cache.CacheDeResultados), o texto da página fica guardado sob (chave, posição da página) até a próxima mudança no livro-caixa.
+    ids = paginador.ids_da_pagina()
+
+    def renderiza():
+        return tabulate([monta_linha(id_) for id_ in ids], headers=colunas, tablefmt="fancy_grid")
+    print(renderiza() if cache is None or chave is None else cache.obter(("pagina", chave, paginador.chave_da_pagina(), paginador.tamanho_pagina), renderiza))
+    conta_linhas(len(ids))
+    return ids
+
+
+def mostra_paginas(paginador, colunas, monta_linha, cache=None, chave=None):  # Mostra a tabela página por página e pergunta para onde ir. Com uma página só, mostra e volta direto.
+    # 'monta_linha(id_)' devolve a lista de valores da linha. Enter avança, 'A' volta, um número vai até aquele ID (ou até aquela página, num paginador
+    # por posição) e 'S' (ou Enter na última página) sai.
+    # 'cache' e 'chave' guardam as páginas renderizadas (ver mostra_pagina); a chave identifica a tabela (a consulta que gerou os ids).
+    while True:
+        ids = mostra_pagina(paginador, colunas, monta_linha, cache, chave)
+        if not paginador.tem_proxima() and not paginador.tem_anterior():
+            return
+        if not paginador.por_id:
+            print(f"Página {paginador.numero_da_pagina()} de {-(-paginador.total // paginador.tamanho_pagina)}.")
+            print("ENTER para a próxima página, 'A' para a anterior, o número de uma página para ir até ela ou 'S' para sair:")
+        else:
+            if ids:
+                print(f"IDs {ids[0]} a {ids[-1]} de {paginador.total} lançamentos.")
+            print("ENTER para a próxima página, 'A' para a anterior, um ID para ir até ele ou 'S' para sair:")
+        opcao = input(">> ").strip().upper()
+
+        if opcao == "":
+            if not paginador.proxima():
+                return
+        elif opcao == "A":
+            if not paginador.anterior():
+                print("Esta já é a primeira página.")
+        elif opcao.isdigit() and not paginador.por_id:
+            if not paginador.ir_para_pagina(int(opcao)):
+                print("Essa página não existe.")
+        elif opcao.isdigit():
+            if not paginador.ir_para_id(int(opcao)):
+                print("Nenhum lançamento a partir desse ID.")
+        elif opcao == "S":
+            return
+        else:
+            print("Opção inválida.")
@@ -0,0 +1,358 @@
+import array
+import csv
+import datetime
+import heapq
+import json
+import os
+import threading
+
+from agregados import DESPESA, INVESTIMENTO, RECEITA, formata_mes, mes_do_ordinal
+from armazenamento import (CODIGO_TIPO, REMOVIDO, SEM_DATA, SEM_VALOR, LancamentosColunares, centavos_para_reais, data_para_ordinal,
+                           ordinal_para_data, reais_para_centavos, taxa_para_inteiro)
+from diario import COLUNAS, Diario, linha_csv
+
+
+# Livro-caixa particionado por mês (ligado com ECOBALANCE_PARTICOES=1): em vez de um registros.csv só, carregado e regravado inteiro,
+# cada mês fica num CSV próprio dentro da pasta '<arquivo de dados>.particoes', com as mesmas colunas do registros.csv.
+# O 'manifesto.json' da pasta guarda, para cada partição, o nome do arquivo, a quantidade de linhas, o menor e o maior id,
+# a receita, a despesa e o rendimento do mês em centavos, a quantidade de investimentos e o investimento não atualizado de menor id ([id, data] ou null).
+#
+# A carga lê só o manifesto e as partições do ano atual (e as futuras). As outras são lidas quando alguém precisa delas:
+#   - um id que não está na memória (editar, excluir) carrega as partições cuja faixa de ids o contém;
+#   - registros_em_blocos (exportação, projeção, importação) carrega as partições do período pedido;
+#   - os filtros e os totais por período carregam a faixa de datas antes de consultar os índices (ver main.carrega_periodo);
+#   - o resultado mensal não carrega nada: os meses que não estão na memória vêm dos totais do manifesto;
+#   - a listagem anda mês a mês (ver paginacao.PaginadorMensal) e a atualização dos rendimentos só lê os meses com investimentos.
+# Salvar regrava só as partições dos meses alterados desde o último salvamento (uma alteração que muda a data marca os dois meses),
+# cada uma num arquivo novo ('AAAA-MM.<geração>.csv'); o manifesto é trocado com os.replace depois delas e só então os arquivos
+# antigos são apagados. Se o programa cair no meio, o manifesto antigo continua apontando para partições inteiras.
+# Na primeira carga sem manifesto, o registros.csv (e o diário dele) é lido inteiro e gravado já particionado; ele não é apagado.
+MANIFESTO = "manifesto.json"
+VERSAO_MANIFESTO = 1
+
+
+def nome_do_mes(mes):  # Chave inteira do mês (ver agregados.mes_do_ordinal) -> 'AAAA-MM'.
+    return f"{mes // 12:04d}-{mes % 12 + 1:02d}"
+
+
+def mes_do_nome(nome):  # 'AAAA-MM' -> chave inteira do mês.
+    ano, mes = nome.split("-")
+    return int(ano) * 12 + int(mes) - 1
+
+
+def dias_do_mes(mes):  # (primeiro, último) ordinais do mês.
+    primeiro = datetime.date(mes // 12, mes % 12 + 1, 1).toordinal()
+    return primeiro, datetime.date((mes + 1) // 12, (mes + 1) % 12 + 1, 1).toordinal() - 1
+
+
+def _valores(linha):  # Linha do CSV (sem o id) -> valores crus das colunas, como o LancamentosColunares._converte.
+    data, tipo, valor, taxa, data_inv, atualizado = linha
+    return (data_para_ordinal(data), CODIGO_TIPO[tipo], reais_para_centavos(valor), taxa_para_inteiro(taxa) if taxa else SEM_VALOR,
+            data_para_ordinal(data_inv) if data_inv else SEM_DATA, reais_para_centavos(atualizado) if atualizado else SEM_VALOR)
+
+
+def le_particao(caminho):  # Lista de (id, valores crus) da partição, em ordem de id.
+    with open(caminho, mode="r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        lidos = [(int(linha[0]), _valores(linha[1:])) for linha in reader if linha]
+    lidos.sort()
+    return lidos
+
+
+def resumo_da_particao(arquivo, registros):  # Entrada do manifesto para a partição com esses registros (Registro ou tuplas na mesma ordem).
+    resumo = {"arquivo": arquivo, "linhas": len(registros), "menor_id": registros[0][0], "maior_id": registros[-1][0],
+              "receita": 0, "despesa": 0, "rendimento": 0, "investimentos": 0, "pendente": None}
+    for id_, data, tipo, valor, _, _, atualizado in registros:
+        if tipo == RECEITA:
+            resumo["receita"] += valor
+        elif tipo == DESPESA:
+            resumo["despesa"] += valor
+        elif tipo == INVESTIMENTO:
+            resumo["investimentos"] += 1
+            if atualizado == SEM_VALOR:
+                if resumo["pendente"] is None or id_ < resumo["pendente"][0]:
+                    resumo["pendente"] = [id_, data]
+            else:
+                resumo["rendimento"] += atualizado - valor
+    return resumo
+
+
+class LancamentosParticionados(LancamentosColunares):  # Armazenamento colunar que pede ao LivroParticionado as partições que ainda não estão na memória.
+    # As colunas só têm os lançamentos das partições carregadas; 'livro' completa o resto sob demanda (ids, varreduras e o próximo id).
+    livro = None
+
+    def _posicao(self, id_):
+        try:
+            return super()._posicao(id_)
+        except KeyError:
+            if self.livro is None or not self.livro.carrega_id(id_):
+                raise
+        return super()._posicao(id_)
+
+    def __contains__(self, id_):
+        if super().__contains__(id_):
+            return True
+        return self.livro is not None and self.livro.carrega_id(id_) and super().__contains__(id_)
+
+    def gravar_valores(self, id_, valores):
+        if self.livro is not None:
+            self.livro.carrega_id(id_)  # Um id de uma partição que não está na memória: carrega antes, para não ficar duplicado.
+        super().gravar_valores(id_, valores)
+
+    def proximo_id(self):  # Também conta os ids das partições que ainda não foram carregadas.
+        proximo = super().proximo_id()
+        return proximo if self.livro is None else max(proximo, self.livro.maior_id + 1)
+
+    def __len__(self):  # Lançamentos na memória mais os das partições ainda não carregadas.
+        return super().__len__() + (0 if self.livro is None else self.livro.linhas_nao_carregadas())
+
+    def __iter__(self):
+        if self.livro is not None:
+            self.livro.carrega_tudo()
+        return super().__iter__()
+
+    def items(self):
+        if self.livro is not None:
+            self.livro.carrega_tudo()
+        return super().items()
+
+    def linhas(self):
+        if self.livro is not None:
+            self.livro.carrega_tudo()
+        return super().linhas()
+
+    def registros_em_blocos(self, tamanho=65536, data_inicial=None, data_final=None, tipo=None):  # Só carrega as partições do período pedido.
+        if self.livro is not None:
+            self.livro.garante(data_inicial, data_final)
+        return super().registros_em_blocos(tamanho, data_inicial, data_final, tipo)
+
+
+class LivroParticionado:  # Partições mensais do livro-caixa em disco. Faz o papel do diário (carregar, salvar, compactar) e do resultado mensal.
+    # É um observador do armazenamento: anota em 'sujas' os meses alterados desde o último salvamento. 'agregado' (AgregadoMensal) e
+    # 'indices' (IndiceLancamentos) são os das mesmas colunas: o primeiro tem os totais dos meses na memória e o segundo acha as linhas de um mês ao salvar.
+    def __init__(self, lancamentos, agregado, indices, nome_arquivo):
+        self.lancamentos = lancamentos
+        self.agregado = agregado
+        self.indices = indices
+        self.nome_arquivo = nome_arquivo
+        self.pasta = nome_arquivo + ".particoes"
+        self.caminho_manifesto = os.path.join(self.pasta, MANIFESTO)
+        self.particoes = {}  # mês -> entrada do manifesto (ver resumo_da_particao)
+        self.carregadas = set()  # Meses cuja partição já está nas colunas.
+        self.sujas = set()
+        self.alteracoes = 0  # Alterações desde o último salvamento.
+        self.geracao = 0  # Número do último salvamento, vai no nome dos arquivos das partições.
+        self.maior_id = 0
+        self._pausado = False
+        self._trava_carga = threading.RLock()  # Leituras em threads diferentes (ver servidor.py) podem pedir o mesmo mês ao mesmo tempo.
+        lancamentos.livro = self
+        lancamentos.observadores.append(self)
+
+    # ---- interface de observador ----
+
+    def alterado(self, antes, depois):
+        if self._pausado:
+            return
+        for registro in (antes, depois):
+            if registro is not None:
+                self.sujas.add(mes_do_ordinal(registro.data))
+        self.alteracoes += 1
+
+    def alterados(self, mudancas):
+        if self._pausado:
+            return
+        for antes, depois in mudancas:
+            for registro in (antes, depois):
+                if registro is not None:
+                    self.sujas.add(mes_do_ordinal(registro.data))
+        self.alteracoes += len(mudancas)
+
+    def limpo(self):  # As colunas foram zeradas ou trocadas por fora: elas passam a ser o livro-caixa inteiro, e o próximo salvamento regrava tudo.
+        if self._pausado:
+            return
+        self.carregadas = set(self.particoes)
+        self.sujas.update(self.particoes)
+        self.sujas.update(self.agregado.meses)
+        self.alteracoes += 1
+
+    # ---- carga sob demanda ----
+
+    def nao_carregadas(self):
+        return [mes for mes in self.particoes if mes not in self.carregadas]
+
+    def linhas_nao_carregadas(self):
+        return sum(self.particoes[mes]["linhas"] for mes in self.nao_carregadas())
+
+    def garante(self, data_inicial=None, data_final=None):  # Carrega as partições que cruzam o período (ordinais, inclusive; None não limita). Retorna quantas linhas leu.
+        primeiro = None if data_inicial is None else mes_do_ordinal(data_inicial)
+        ultimo = None if data_final is None else mes_do_ordinal(data_final)
+        return self._carrega([mes for mes in self.nao_carregadas() if (primeiro is None or mes >= primeiro) and (ultimo is None or mes <= ultimo)])
+
+    def carrega_tudo(self):
+        return self._carrega(self.nao_carregadas())
+
+    def carrega_investimentos(self):  # Carrega só as partições com investimentos (as de um manifesto sem a contagem também).
+        return self._carrega([mes for mes in self.nao_carregadas() if self.particoes[mes].get("investimentos", 1)])
+
+    def meses(self):  # Meses com lançamentos, no disco ou só na memória, em ordem.
+        return sorted(set(self.particoes) | set(self.agregado.meses))
+
+    def ids_do_mes(self, mes):  # Carrega a partição do mês e devolve os ids dele em ordem crescente.
+        primeiro, ultimo = dias_do_mes(mes)
+        self.garante(primeiro, ultimo)
+        return sorted(self.indices.ids_na_faixa("data", primeiro, ultimo))
+
+    def mes_do_id(self, id_):  # Mês do lançamento (carregando a partição dele, se preciso), ou None se o id não existir.
+        if id_ not in self.lancamentos:
+            return None
+        return mes_do_ordinal(self.lancamentos.registros_por_ids([id_])[0].data)
+
+    def carrega_id(self, id_):  # Carrega as partições (não carregadas) cuja faixa de ids contém o id. Retorna True se leu alguma.
+        if id_ > self.maior_id:
+            return False
+        meses = [mes for mes in self.nao_carregadas() if self.particoes[mes]["menor_id"] <= id_ <= self.particoes[mes]["maior_id"]]
+        return self._carrega(meses) > 0
+
+    def _carrega(self, meses):  # Lê as partições dos meses (as que ainda não estão na memória) e junta os lançamentos nas colunas, sem marcá-los como alterados.
+        # Sob '_trava_carga', e os meses já carregados são tirados dentro dela: duas threads pedindo o mesmo mês não o juntam duas vezes.
+        with self._trava_carga:
+            meses = [mes for mes in meses if mes not in self.carregadas]
+            if not meses:
+                return 0
+            lidos = []
+            for mes in meses:
+                lidos.extend(le_particao(os.path.join(self.pasta, self.particoes[mes]["arquivo"])))
+            lidos.sort()
+            self._pausado = True
+            try:
+                self._junta(lidos)
+            finally:
+                self._pausado = False
+            self.carregadas.update(meses)
+            return len(lidos)
+
+    def _junta(self, lidos):  # Poucos ids maiores que todos os da memória vão para o fim (incluir_em_lote); senão as colunas são intercaladas de novo, em O(n).
+        # Remontar as colunas faz os outros observadores se refazerem do zero (limpo), o que sai mais barato que avisar linha a linha quando chegam muitas.
+        colunas = self.lancamentos
+        if not lidos:
+            return
+        if colunas.ids and lidos[0][0] > colunas.ids[-1] and len(lidos) < len(colunas.ids):
+            colunas.incluir_em_lote(lidos)
+            return
+        memoria = ((linha[0], linha[1:]) for linha in zip(*colunas._colunas()) if linha[2] != REMOVIDO)
+        novas = tuple(array.array(coluna.typecode) for coluna in colunas._colunas())
+        for id_, valores in heapq.merge(memoria, lidos):
+            novas[0].append(id_)
+            for coluna, valor in zip(novas[1:], valores):
+                coluna.append(valor)
+        colunas.substituir_colunas(*novas)  # Os outros observadores se refazem (limpo); este está pausado.
+
+    def carregar(self, carrega_base):  # Lê o manifesto e as partições a partir do ano atual. Sem manifesto, lê o arquivo base com 'carrega_base' e grava as partições.
+        self.particoes, self.carregadas, self.sujas = {}, set(), set()
+        if len(self.lancamentos.ids):  # Carga de novo (a API pode carregar mais de uma vez): as partições entram em colunas vazias.
+            self._pausado = True
+            try:
+                self.lancamentos.limpar()
+            finally:
+                self._pausado = False
+        if not os.path.exists(self.caminho_manifesto):
+            if os.path.exists(self.nome_arquivo):
+                self._migra(carrega_base)
+            return
+        with open(self.caminho_manifesto, encoding="utf-8") as file:
+            manifesto = json.load(file)
+        self.geracao = manifesto["geracao"]
+        self.particoes = {mes_do_nome(nome): particao for nome, particao in manifesto["particoes"].items()}
+        self.maior_id = max((particao["maior_id"] for particao in self.particoes.values()), default=0)
+        self.garante(datetime.date(datetime.date.today().year, 1, 1).toordinal())
+        self.alteracoes = 0
+
+    def _migra(self, carrega_base):  # Carrega o registros.csv com o diário dele, como o Diario faria, e grava tudo particionado.
+        self._pausado = True
+        diario = Diario(self.lancamentos, self.nome_arquivo)
+        try:
+            diario.carregar(carrega_base)
+        finally:
+            self.lancamentos.observadores.remove(diario)
+            self._pausado = False
+        self.limpo()
+        self.salvar()
+
+    # ---- salvamento ----
+
+    def salvar(self, compactar_se_preciso=True):  # Regrava as partições dos meses alterados e depois o manifesto. Retorna quantas alterações foram gravadas.
+        if not self.sujas:
+            return 0
+        self._carrega([mes for mes in self.sujas if mes in self.particoes])  # O que já está no disco dos meses alterados entra junto na partição nova.
+        os.makedirs(self.pasta, exist_ok=True)
+        self.geracao += 1
+        particoes = dict(self.particoes)
+        for mes in sorted(self.sujas):
+            primeiro, ultimo = dias_do_mes(mes)
+            registros = self.lancamentos.registros_por_ids(sorted(self.indices.ids_na_faixa("data", primeiro, ultimo)))
+            if not registros:
+                particoes.pop(mes, None)
+                continue
+            arquivo = f"{nome_do_mes(mes)}.{self.geracao}.csv"
+            with open(os.path.join(self.pasta, arquivo), mode="w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(COLUNAS)
+                writer.writerows(linha_csv(registro) for registro in registros)
+                file.flush()
+                os.fsync(file.fileno())
+            particoes[mes] = resumo_da_particao(arquivo, registros)
+        self._grava_manifesto(particoes)
+        antigos = {particao["arquivo"] for particao in self.particoes.values()} - {particao["arquivo"] for particao in particoes.values()}
+        for arquivo in antigos:  # Só depois do manifesto novo no disco.
+            os.remove(os.path.join(self.pasta, arquivo))
+        self.carregadas = {mes for mes in particoes if mes in self.carregadas or mes in self.sujas}
+        self.particoes = particoes
+        self.maior_id = max((particao["maior_id"] for particao in particoes.values()), default=0)
+        alteracoes, self.alteracoes = self.alteracoes, 0
+        self.sujas = set()
+        return alteracoes
+
+    def _grava_manifesto(self, particoes):
+        temporario = self.caminho_manifesto + ".tmp"
+        with open(temporario, mode="w", encoding="utf-8") as file:
+            json.dump({"versao": VERSAO_MANIFESTO, "geracao": self.geracao,
+                       "particoes": {nome_do_mes(mes): particoes[mes] for mes in sorted(particoes)}}, file, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporario, self.caminho_manifesto)
+
+    def alteracoes_pendentes(self):
+        return self.alteracoes
+
+    def precisa_compactar(self):  # Sem diário, não há o que juntar.
+        return False
+
+    def compactar(self, em_segundo_plano=False):  # Cada salvamento já regrava as partições alteradas por inteiro; compactar só salva.
+        self.salvar()
+
+    def aguardar(self):
+        pass
+
+    # ---- resultado mensal ----
+
+    def resultados(self):  # Como AgregadoMensal.resultados, com os meses que não estão na memória tirados do manifesto, sem ler as partições.
+        meses = {mes: [receita, despesa] for mes, (receita, despesa, _) in self.agregado.meses.items()}
+        for mes in self.nao_carregadas():
+            particao = self.particoes[mes]
+            totais = meses.setdefault(mes, [0, 0])
+            totais[0] += particao["receita"] + particao["rendimento"]
+            totais[1] += particao["despesa"]
+        return [(formata_mes(mes), centavos_para_reais(receita), centavos_para_reais(despesa), centavos_para_reais(receita + despesa))
+                for mes, (receita, despesa) in sorted(meses.items(), key=lambda item: (item[0] % 12, item[0] // 12))]
+
+    def investimento_pendente(self):  # Data ('dd/mm/aaaa') do investimento não atualizado de menor id, na memória ou no manifesto, ou None.
+        pendentes = dict(self.agregado.pendentes)
+        for mes in self.nao_carregadas():
+            if self.particoes[mes]["pendente"] is not None:
+                id_, data = self.particoes[mes]["pendente"]
+                pendentes[id_] = data
+        return ordinal_para_data(pendentes[min(pendentes)]) if pendentes else None
+
+    def conferir(self):  # Confere os totais dos meses na memória (ver AgregadoMensal.conferir).
+        return self.agregado.conferir()
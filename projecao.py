@@ -0,0 +1,132 @@
+import array
+import bisect
+import calendar
+import datetime
+from itertools import accumulate
+from operator import add
+
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR, centavos_para_reais, data_para_ordinal, inteiro_para_taxa, ordinal_para_data
+from rendimento import taxa_mensal_para_diaria
+
+
+# Projeção da carteira de investimentos numa grade de datas (diária, mensal ou qualquer lista de datas), no passado ou no futuro.
+# O montante de um investimento na data d é valor * base ** (d - data_investimento), com base = 1 + taxa_diaria / 100 (a mesma conta
+# do rendimento.py). Antes da data do investimento o montante é 0: o investimento ainda não estava na carteira.
+# Os montantes projetados são float em reais: são estimativas, não valores guardados, e não precisam da soma exata em centavos das colunas.
+#
+# Nada é calculado dia a dia em Python. Os investimentos são agrupados por taxa e, com o valor de cada um trazido para a primeira
+# data da grade (a âncora), o montante na data d da grade é inicial * base ** (d - ancora). As potências são calculadas uma vez
+# por taxa distinta e reaproveitadas por todos os investimentos daquela taxa:
+#   - series(): a série de cada investimento na grade inteira é o valor na âncora vezes a lista de potências da taxa (uma multiplicação por data).
+#     As séries são entregues uma por vez, então a memória usada é de poucos arrays do tamanho da grade, qualquer que seja a carteira.
+#   - totais(): o total de uma taxa na data d é base ** (d - ancora) vezes a soma acumulada dos investimentos já feitos até d
+#     (bisseção nas datas ordenadas). O custo é (taxas distintas x datas da grade), e não (investimentos x datas).
+
+
+def _ordinal(data):  # Aceita ordinal, date/datetime ou 'dd/mm/aaaa'.
+    if isinstance(data, int):
+        return data
+    try:
+        return data_para_ordinal(data)
+    except (ValueError, TypeError):
+        raise ValueError(f"Data inválida: {data!r} (use o formato dd/mm/aaaa).") from None
+
+
+def grade_de_datas(data_inicial, data_final, passo="diario"):  # Ordinais de data_inicial até data_final (inclusive), com passo "diario", "mensal" ou um número de dias.
+    # No passo mensal a grade cai no mesmo dia do mês de data_inicial (ou no último dia, nos meses mais curtos).
+    inicio, fim = _ordinal(data_inicial), _ordinal(data_final)
+    if fim < inicio:
+        raise ValueError("A data final da projeção é anterior à data inicial.")
+    if passo == "diario":
+        passo = 1
+    if passo == "mensal":
+        primeiro = datetime.date.fromordinal(inicio)
+        grade = array.array("i")
+        mes = primeiro.year * 12 + primeiro.month - 1
+        while True:
+            ano, numero_mes = divmod(mes, 12)
+            dia = min(primeiro.day, calendar.monthrange(ano, numero_mes + 1)[1])
+            ordinal = datetime.date(ano, numero_mes + 1, dia).toordinal()
+            if ordinal > fim:
+                return grade
+            grade.append(ordinal)
+            mes += 1
+    if not isinstance(passo, int) or passo < 1:
+        raise ValueError(f"Passo da projeção inválido: {passo!r} (use 'diario', 'mensal' ou um número de dias).")
+    return array.array("i", range(inicio, fim + 1, passo))
+
+
+class ProjecaoCarteira:  # Montante de cada investimento, e o total da carteira, em cada data da grade.
+    def __init__(self, lancamentos, grade):
+        # 'lancamentos' é o armazenamento colunar ou o banco SQLite (os dois têm registros_em_blocos); 'grade' são datas em qualquer formato aceito por _ordinal.
+        self.grade = array.array("i", sorted({_ordinal(data) for data in grade}))
+        if not self.grade:
+            raise ValueError("A grade de datas da projeção está vazia.")
+        self.ancora = self.grade[0]
+
+        investimentos = []  # (taxa mensal em ponto fixo, data do investimento, id, valor em centavos)
+        for bloco in lancamentos.registros_em_blocos(tipo=CODIGO_TIPO["Investimento"]):
+            investimentos.extend((taxa, data_inv, id_, valor) for id_, _, _, valor, taxa, data_inv, _ in bloco
+                                 if data_inv != SEM_DATA and taxa != SEM_VALOR)
+        investimentos.sort()
+
+        # Colunas dos investimentos, agrupados por taxa e, dentro de cada taxa, em ordem de data do investimento.
+        # Os investimentos da taxa self.taxas[g] ficam nas posições self.limites[g] até self.limites[g + 1] (exclusive).
+        self.ids = array.array("q")
+        self.datas_investimento = array.array("i")
+        self.iniciais = array.array("d")  # montante na âncora (descontado, se o investimento for posterior à âncora)
+        self.taxas = array.array("q")  # ponto fixo, como a coluna 'taxas' do armazenamento
+        self.bases = array.array("d")  # 1 + taxa_diaria / 100 de cada taxa
+        self.limites = array.array("q")
+        fatores = {}  # dias -> base ** dias, para a taxa atual
+        for posicao, (taxa, data_inv, id_, valor) in enumerate(investimentos):
+            if not self.taxas or taxa != self.taxas[-1]:
+                self.taxas.append(taxa)
+                self.bases.append(1 + (taxa_mensal_para_diaria(inteiro_para_taxa(taxa)) / 100))
+                self.limites.append(posicao)
+                fatores = {}
+            dias = self.ancora - data_inv
+            fator = fatores.get(dias)
+            if fator is None:
+                fator = fatores[dias] = self.bases[-1] ** dias
+            self.ids.append(id_)
+            self.datas_investimento.append(data_inv)
+            self.iniciais.append(centavos_para_reais(valor) * fator)
+        self.limites.append(len(investimentos))
+
+    def __len__(self):  # Quantidade de investimentos projetados.
+        return len(self.ids)
+
+    def _grupos(self):  # Gera (base, início, fim) de cada taxa.
+        return zip(self.bases, self.limites, self.limites[1:])
+
+    def _potencias(self, base):  # base ** (data - ancora) para cada data da grade.
+        return [base ** (data - self.ancora) for data in self.grade]
+
+    def series(self):  # Gera (id, array com o montante do investimento em cada data da grade), na ordem de self.ids. Antes da data do investimento o montante é 0.
+        zeros = array.array("d", bytes(8 * len(self.grade)))
+        for base, inicio, fim in self._grupos():
+            potencias = self._potencias(base)
+            for posicao in range(inicio, fim):
+                primeira = bisect.bisect_left(self.grade, self.datas_investimento[posicao])
+                inicial = self.iniciais[posicao]
+                yield self.ids[posicao], zeros[:primeira] + array.array("d", [inicial * potencia for potencia in potencias[primeira:]])
+
+    def totais(self):  # Array com o total da carteira em cada data da grade.
+        totais = array.array("d", bytes(8 * len(self.grade)))
+        if len(self.taxas) * 4 > len(self.ids):  # Quase uma taxa por investimento: somar as séries sai mais barato que agrupar.
+            for _, serie in self.series():
+                totais = array.array("d", map(add, totais, serie))
+            return totais
+
+        for base, inicio, fim in self._grupos():
+            datas = self.datas_investimento[inicio:fim]
+            acumulados = list(accumulate(self.iniciais[inicio:fim], initial=0.0))
+            for indice, (data, potencia) in enumerate(zip(self.grade, self._potencias(base))):
+                ativos = bisect.bisect_right(datas, data)
+                if ativos:
+                    totais[indice] += acumulados[ativos] * potencia
+        return totais
+
+    def linhas_dos_totais(self):  # Lista de ('dd/mm/aaaa', total), para mostrar ou devolver pela API.
+        return [(ordinal_para_data(data), total) for data, total in zip(self.grade, self.totais())]
@@ -0,0 +1,212 @@
+import calendar
+import csv
+import datetime
+import heapq
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from agregados import formata_mes, mes_do_ordinal
+from armazenamento import (CODIGO_TIPO, SEM_DATA, SEM_VALOR, TIPOS, Registro, centavos_para_reais, centavos_para_texto, data_para_ordinal,
+                           ordinal_para_data, reais_para_centavos)
+from filtros import faixa_de_datas, monta
+
+
+# Lançamentos recorrentes (receitas e despesas fixas): cada um é uma regra só, com tipo, valor, frequência (semanal, mensal ou anual),
+# data inicial e data final opcional, em vez de um lançamento por ocorrência no livro-caixa. As regras ficam em '<arquivo de dados>.recorrencias',
+# um CSV pequeno reescrito (num temporário trocado com os.replace) a cada inclusão ou exclusão de regra, sem esperar o 'SALVAR'.
+#
+# As ocorrências nunca são gravadas: são geradas sob demanda, só na janela de datas que a consulta usa (o filtro, o período exportado).
+# Sem data final na consulta, as ocorrências vão até hoje; uma janela no futuro mostra as ocorrências previstas. Cada ocorrência é um
+# Registro com id negativo (-número da regra), para não se confundir com os ids do livro-caixa, e sem campos de investimento.
+# A ocorrência mensal cai no dia da data inicial, ou no último dia dos meses mais curtos (31/01 vira o último dia de fevereiro, 31/03, 30/04...); a anual também.
+#
+# No resultado mensal a contribuição de cada regra é calculada por conta (quantidade_entre, O(1) por mês), sem gerar as ocorrências.
+FREQUENCIAS = ("semanal", "mensal", "anual")
+PASSO_EM_MESES = {"mensal": 1, "anual": 12}
+RECEITA = CODIGO_TIPO["Receita"]
+DESPESA = CODIGO_TIPO["Despesa"]
+COLUNAS = ("numero", "tipo", "valor", "frequencia", "data_inicial", "data_final")
+
+Recorrencia = namedtuple("Recorrencia", "numero tipo valor frequencia inicio fim")  # tipo é o código, valor em centavos (negativo na despesa), datas como ordinal (fim SEM_DATA = sem fim).
+
+
+def _data_no_mes(dia, chave):  # Ordinal do 'dia' no mês da chave (ano * 12 + mês - 1), limitado ao último dia do mês.
+    ano, mes = divmod(chave, 12)
+    return datetime.date(ano, mes + 1, min(dia, calendar.monthrange(ano, mes + 1)[1])).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _dias_do_mes(chave):  # (primeiro, último) ordinais do mês da chave.
+    return _data_no_mes(1, chave), _data_no_mes(31, chave)
+
+
+def _limites(regra, de, ate):  # A janela [de, ate] cortada pelo período da regra.
+    de = regra.inicio if de is None else max(de, regra.inicio)
+    if regra.fim != SEM_DATA:
+        ate = min(ate, regra.fim)
+    return de, ate
+
+
+def _meses(regra, de, ate):  # (dia, primeiro mês, primeiro k, último k): as ocorrências estão nos meses base + k * passo, para k entre os dois.
+    passo = PASSO_EM_MESES[regra.frequencia]
+    base = mes_do_ordinal(regra.inicio)
+    return datetime.date.fromordinal(regra.inicio).day, base, -((base - mes_do_ordinal(de)) // passo), (mes_do_ordinal(ate) - base) // passo
+
+
+def quantidade_entre(regra, de, ate):  # Quantas ocorrências da regra caem entre as datas (ordinais, inclusive), por conta, sem gerar as datas.
+    de, ate = _limites(regra, de, ate)
+    if ate < de:
+        return 0
+    if regra.frequencia == "semanal":
+        return (ate - regra.inicio) // 7 - (de - regra.inicio + 6) // 7 + 1
+    dia, base, primeiro, ultimo = _meses(regra, de, ate)
+    if ultimo < primeiro:
+        return 0
+    passo = PASSO_EM_MESES[regra.frequencia]
+    quantidade = ultimo - primeiro + 1
+    if _data_no_mes(dia, base + primeiro * passo) < de:  # Só os meses das pontas podem ter a ocorrência fora da janela.
+        quantidade -= 1
+    if _data_no_mes(dia, base + ultimo * passo) > ate:
+        quantidade -= 1
+    return quantidade
+
+
+def datas(regra, de, ate):  # Gera os ordinais das ocorrências entre as datas (inclusive), em ordem, começando direto na primeira da janela.
+    de, ate = _limites(regra, de, ate)
+    if ate < de:
+        return
+    if regra.frequencia == "semanal":
+        yield from range(regra.inicio + 7 * ((de - regra.inicio + 6) // 7), ate + 1, 7)
+        return
+    dia, base, primeiro, ultimo = _meses(regra, de, ate)
+    passo = PASSO_EM_MESES[regra.frequencia]
+    for k in range(primeiro, ultimo + 1):
+        data = _data_no_mes(dia, base + k * passo)
+        if de <= data <= ate:
+            yield data
+
+
+def como_dict(ocorrencia):  # Ocorrência (Registro) no formato dos lançamentos da API: {"data", "tipo", "valor"}, em reais.
+    return {"data": ordinal_para_data(ocorrencia.data), "tipo": TIPOS[ocorrencia.tipo], "valor": centavos_para_reais(ocorrencia.valor)}
+
+
+def _registros(regra, de, ate):
+    for data in datas(regra, de, ate):
+        yield Registro(-regra.numero, data, regra.tipo, regra.valor, SEM_VALOR, SEM_DATA, SEM_VALOR)
+
+
+class Recorrencias:  # As regras de um livro-caixa (número -> Recorrencia), gravadas em 'caminho'.
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.regras = {}
+        self.versao = 0  # Muda a cada carga, inclusão ou exclusão de regra (usada pelo cache de resultados, ver cache.py).
+
+    def carregar(self):  # Lê as regras do arquivo, se existir. Retorna quantas são.
+        self.regras = {}
+        self.versao += 1
+        if os.path.exists(self.caminho):
+            with open(self.caminho, mode="r", newline="", encoding="utf-8") as file:
+                for linha in csv.DictReader(file):
+                    numero = int(linha["numero"])
+                    fim = data_para_ordinal(linha["data_final"]) if linha["data_final"] else SEM_DATA
+                    self.regras[numero] = Recorrencia(numero, CODIGO_TIPO[linha["tipo"]], reais_para_centavos(linha["valor"]), linha["frequencia"],
+                                                      data_para_ordinal(linha["data_inicial"]), fim)
+        return len(self.regras)
+
+    def _gravar(self):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUNAS)
+            for regra in self:
+                writer.writerow([regra.numero, TIPOS[regra.tipo], centavos_para_texto(regra.valor), regra.frequencia, ordinal_para_data(regra.inicio),
+                                 ordinal_para_data(regra.fim) if regra.fim != SEM_DATA else ""])
+        os.replace(temporario, self.caminho)
+
+    def incluir(self, tipo, valor, frequencia, inicio, fim=SEM_DATA):  # Inclui uma regra ('tipo' é o código, valor em centavos, datas como ordinal) e grava. Retorna o número dela.
+        if tipo not in (RECEITA, DESPESA):
+            raise ValueError("Só receitas e despesas podem ser recorrentes.")
+        if frequencia not in FREQUENCIAS:
+            raise ValueError(f"Frequência inválida: {frequencia!r} (use {', '.join(FREQUENCIAS)}).")
+        if fim != SEM_DATA and fim < inicio:
+            raise ValueError("A data final da recorrência é anterior à data inicial.")
+        numero = max(self.regras, default=0) + 1
+        self.regras[numero] = Recorrencia(numero, tipo, -abs(valor) if tipo == DESPESA else abs(valor), frequencia, inicio, fim)
+        self.versao += 1
+        self._gravar()
+        return numero
+
+    def excluir(self, numero):  # Exclui a regra e grava. KeyError se não existir.
+        del self.regras[numero]
+        self.versao += 1
+        self._gravar()
+
+    def __iter__(self):
+        return iter(sorted(self.regras.values()))
+
+    def __len__(self):
+        return len(self.regras)
+
+    # ---- ocorrências, geradas sob demanda ----
+
+    def ocorrencias(self, data_inicial=None, data_final=None, tipo=None):  # Gera os Registro das ocorrências entre as datas (ordinais; sem data final, até hoje), em ordem de data.
+        ate = datetime.date.today().toordinal() if data_final is None else data_final
+        geradores = [_registros(regra, data_inicial, ate) for regra in self if tipo is None or regra.tipo == tipo]
+        return heapq.merge(*geradores, key=lambda registro: (registro.data, -registro.id))
+
+    def filtradas(self, filtro):  # Lista das ocorrências que atendem o filtro composto (dict ou árvore, ver filtros.py), geradas só na faixa de datas do filtro.
+        no = monta(filtro) if isinstance(filtro, dict) else filtro
+        if no is None:
+            return list(self.ocorrencias())
+        minimo, maximo = faixa_de_datas(no)
+        ocorrencias = self.ocorrencias(minimo, maximo)
+        return [registro for registro in ocorrencias if no.confere(registro)]
+
+    def blocos(self, tamanho, data_inicial=None, data_final=None, tipo=None):  # Mesma interface de registros_em_blocos, para a exportação.
+        bloco = []
+        for registro in self.ocorrencias(data_inicial, data_final, tipo):
+            bloco.append(tuple(registro))
+            if len(bloco) >= tamanho:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+    def centavos_por_mes(self, data_final=None):  # Dict mês (chave inteira, ver agregados.mes_do_ordinal) -> [receita, despesa] em centavos, até a data (hoje por padrão).
+        # Cada mês custa uma conta por regra, independente de quantas ocorrências ele tem: a semanal conta as semanas do mês
+        # (quantidade_entre), a mensal e a anual têm uma ocorrência em cada mês do passo, e só o último mês precisa conferir a data.
+        ate = datetime.date.today().toordinal() if data_final is None else data_final
+        meses = {}
+        for regra in self:
+            fim = ate if regra.fim == SEM_DATA else min(ate, regra.fim)
+            if fim < regra.inicio:
+                continue
+            coluna = 0 if regra.tipo == RECEITA else 1
+            if regra.frequencia == "semanal":
+                for mes in range(mes_do_ordinal(regra.inicio), mes_do_ordinal(fim) + 1):
+                    primeiro, ultimo = _dias_do_mes(mes)
+                    quantidade = quantidade_entre(regra, primeiro, min(ultimo, fim))
+                    if quantidade:
+                        meses.setdefault(mes, [0, 0])[coluna] += quantidade * regra.valor
+                continue
+            dia, base, _, ultimo = _meses(regra, regra.inicio, fim)
+            passo = PASSO_EM_MESES[regra.frequencia]
+            if _data_no_mes(dia, base + ultimo * passo) > fim:  # A ocorrência do último mês cai depois do fim.
+                ultimo -= 1
+            for mes in range(base, base + ultimo * passo + 1, passo):
+                meses.setdefault(mes, [0, 0])[coluna] += regra.valor
+        return meses
+
+    def com_resultado_mensal(self, resultados, data_final=None):  # Soma as recorrências na lista do resultado mensal ((mês "mm/aaaa", receita, despesa, resultado) em reais), na mesma ordem.
+        if not self.regras:
+            return resultados
+        meses = {}
+        for rotulo, receita, despesa, _ in resultados:
+            meses[rotulo] = [reais_para_centavos(receita), reais_para_centavos(despesa)]
+        for mes, (receita, despesa) in self.centavos_por_mes(data_final).items():
+            totais = meses.setdefault(formata_mes(mes), [0, 0])
+            totais[0] += receita
+            totais[1] += despesa
+        return [(rotulo, centavos_para_reais(receita), centavos_para_reais(despesa), centavos_para_reais(receita + despesa))
+                for rotulo, (receita, despesa) in sorted(meses.items())]  # O texto "mm/aaaa" em ordem é a ordem de exibição do resultado mensal.
@@ -0,0 +1,57 @@
+import array
+import datetime
+
+from armazenamento import CODIGO_TIPO, SEM_DATA, SEM_VALOR, inteiro_para_taxa
+
+
+INVESTIMENTO = CODIGO_TIPO["Investimento"]
+
+
+def taxa_mensal_para_diaria(taxa_mensal): # Faz a conversão da taxa de juros coletada, mensal para diária.
+    # Converte a taxa mensal para decimal
+    taxa_decimal = taxa_mensal / 100
+    # Aplica a fórmula para converter para a taxa diária
+    taxa_diaria = (1 + taxa_decimal) ** (1 / 30) - 1
+    # Converte a taxa diária de volta para porcentagem
+    return taxa_diaria * 100
+
+
+def _ordinal(data_referencia):  # Aceita None (hoje), date ou datetime e devolve o ordinal do dia.
+    if data_referencia is None:
+        data_referencia = datetime.date.today()
+    if isinstance(data_referencia, datetime.datetime):
+        data_referencia = data_referencia.date()
+    return data_referencia.toordinal()
+
+
+def calcular_montantes(lancamentos, data_referencia=None):  # Calcula, numa passada só pelas colunas, o montante de todos os investimentos na data de referência (hoje por padrão).
+    # Retorna (posicoes, montantes): posições dos investimentos nas colunas e o montante de cada um, arredondado para centavos inteiros.
+    # A conta é a mesma da versão antiga, valor * (1 + taxa_diaria / 100) ** dias, mas a taxa diária é calculada uma vez por taxa distinta
+    # e o fator (1 + taxa_diaria / 100) ** dias uma vez por par (taxa, dias) distinto, então o resultado é idêntico e bem mais barato.
+    referencia = _ordinal(data_referencia)
+    bases = {}  # taxa mensal (ponto fixo da coluna) -> 1 + taxa_diaria / 100
+    fatores = {}  # (taxa mensal, dias) -> fator de correção
+    posicoes = array.array("q")
+    montantes = array.array("q")
+
+    colunas = zip(lancamentos.tipos, lancamentos.valores, lancamentos.taxas, lancamentos.datas_inv)
+    for posicao, (tipo, valor, taxa, data_inv) in enumerate(colunas):
+        if tipo != INVESTIMENTO or data_inv == SEM_DATA or taxa == SEM_VALOR:
+            continue
+        chave = (taxa, referencia - data_inv)
+        fator = fatores.get(chave)
+        if fator is None:
+            base = bases.get(taxa)
+            if base is None:
+                base = bases[taxa] = 1 + (taxa_mensal_para_diaria(inteiro_para_taxa(taxa)) / 100)
+            fator = fatores[chave] = base ** chave[1]
+        posicoes.append(posicao)
+        montantes.append(round(valor * fator))  # 'valor' em centavos: arredonda para o centavo, como o round(..., 2) em reais fazia.
+
+    return posicoes, montantes
+
+
+def atualizar_em_lote(lancamentos, data_referencia=None):  # Grava na coluna 'atualizados' o montante de todos os investimentos na data de referência. Retorna quantos foram atualizados.
+    posicoes, montantes = calcular_montantes(lancamentos, data_referencia)
+    lancamentos.gravar_atualizados(posicoes, montantes)
+    return len(posicoes)
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+
+import api
+import main
+from autosalvamento import Autosalvamento
+
+
+# Servidor local de consultas: um processo carrega o livro-caixa uma vez e responde a vários programas pelo mesmo socket,
+# em vez de cada um carregar a sua cópia do registros.csv. Usa as operações de api.py, com o mesmo protocolo do modo lote:
+# cada pedido é uma linha JSON ({"op": "filtrar", "tipo": "Receita"}) e cada resposta também, na mesma ordem dos pedidos:
+#   {"resultado": ...}  ou  {"erro": "mensagem", "tipo": "KeyError"}
+# O cliente está em cliente.py.
+#   python servidor.py [--arquivo registros.csv] [--socket registros.csv.sock | --porta 8765]
+#
+# Leituras rodam ao mesmo tempo e escritas uma de cada vez (TravaLeituraEscrita): uma escrita espera as leituras em andamento
+# terminarem, e as leituras que chegarem depois dela esperam a escrita. As consultas curtas rodam direto no laço do asyncio; as longas
+# (exportar, projetar, importar) rodam numa thread, para não segurar os outros clientes. As alterações são salvas pelo autosalvamento.
+# No livro-caixa particionado (ver particoes.py), as leituras que carregam partições mexem nas colunas compartilhadas e rodam como escritas;
+# só as que respondem pelo manifesto e pelas regras (SEM_CARGA) continuam rodando juntas.
+LEITURAS = {"filtrar", "consultar", "resultado_mensal", "projetar", "exportar", "totais", "recorrencias"}
+SEM_CARGA = {"resultado_mensal", "recorrencias"}
+LONGAS = {"exportar", "projetar", "importar"}  # Rodam numa thread (com o banco SQLite, que não aceita outra thread, rodam no laço também).
+OPERACOES = {**api.OPERACOES, "salvar": api.salvar}
+LIMITE_LINHA = 64 * 2**20  # Tamanho máximo de um pedido, em bytes.
+
+
+class TravaLeituraEscrita:  # Várias leituras ao mesmo tempo ou uma escrita sozinha, com preferência para a escrita (as leituras não a deixam esperando para sempre).
+    def __init__(self):
+        self._condicao = asyncio.Condition()
+        self._leitores = 0
+        self._escrevendo = False
+        self._escritores_esperando = 0
+
+    async def ler(self):
+        async with self._condicao:
+            await self._condicao.wait_for(lambda: not self._escrevendo and not self._escritores_esperando)
+            self._leitores += 1
+
+    async def fim_da_leitura(self):
+        async with self._condicao:
+            self._leitores -= 1
+            if not self._leitores:
+                self._condicao.notify_all()
+
+    async def escrever(self):
+        async with self._condicao:
+            self._escritores_esperando += 1
+            try:
+                await self._condicao.wait_for(lambda: not self._escrevendo and not self._leitores)
+            finally:
+                self._escritores_esperando -= 1
+            self._escrevendo = True
+
+    async def fim_da_escrita(self):
+        async with self._condicao:
+            self._escrevendo = False
+            self._condicao.notify_all()
+
+
+class Servidor:
+    def __init__(self, em_thread=True):
+        self.trava = TravaLeituraEscrita()
+        self.em_thread = em_thread
+        self.leituras = LEITURAS if main.particoes is None else LEITURAS & SEM_CARGA
+        self.pedidos = 0
+        self.clientes = 0
+
+    async def _executa(self, comando):  # Executa um pedido respeitando a trava. Devolve o dict da resposta.
+        operacao = comando.get("op") if isinstance(comando, dict) else None
+        leitura = operacao in self.leituras
+        await (self.trava.ler() if leitura else self.trava.escrever())
+        try:
+            if operacao in LONGAS and self.em_thread:
+                resultado = await asyncio.to_thread(api.executar, comando, OPERACOES)
+            else:
+                resultado = api.executar(comando, OPERACOES)
+        except (KeyError, ValueError, TypeError) as erro:
+            return {"erro": str(erro.args[0]) if erro.args else str(erro), "tipo": type(erro).__name__}
+        except OSError as erro:  # Exportar ou importar um arquivo que não dá para abrir: responde o erro e o cliente continua conectado.
+            return {"erro": str(erro), "tipo": type(erro).__name__}
+        finally:
+            await (self.trava.fim_da_leitura() if leitura else self.trava.fim_da_escrita())
+        return {"resultado": resultado}
+
+    async def atende(self, leitor, escritor):  # Atende um cliente até ele fechar a conexão.
+        self.clientes += 1
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    comando = json.loads(linha)
+                except ValueError as erro:
+                    resposta = {"erro": f"JSON inválido: {erro}", "tipo": "ValueError"}
+                else:
+                    resposta = await self._executa(comando)
+                self.pedidos += 1
+                escritor.write(json.dumps(resposta, ensure_ascii=False).encode("utf-8") + b"\n")
+                await escritor.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass  # Cliente caiu ou mandou uma linha grande demais: só fecha a conexão dele.
+        finally:
+            self.clientes -= 1
+            escritor.close()
+
+
+def endereco_padrao(nome_arquivo):  # Socket Unix ao lado do arquivo de dados; no Windows, que não tem, a porta TCP local.
+    if hasattr(socket, "AF_UNIX"):
+        return nome_arquivo + ".sock"
+    return ("127.0.0.1", 8765)
+
+
+async def serve(endereco, servidor=None):  # Escuta no endereço (caminho do socket Unix ou (host, porta)) até receber SIGINT/SIGTERM.
+    servidor = servidor or Servidor(em_thread=not main.banco_sqlite)
+    if isinstance(endereco, str):
+        if os.path.exists(endereco):
+            os.remove(endereco)  # Sobrou de um servidor que caiu.
+        rede = await asyncio.start_unix_server(servidor.atende, endereco, limit=LIMITE_LINHA)
+    else:
+        rede = await asyncio.start_server(servidor.atende, *endereco, limit=LIMITE_LINHA)
+
+    parar = asyncio.Event()
+    laco = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            laco.add_signal_handler(sinal, parar.set)
+        except (NotImplementedError, RuntimeError):  # Windows, ou fora da thread principal.
+            pass
+    async with rede:
+        await parar.wait()
+    if isinstance(endereco, str) and os.path.exists(endereco):
+        os.remove(endereco)
+    return servidor
+
+
+def roda_servidor():  # Ponto de entrada: carrega o livro-caixa, liga o autosalvamento e atende até ser interrompido.
+    parser = argparse.ArgumentParser(description="Servidor local de consultas do livro-caixa do EcoBalance.")
+    parser.add_argument("--arquivo", default=main.nome_arquivo, help="arquivo de dados (padrão: registros.csv)")
+    parser.add_argument("--socket", help="caminho do socket Unix (padrão: <arquivo>.sock)")
+    parser.add_argument("--porta", type=int, help="usa TCP em 127.0.0.1 nessa porta, em vez do socket Unix")
+    argumentos = parser.parse_args()
+
+    if argumentos.arquivo != main.nome_arquivo:
+        api.usar_arquivo(argumentos.arquivo)
+    quantidade = api.carregar()
+    endereco = ("127.0.0.1", argumentos.porta) if argumentos.porta else (argumentos.socket or endereco_padrao(main.nome_arquivo))
+
+    autosalvamento = None
+    if not main.banco_sqlite and main.particoes is None and main.autosalvar_intervalo > 0:
+        autosalvamento = Autosalvamento(main.lancamentos, main.diario, main.autosalvar_intervalo,
+                                        main.autosalvar_espera, main.autosalvar_alteracoes).iniciar()
+    print(f"{quantidade} lançamentos carregados de {main.nome_arquivo}, atendendo em {endereco}.", file=sys.stderr)
+    servidor = asyncio.run(serve(endereco))
+
+    if autosalvamento is not None:
+        autosalvamento.encerrar()
+    else:
+        api.salvar()
+    main.diario.aguardar()
+    print(f"{servidor.pedidos} pedidos atendidos.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(roda_servidor())
@@ -0,0 +1,116 @@
+import array
+import mmap
+import os
+import struct
+import sys
+
+from armazenamento import CODIGO_TIPO, REMOVIDO, SEM_VALOR, TIPOS, reais_para_centavos, taxa_para_inteiro
+
+
+# Snapshot binário dos lançamentos, gravado ao lado do registros.csv para a carga ser quase instantânea.
+# Formato (tudo little-endian):
+#   cabeçalho      8s I Q          assinatura b"ECOBSNAP", versão do formato, quantidade de lançamentos
+#   strings        I + (H + bytes) quantidade de strings e cada uma com seu tamanho: os nomes dos tipos, na ordem dos códigos gravados
+#   colunas        para cada coluna, na ordem de COLUNAS: c B (typecode e tamanho do item) e os bytes crus da coluna
+# Na versão 1 valores, taxas e investimentos atualizados eram float (reais e porcentagem, NaN vazio); a versão 2 guarda os inteiros
+# das colunas (centavos e taxa em ponto fixo, ver armazenamento.py). Um snapshot da versão 1 ainda é lido, convertido na carga.
+ASSINATURA = b"ECOBSNAP"
+VERSAO = 2
+CABECALHO = struct.Struct("<8sIQ")
+COLUNA = struct.Struct("<cB")
+COLUNAS = ("ids", "datas", "tipos", "valores", "taxas", "datas_inv", "atualizados")
+
+
+def caminho_snapshot(nome_arquivo):  # O snapshot do "registros.csv" fica em "registros.csv.snapshot".
+    return nome_arquivo + ".snapshot"
+
+
+def snapshot_atualizado(nome_arquivo):  # True se existe um snapshot mais novo (ou da mesma hora) que o CSV, ou seja, se dá para carregar por ele.
+    caminho = caminho_snapshot(nome_arquivo)
+    if not os.path.exists(caminho):
+        return False
+    return os.path.getmtime(caminho) >= os.path.getmtime(nome_arquivo)
+
+
+def colunas_da_versao_1(colunas):  # Converte as colunas float da versão 1 (snapshot ou exportação colunar) para os inteiros atuais.
+    ids, datas, tipos, valores, taxas, datas_inv, atualizados = colunas
+    return (ids, datas, tipos,
+            array.array("q", map(reais_para_centavos, valores)),
+            array.array("q", (SEM_VALOR if taxa != taxa else taxa_para_inteiro(taxa) for taxa in taxas)),  # NaN era o campo vazio.
+            datas_inv,
+            array.array("q", (SEM_VALOR if atualizado != atualizado else reais_para_centavos(atualizado) for atualizado in atualizados)))
+
+
+def grava_nomes_dos_tipos(file):  # Grava a tabela de strings com os nomes dos tipos, na ordem dos códigos. Também usada pela exportação colunar.
+    file.write(struct.pack("<I", len(TIPOS)))
+    for nome in TIPOS:
+        codificado = nome.encode("utf-8")
+        file.write(struct.pack("<H", len(codificado)))
+        file.write(codificado)
+
+
+def grava_snapshot(nome_arquivo, colunas):  # Grava as colunas (na ordem de COLUNAS) num arquivo temporário e troca pelo snapshot com os.replace.
+    tipos = colunas[2]
+    if REMOVIDO in tipos:  # Tira as posições removidas antes de gravar.
+        vivos = [posicao for posicao, tipo in enumerate(tipos) if tipo != REMOVIDO]
+        colunas = [array.array(coluna.typecode, (coluna[posicao] for posicao in vivos)) for coluna in colunas]
+
+    caminho = caminho_snapshot(nome_arquivo)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as file:
+        file.write(CABECALHO.pack(ASSINATURA, VERSAO, len(colunas[0])))
+        grava_nomes_dos_tipos(file)
+        for coluna in colunas:
+            file.write(COLUNA.pack(coluna.typecode.encode("ascii"), coluna.itemsize))
+            if sys.byteorder == "big":
+                coluna = array.array(coluna.typecode, coluna)
+                coluna.byteswap()
+            coluna.tofile(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporario, caminho)
+
+
+def carrega_snapshot(nome_arquivo, lancamentos):  # Carrega o snapshot direto para as colunas de 'lancamentos', lendo o arquivo por mapeamento de memória (mmap).
+    with open(caminho_snapshot(nome_arquivo), "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        dados = memoryview(mapa)
+        try:
+            assinatura, versao, quantidade = CABECALHO.unpack_from(dados, 0)
+            if assinatura != ASSINATURA or versao not in (1, VERSAO):
+                raise ValueError(f"{caminho_snapshot(nome_arquivo)} não é um snapshot válido (versão {versao}).")
+            posicao = CABECALHO.size
+
+            (quantidade_strings,) = struct.unpack_from("<I", dados, posicao)
+            posicao += 4
+            nomes = []
+            for _ in range(quantidade_strings):
+                (tamanho,) = struct.unpack_from("<H", dados, posicao)
+                nomes.append(bytes(dados[posicao + 2:posicao + 2 + tamanho]).decode("utf-8"))
+                posicao += 2 + tamanho
+
+            colunas = []
+            for _ in COLUNAS:
+                typecode, itemsize = COLUNA.unpack_from(dados, posicao)
+                posicao += COLUNA.size
+                coluna = array.array(typecode.decode("ascii"))
+                if coluna.itemsize != itemsize:
+                    raise ValueError(f"Snapshot gravado com itens de {itemsize} bytes para '{coluna.typecode}', aqui são {coluna.itemsize}.")
+                fim = posicao + quantidade * itemsize
+                coluna.frombytes(dados[posicao:fim])
+                if sys.byteorder == "big":
+                    coluna.byteswap()
+                colunas.append(coluna)
+                posicao = fim
+        finally:
+            dados.release()
+
+    if nomes != list(TIPOS):  # Os códigos dos tipos mudaram desde que o snapshot foi gravado: traduz pelo nome.
+        traducao = bytearray(range(256))
+        for codigo, nome in enumerate(nomes):
+            traducao[codigo] = CODIGO_TIPO.get(nome, REMOVIDO)
+        colunas[2] = array.array("b", colunas[2].tobytes().translate(traducao))
+    if versao == 1:
+        colunas = colunas_da_versao_1(colunas)
+
+    lancamentos.substituir_colunas(*colunas)
+    return lancamentos
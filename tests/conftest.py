@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do EcoBalance ficam soltos na raiz do repositório, como nos benchmarks.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
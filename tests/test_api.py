@@ -0,0 +1,73 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import api
+import main
+from servidor import Servidor
+
+
+# API (api.py), modo lote e servidor: um parâmetro errado num pedido vira um erro daquele pedido, sem parar o lote nem derrubar o cliente.
+
+
+@pytest.fixture
+def livro(tmp_path, monkeypatch):  # Livro-caixa vazio num arquivo novo em tmp_path.
+    monkeypatch.chdir(tmp_path)
+    api.usar_arquivo(str(tmp_path / "registros.csv"))
+    main.lancamentos.limpar()
+    main.cache.limpar()
+    return main.lancamentos
+
+
+@pytest.mark.parametrize("data", [20240101, 1.5, ["01/01/2024"], {"dia": 1}])
+def test_data_que_nao_e_texto(livro, data):
+    with pytest.raises(TypeError):
+        api.executar({"op": "inserir", "tipo": "Receita", "valor": 1, "data": data})
+    assert len(livro) == 0
+
+
+def test_lote_continua_depois_de_uma_data_invalida(livro):
+    linhas = [
+        json.dumps({"op": "inserir", "tipo": "Receita", "valor": 10, "data": "01/01/2024"}),
+        json.dumps({"op": "inserir", "tipo": "Receita", "valor": 20, "data": 20240101}),
+        json.dumps({"op": "inserir", "tipo": "Despesa", "valor": 5, "data": "02/01/2024"}),
+    ]
+    aplicados, erros = api.executar_lote(linhas, io.StringIO())
+    assert aplicados == 2
+    assert [numero for numero, _ in erros] == [2]
+    assert erros[0][1].startswith("TypeError")
+    assert sorted(lancamento["valor"] for _, lancamento in livro.items()) == [-5.0, 10.0]
+
+
+def test_servidor_responde_erro_de_data(livro):
+    servidor = Servidor(em_thread=False)
+    resposta = asyncio.run(servidor._executa({"op": "inserir", "tipo": "Receita", "valor": 1, "data": 20240101}))
+    assert resposta["tipo"] == "TypeError"
+    resposta = asyncio.run(servidor._executa({"op": "inserir", "tipo": "Receita", "valor": 1, "data": "01/01/2024"}))
+    assert resposta == {"resultado": 1}
+
+
+@pytest.mark.parametrize("filtro", [{}, {"e": [{}]}, {"ou": [{}, {"tipo": "Receita"}]}])
+def test_filtro_vazio_nao_exclui_nada(livro, filtro):
+    api.inserir("Receita", 10, data="01/01/2024")
+    api.inserir("Despesa", 5, data="02/01/2024")
+    with pytest.raises(ValueError):
+        api.excluir_filtrados(filtro)
+    with pytest.raises(ValueError):
+        api.editar_filtrados(filtro, tipo="Despesa")
+    assert sorted(lancamento["tipo"] for _, lancamento in livro.items()) == ["Despesa", "Receita"]
+    assert api.excluir_filtrados(filtro, todos=True) == 2
+
+
+def test_menu_com_filtro_vazio_nao_exclui_nada(livro, monkeypatch):
+    api.inserir("Receita", 10, data="01/01/2024")
+    respostas = iter(["", "E", "S"])
+    monkeypatch.setattr("builtins.input", lambda *_: next(respostas))
+    main.editar_em_lote()
+    assert len(livro) == 1
+
+    respostas = iter(["todos", "E", "S"])
+    main.editar_em_lote()
+    assert len(livro) == 0
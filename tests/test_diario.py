@@ -0,0 +1,123 @@
+import csv
+import os
+
+from armazenamento import LancamentosColunares
+from diario import COLUNAS, Diario
+
+
+# Diário de alterações (diario.py): um salvamento cortado no meio e uma compactação interrompida não podem perder nem duplicar nada.
+
+
+def carrega_csv(lancamentos, caminho):  # Mesmo laço do carrega_de_arquivo do main.py.
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, mode="r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            lancamentos[int(row.pop("id"))] = row
+
+
+def abre(caminho):  # Armazenamento novo com o diário do arquivo, já carregado.
+    lancamentos = LancamentosColunares()
+    diario = Diario(lancamentos, caminho)
+    diario.carregar(lambda: carrega_csv(lancamentos, caminho))
+    return lancamentos, diario
+
+
+def receita(valor, data="10/01/2024"):
+    return {"data": data, "tipo": "Receita", "valor": valor}
+
+
+def estado(lancamentos):
+    return {id_: dict(lancamento) for id_, lancamento in lancamentos.items()}
+
+
+def test_salvamento_cortado_e_descartado(tmp_path):
+    caminho = str(tmp_path / "registros.csv")
+    lancamentos, diario = abre(caminho)
+    lancamentos[1] = receita(10.0)
+    lancamentos[2] = receita(20.0)
+    diario.salvar()
+    lancamentos[2] = receita(25.0)
+    del lancamentos[1]
+    diario.salvar()
+    esperado = estado(lancamentos)
+    tamanho = os.path.getsize(diario.caminho)
+
+    with open(diario.caminho, mode="a", newline="", encoding="utf-8") as file:  # O programa caiu depois de gravar 1 das 3 linhas do salvamento.
+        writer = csv.writer(file)
+        writer.writerow(["L", 3, "", "", "", "", "", ""])
+        writer.writerow(["I", 3, "11/01/2024", "Receita", "30.00", "", "", ""])
+
+    lancamentos, diario = abre(caminho)
+    assert estado(lancamentos) == esperado
+    assert os.path.getsize(diario.caminho) == tamanho  # O pedaço cortado sai do arquivo.
+
+    lancamentos[4] = receita(40.0)  # O próximo salvamento não fica colado no lote descartado.
+    diario.salvar()
+    esperado = estado(lancamentos)
+    lancamentos, _ = abre(caminho)
+    assert estado(lancamentos) == esperado
+
+
+def test_linha_cortada_no_fim_do_arquivo(tmp_path):
+    caminho = str(tmp_path / "registros.csv")
+    lancamentos, diario = abre(caminho)
+    lancamentos[1] = receita(10.0)
+    diario.salvar()
+    esperado = estado(lancamentos)
+
+    with open(diario.caminho, mode="ab") as file:  # Sem o fim da linha: a escrita parou no meio dela.
+        file.write(b"L,1,,,,,,\r\nI,2,11/01/2024,Rece")
+
+    lancamentos, _ = abre(caminho)
+    assert estado(lancamentos) == esperado
+
+
+def test_compactacao_interrompida(tmp_path):
+    caminho = str(tmp_path / "registros.csv")
+    lancamentos, diario = abre(caminho)
+    for id_ in range(1, 6):
+        lancamentos[id_] = receita(float(id_))
+    diario.compactar()
+    lancamentos[2] = receita(200.0)
+    del lancamentos[3]
+    diario.salvar()
+
+    # A compactação renomeou o diário e caiu antes de gravar o arquivo base; depois disso mais um salvamento foi para um diário novo.
+    os.replace(diario.caminho, diario.caminho_compactando)
+    lancamentos[6] = receita(6.0, "15/02/2024")
+    lancamentos[2] = receita(210.0)
+    diario.salvar()
+    esperado = estado(lancamentos)
+
+    lancamentos, diario = abre(caminho)
+    assert estado(lancamentos) == esperado
+    assert not os.path.exists(diario.caminho_compactando)  # A carga termina a compactação.
+    assert not os.path.exists(diario.caminho)
+
+    with open(caminho, newline="", encoding="utf-8") as file:  # O arquivo base já tem tudo, sem diário.
+        linhas = list(csv.reader(file))
+    assert linhas[0] == COLUNAS
+    assert sorted(int(linha[0]) for linha in linhas[1:]) == sorted(esperado)
+
+
+def test_compactacao_interrompida_duas_vezes(tmp_path):
+    caminho = str(tmp_path / "registros.csv")
+    lancamentos, diario = abre(caminho)
+    lancamentos[1] = receita(10.0)
+    diario.salvar()
+    os.replace(diario.caminho, diario.caminho_compactando)
+    lancamentos[1] = receita(11.0)
+    lancamentos[2] = receita(20.0)
+    diario.salvar()
+
+    # A compactação seguinte junta o diário novo no '.compactando' que sobrou e cai de novo antes do arquivo base.
+    with open(diario.caminho_compactando, mode="ab") as destino, open(diario.caminho, mode="rb") as origem:
+        destino.write(origem.read())
+    os.remove(diario.caminho)
+    lancamentos[3] = receita(30.0)
+    diario.salvar()
+    esperado = estado(lancamentos)
+
+    lancamentos, _ = abre(caminho)
+    assert estado(lancamentos) == esperado
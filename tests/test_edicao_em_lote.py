@@ -0,0 +1,100 @@
+import csv
+import datetime
+import random
+
+from agregados import AgregadoMensal, TotaisPorData
+from armazenamento import CODIGO_TIPO, LancamentosColunares, taxa_para_inteiro
+from diario import Diario
+from edicao_em_lote import alterar_em_lote, excluir_em_lote
+from indices import IndiceLancamentos
+
+
+# Edição e exclusão em lote (edicao_em_lote.py): uma passada só, com índices, totais e diário iguais aos de um livro
+# montado do zero com o resultado, e o lote inteiro (ou nada dele) no diário.
+INICIO = datetime.date(2024, 1, 1).toordinal()
+
+
+def gera(lancamentos, quantidade, semente=11):
+    aleatorio = random.Random(semente)
+    for id_ in range(1, quantidade + 1):
+        tipo = aleatorio.choice(("Receita", "Despesa", "Investimento"))
+        data = datetime.date.fromordinal(INICIO + aleatorio.randrange(180)).strftime("%d/%m/%Y")
+        valor = f"{'-' if tipo == 'Despesa' else ''}{aleatorio.randrange(1, 5000)}.{aleatorio.randrange(100):02d}"
+        lancamento = {"data": data, "tipo": tipo, "valor": valor}
+        if tipo == "Investimento":
+            lancamento.update(taxa_de_juros=str(aleatorio.choice((0.5, 1))), data_investimento=data, investimento_atualizado=valor)
+        lancamentos[id_] = lancamento
+
+
+def livro(pasta):
+    lancamentos = LancamentosColunares()
+    observadores = (AgregadoMensal(lancamentos), TotaisPorData(lancamentos), IndiceLancamentos(lancamentos),
+                    Diario(lancamentos, str(pasta / "registros.csv")))
+    return lancamentos, observadores
+
+
+def confere_observadores(lancamentos, agregado, totais, indices):  # Os mantidos a cada mudança têm que bater com os montados do zero.
+    copia = LancamentosColunares()
+    for id_, lancamento in lancamentos.items():
+        copia[id_] = dict(lancamento)
+    assert agregado.conferir() == []
+    assert totais.centavos_entre() == TotaisPorData(copia).centavos_entre()
+    novos = IndiceLancamentos(copia)
+    for filtro in ({"tipo": "Despesa"}, {"tipo": "Investimento", "taxa_de_juros": [0.75, None]}, {"valor": [None, 0]}):
+        assert indices.consulta(filtro)[0] == novos.consulta(filtro)[0]
+
+
+def recarrega(pasta):
+    lancamentos = LancamentosColunares()
+    Diario(lancamentos, str(pasta / "registros.csv")).carregar(lambda: None)
+    return {id_: dict(lancamento) for id_, lancamento in lancamentos.items()}
+
+
+def test_troca_de_tipo_e_taxa(tmp_path):
+    lancamentos, (agregado, totais, indices, diario) = livro(tmp_path)
+    gera(lancamentos, 500)
+    diario.salvar()
+
+    receitas = indices.consulta({"tipo": "Receita"})[0]
+    assert alterar_em_lote(lancamentos, receitas[:100], codigo=CODIGO_TIPO["Despesa"]) == 100
+    for id_ in receitas[:100]:
+        assert lancamentos[id_]["tipo"] == "Despesa" and lancamentos[id_]["valor"] < 0
+
+    investimentos = indices.consulta({"tipo": "Investimento"})[0]
+    mudaram = alterar_em_lote(lancamentos, investimentos + receitas[100:110], taxa=taxa_para_inteiro("0.75"))
+    assert mudaram == sum(1 for id_ in investimentos if lancamentos[id_]["taxa_de_juros"] == 0.75)
+    assert all(lancamentos[id_]["taxa_de_juros"] == 0.75 for id_ in investimentos)
+    assert all(not lancamentos[id_].get("taxa_de_juros") for id_ in receitas[100:110])  # Quem não é investimento não ganha taxa.
+
+    confere_observadores(lancamentos, agregado, totais, indices)
+    diario.salvar()
+    assert recarrega(tmp_path) == {id_: dict(lancamento) for id_, lancamento in lancamentos.items()}
+
+
+def test_exclusao_em_lote(tmp_path):
+    lancamentos, (agregado, totais, indices, diario) = livro(tmp_path)
+    gera(lancamentos, 500)
+    alvos = indices.consulta({"valor": [None, 0]})[0]
+    assert excluir_em_lote(lancamentos, alvos) == len(alvos)
+    assert indices.consulta({"tipo": "Despesa"})[0] == []
+    confere_observadores(lancamentos, agregado, totais, indices)
+    diario.salvar()
+    assert recarrega(tmp_path) == {id_: dict(lancamento) for id_, lancamento in lancamentos.items()}
+
+
+def test_lote_cortado_no_diario_nao_fica_pela_metade(tmp_path):
+    lancamentos, (_, _, indices, diario) = livro(tmp_path)
+    gera(lancamentos, 200)
+    diario.salvar()
+    antes = recarrega(tmp_path)
+
+    excluidos = excluir_em_lote(lancamentos, indices.consulta({"tipo": "Receita"})[0])
+    tamanho = (tmp_path / "registros.csv.diario").stat().st_size
+    diario.salvar()
+    with open(diario.caminho, newline="", encoding="utf-8") as file:
+        linhas = list(csv.reader(file))
+    assert [int(linha[1]) for linha in linhas if linha[0] == "L"][-1] == excluidos  # A exclusão inteira é um salvamento só.
+
+    with open(diario.caminho, "r+b") as file:  # O programa caiu no meio da gravação do lote.
+        file.truncate(tamanho + (file.seek(0, 2) - tamanho) // 2)
+    assert recarrega(tmp_path) == antes
@@ -0,0 +1,124 @@
+import datetime
+import random
+
+import pytest
+
+from armazenamento import LancamentosColunares
+from banco_sqlite import BancoSQLite
+from filtros import interpreta
+from indices import IndiceLancamentos
+
+
+# O planejador dos filtros compostos (filtros.py) tem que devolver os mesmos ids que uma varredura de todos os lançamentos,
+# qualquer que seja a ordem que ele escolher para os critérios. A varredura abaixo não usa nada do filtros.py.
+TIPOS = ("Receita", "Despesa", "Investimento")
+INICIO = datetime.date(2023, 1, 1).toordinal()
+DIAS = 400
+TAXAS = (0.5, 0.75, 1, 1.25, 2)
+
+
+def gera_lancamentos(aleatorio, quantidade):  # id -> dict do lançamento (como o criar_registro grava).
+    lancamentos = {}
+    for id_ in range(1, quantidade + 1):
+        tipo = aleatorio.choice(TIPOS)
+        data = datetime.date.fromordinal(INICIO + aleatorio.randrange(DIAS)).strftime("%d/%m/%Y")
+        centavos = aleatorio.randrange(1, 500_000)
+        sinal = "-" if tipo == "Despesa" else ""
+        lancamento = {"data": data, "tipo": tipo, "valor": f"{sinal}{centavos // 100}.{centavos % 100:02d}"}
+        if tipo == "Investimento":
+            lancamento["taxa_de_juros"] = str(aleatorio.choice(TAXAS))
+            lancamento["data_investimento"] = datetime.date.fromordinal(INICIO + aleatorio.randrange(DIAS)).strftime("%d/%m/%Y")
+        lancamentos[id_] = lancamento
+    return lancamentos
+
+
+def gera_faixa(aleatorio, campo):  # [mínimo, máximo] com pontas abertas às vezes, ou um valor só.
+    if campo in ("data", "data_investimento"):
+        pontas = sorted(INICIO + aleatorio.randrange(DIAS) for _ in range(2))
+        pontas = [datetime.date.fromordinal(ponta).strftime("%d/%m/%Y") for ponta in pontas]
+    elif campo == "valor":
+        pontas = sorted(aleatorio.randrange(-500_000, 500_000) / 100 for _ in range(2))
+    else:
+        pontas = sorted(aleatorio.sample(TAXAS, 2))
+    if aleatorio.random() < 0.1:
+        return pontas[0]
+    return [None if aleatorio.random() < 0.2 else pontas[0], None if aleatorio.random() < 0.2 else pontas[1]]
+
+
+def gera_filtro(aleatorio, profundidade=0):
+    if profundidade < 2 and aleatorio.random() < 0.4:
+        return {aleatorio.choice(("e", "ou")): [gera_filtro(aleatorio, profundidade + 1) for _ in range(aleatorio.randint(2, 3))]}
+    campos = aleatorio.sample(("data", "tipo", "valor", "taxa_de_juros", "data_investimento"), aleatorio.randint(1, 2))
+    filtro = {}
+    for campo in campos:
+        if campo == "tipo":
+            filtro["tipo"] = aleatorio.sample(TIPOS, aleatorio.randint(1, 2))
+        else:
+            filtro[campo] = gera_faixa(aleatorio, campo)
+    return filtro
+
+
+def _numero(campo, texto):  # Valor comparável do campo: ordinal da data, centavos ou taxa em centésimos de ponto percentual.
+    if campo in ("data", "data_investimento"):
+        return datetime.datetime.strptime(texto, "%d/%m/%Y").toordinal()
+    return round(float(texto) * (100 if campo == "valor" else 10_000))
+
+
+def atende(filtro, lancamento):  # Varredura: confere o filtro num lançamento, direto pelo dict.
+    resultado = True
+    for chave, criterio in filtro.items():
+        if chave == "e":
+            resultado &= all(atende(filho, lancamento) for filho in criterio)
+        elif chave == "ou":
+            resultado &= any(atende(filho, lancamento) for filho in criterio)
+        elif chave == "tipo":
+            resultado &= lancamento["tipo"] in criterio
+        elif not lancamento.get(chave):
+            resultado = False  # Campo vazio nunca está na faixa.
+        else:
+            minimo, maximo = criterio if isinstance(criterio, list) else (criterio, criterio)
+            valor = _numero(chave, lancamento[chave])
+            resultado &= (minimo is None or _numero(chave, str(minimo)) <= valor) and (maximo is None or valor <= _numero(chave, str(maximo)))
+    return resultado
+
+
+def varredura(filtro, lancamentos):
+    return [id_ for id_, lancamento in sorted(lancamentos.items()) if atende(filtro, lancamento)]
+
+
+def colunar(_):
+    lancamentos = LancamentosColunares()
+    return lancamentos, IndiceLancamentos(lancamentos)
+
+
+def sqlite(pasta):
+    banco = BancoSQLite(str(pasta / "registros.db"))
+    return banco, banco
+
+
+@pytest.mark.parametrize("monta", [colunar, sqlite], ids=["indices", "sqlite"])
+def test_planejador_igual_a_varredura(tmp_path, monta):
+    aleatorio = random.Random(20240814)
+    esperado = gera_lancamentos(aleatorio, 600)
+    lancamentos, indices = monta(tmp_path)
+    for id_, lancamento in esperado.items():
+        lancamentos[id_] = lancamento
+
+    for rodada in range(3):
+        for _ in range(150):
+            filtro = gera_filtro(aleatorio)
+            assert indices.consulta(filtro)[0] == varredura(filtro, esperado), filtro
+        # Edições e exclusões no meio: os índices são mantidos a cada mudança e têm que continuar batendo.
+        for id_, lancamento in gera_lancamentos(aleatorio, 100).items():
+            alvo = aleatorio.choice(list(esperado))
+            lancamentos[alvo] = esperado[alvo] = lancamento
+        for alvo in aleatorio.sample(list(esperado), 50):
+            del lancamentos[alvo]
+            del esperado[alvo]
+
+
+def test_interpreta_aceita_espacos_em_volta_das_virgulas():
+    esperado = {"e": [{"tipo": ["Receita", "Despesa"]}, {"valor": ["10", None]}]}
+    assert interpreta("tipo Receita, Despesa e valor 10..") == esperado
+    assert interpreta("tipo Receita ,Despesa e valor 10..") == esperado
+    assert interpreta("tipo Receita,Despesa e valor 10..") == esperado
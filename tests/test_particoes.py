@@ -0,0 +1,166 @@
+import datetime
+import random
+import threading
+
+from agregados import AgregadoMensal, mes_do_ordinal
+from armazenamento import LancamentosColunares, data_para_ordinal
+from indices import IndiceLancamentos
+from paginacao import PaginadorMensal
+from particoes import LancamentosParticionados, LivroParticionado
+from rendimento import atualizar_em_lote
+
+
+# O livro-caixa particionado por mês (particoes.py) tem que dar os mesmos resultados que o livro inteiro na memória,
+# mesmo com a maior parte das partições ainda no disco: cada consulta carrega só o que precisa.
+HOJE = datetime.date.today()
+INICIO = datetime.date(HOJE.year - 3, 1, 1).toordinal()
+FIM = datetime.date(HOJE.year, 12, 31).toordinal()
+
+
+def gera_lancamento(aleatorio):
+    tipo = aleatorio.choice(("Receita", "Despesa", "Investimento"))
+    data = datetime.date.fromordinal(aleatorio.randint(INICIO, FIM)).strftime("%d/%m/%Y")
+    centavos = aleatorio.randrange(1, 500_000)
+    lancamento = {"data": data, "tipo": tipo, "valor": f"{'-' if tipo == 'Despesa' else ''}{centavos // 100}.{centavos % 100:02d}"}
+    if tipo == "Investimento":
+        lancamento["taxa_de_juros"] = str(aleatorio.choice((0.5, 1, 1.25)))
+        lancamento["data_investimento"] = data
+        if aleatorio.random() < 0.7:
+            lancamento["investimento_atualizado"] = f"{centavos * 1.01 / 100:.2f}"
+    return lancamento
+
+
+def plano(semente=7, quantidade=1500):  # Inclusões, edições (algumas mudam o mês) e exclusões, na mesma ordem para os dois livros.
+    aleatorio = random.Random(semente)
+    passos = [("grava", id_, gera_lancamento(aleatorio)) for id_ in range(1, quantidade + 1)]
+    for _ in range(quantidade // 5):
+        passos.append(("grava", aleatorio.randint(1, quantidade), gera_lancamento(aleatorio)))
+    for id_ in aleatorio.sample(range(1, quantidade + 1), quantidade // 10):
+        passos.append(("exclui", id_, None))
+    return passos
+
+
+def aplica(lancamentos, passos):
+    for operacao, id_, lancamento in passos:
+        if operacao == "grava":
+            lancamentos[id_] = lancamento
+        else:
+            lancamentos.pop(id_, None)
+
+
+def inteiro(passos):
+    lancamentos = LancamentosColunares()
+    agregado = AgregadoMensal(lancamentos)
+    indices = IndiceLancamentos(lancamentos)
+    aplica(lancamentos, passos)
+    return lancamentos, agregado, indices
+
+
+def particionado(pasta):  # Livro particionado recém-aberto: só o manifesto e as partições do ano atual na memória.
+    lancamentos = LancamentosParticionados()
+    agregado = AgregadoMensal(lancamentos)
+    indices = IndiceLancamentos(lancamentos)
+    livro = LivroParticionado(lancamentos, agregado, indices, str(pasta / "registros.csv"))
+    livro.carregar(None)
+    return lancamentos, indices, livro
+
+
+def estado(lancamentos):
+    return {id_: dict(lancamento) for id_, lancamento in lancamentos.items()}
+
+
+def grava_particionado(pasta, passos):
+    lancamentos, _, livro = particionado(pasta)
+    aplica(lancamentos, passos[:len(passos) // 2])
+    livro.salvar()
+    aplica(lancamentos, passos[len(passos) // 2:])  # O resto num segundo salvamento, por cima de partições que já existem.
+    livro.salvar()
+
+
+def test_resultado_mensal_e_pendente_sem_carregar(tmp_path):
+    passos = plano()
+    _, agregado, _ = inteiro(passos)
+    grava_particionado(tmp_path, passos)
+    lancamentos, _, livro = particionado(tmp_path)
+    assert livro.nao_carregadas()
+    assert livro.resultados() == agregado.resultados()
+    assert livro.investimento_pendente() == agregado.investimento_pendente()
+    assert len(lancamentos) == len(inteiro(passos)[0])
+
+
+def test_filtros_e_ids_iguais(tmp_path):
+    passos = plano()
+    esperado_lancamentos, _, esperado_indices = inteiro(passos)
+    grava_particionado(tmp_path, passos)
+    lancamentos, indices, livro = particionado(tmp_path)
+
+    de, ate = "01/03/" + str(HOJE.year - 2), "15/07/" + str(HOJE.year - 2)
+    filtro = {"data": [de, ate], "tipo": ["Receita", "Investimento"]}
+    livro.garante(data_para_ordinal(de), data_para_ordinal(ate))
+    assert indices.consulta(filtro)[0] == esperado_indices.consulta(filtro)[0]
+    assert len(livro.nao_carregadas()) > 0  # Só os meses do filtro foram lidos.
+
+    aleatorio = random.Random(3)
+    for id_ in aleatorio.sample(range(1, 1600), 40):  # Um id de uma partição no disco é carregado na hora.
+        assert (id_ in lancamentos) == (id_ in esperado_lancamentos)
+        if id_ in esperado_lancamentos:
+            assert dict(lancamentos[id_]) == dict(esperado_lancamentos[id_])
+
+    blocos = [registro for bloco in lancamentos.registros_em_blocos(100, data_para_ordinal(de), data_para_ordinal(ate)) for registro in bloco]
+    esperados = [registro for bloco in esperado_lancamentos.registros_em_blocos(100, data_para_ordinal(de), data_para_ordinal(ate)) for registro in bloco]
+    assert sorted(blocos) == sorted(esperados)
+
+
+def test_listagem_mes_a_mes(tmp_path):
+    passos = plano()
+    esperado, _, _ = inteiro(passos)
+    grava_particionado(tmp_path, passos)
+    lancamentos, _, livro = particionado(tmp_path)
+
+    paginador = PaginadorMensal(livro.meses(), livro.ids_do_mes, len(lancamentos), livro.mes_do_id)
+    assert len(livro.carregadas) < len(livro.particoes)  # Só a primeira página foi lida.
+    mostrados = list(paginador.ids_da_pagina())
+    while paginador.proxima():
+        mostrados.extend(paginador.ids_da_pagina())
+    assert mostrados == sorted((id_ for id_, _ in esperado.items()), key=lambda id_: (mes_do_ordinal(data_para_ordinal(esperado[id_]["data"])), id_))
+
+    primeiro = mostrados[len(mostrados) // 3]  # Ir até um id abre o mês dele, com a página começando nele.
+    assert paginador.ir_para_id(primeiro)
+    assert paginador.ids_da_pagina()[0] == primeiro
+    assert not paginador.ir_para_id(10_000)
+
+
+def test_revalorizacao_e_recarga(tmp_path):
+    passos = plano()
+    esperado, _, _ = inteiro(passos)
+    grava_particionado(tmp_path, passos)
+    lancamentos, _, livro = particionado(tmp_path)
+
+    referencia = datetime.date(HOJE.year, 6, 30)
+    livro.carrega_investimentos()
+    assert atualizar_em_lote(lancamentos, referencia) == atualizar_em_lote(esperado, referencia)
+    livro.salvar()
+
+    lancamentos, _, livro = particionado(tmp_path)
+    assert estado(lancamentos) == estado(esperado)  # items() carrega todas as partições.
+    assert livro.resultados() == AgregadoMensal(esperado).resultados()
+
+
+def test_carga_do_mesmo_mes_em_threads(tmp_path):  # Duas leituras do servidor pedindo o mesmo mês ao mesmo tempo não o juntam duas vezes.
+    passos = plano()
+    esperado, _, _ = inteiro(passos)
+    grava_particionado(tmp_path, passos)
+    lancamentos, _, livro = particionado(tmp_path)
+
+    barreira = threading.Barrier(4)
+
+    def carrega():
+        barreira.wait()
+        livro.carrega_tudo()
+    threads = [threading.Thread(target=carrega) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(lancamentos.ids) == sorted(set(lancamentos.ids))
+    assert estado(lancamentos) == estado(esperado)
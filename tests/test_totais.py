@@ -0,0 +1,68 @@
+import datetime
+import random
+
+import pytest
+
+from agregados import PERIODOS, TotaisPorData, rotulo_do_periodo, totais_por_periodo, _inicio_do_periodo
+from armazenamento import LancamentosColunares, data_para_ordinal
+from banco_sqlite import BancoSQLite
+
+
+# Totais por intervalo de datas (agregados.TotaisPorData) e por período: iguais a uma varredura, com datas espalhadas até 9999,
+# sem a árvore crescer com a distância entre as datas.
+
+
+def gera(lancamentos, aleatorio, quantidade):
+    for id_ in range(1, quantidade + 1):
+        if aleatorio.random() < 0.01:
+            dia = datetime.date(9999, 12, aleatorio.randint(1, 31))
+        else:
+            dia = datetime.date(2020, 1, 1) + datetime.timedelta(days=aleatorio.randrange(1500))
+        tipo = aleatorio.choice(("Receita", "Despesa"))
+        centavos = aleatorio.randrange(1, 100_000)
+        lancamentos[id_] = {"data": dia.strftime("%d/%m/%Y"), "tipo": tipo, "valor": (-centavos if tipo == "Despesa" else centavos) / 100}
+
+
+def varredura(lancamentos, periodo):  # rótulo -> (receita, despesa, quantidade) em centavos, em ordem de período.
+    grupos = {}
+    for _, lancamento in lancamentos.items():
+        inicio = _inicio_do_periodo(periodo, datetime.date.fromordinal(data_para_ordinal(lancamento["data"])))
+        totais = grupos.setdefault(inicio, [0, 0])
+        totais[0 if lancamento["tipo"] == "Receita" else 1] += round(lancamento["valor"] * 100)
+    return [(rotulo_do_periodo(periodo, inicio), *totais) for inicio, totais in sorted(grupos.items())]
+
+
+def colunar(_):
+    lancamentos = LancamentosColunares()
+    return lancamentos, TotaisPorData(lancamentos)
+
+
+def sqlite(pasta):
+    banco = BancoSQLite(str(pasta / "registros.db"))
+    return banco, banco
+
+
+@pytest.mark.parametrize("monta", [colunar, sqlite], ids=["arvores", "sqlite"])
+def test_totais_por_periodo_iguais_a_varredura(tmp_path, monta):
+    aleatorio = random.Random(9)
+    lancamentos, totais = monta(tmp_path)
+    gera(lancamentos, aleatorio, 2000)
+    for id_ in aleatorio.sample(range(1, 2001), 300):
+        del lancamentos[id_]
+    for periodo in PERIODOS:
+        linhas = totais_por_periodo(totais, periodo)
+        assert [(rotulo, round(receita * 100), round(despesa * 100)) for rotulo, receita, despesa, _, _ in linhas] == varredura(lancamentos, periodo)
+
+
+def test_arvores_so_tem_os_dias_distintos():
+    lancamentos = LancamentosColunares()
+    totais = TotaisPorData(lancamentos)
+    lancamentos[1] = {"data": "01/01/2024", "tipo": "Receita", "valor": 10}
+    assert totais.centavos_entre() == (1000, 0, 0, 1)
+    lancamentos[2] = {"data": "31/12/9999", "tipo": "Despesa", "valor": -5}  # Dia novo: remonta, com uma posição a mais.
+    assert totais.centavos_entre(data_para_ordinal("01/01/2024"), data_para_ordinal("31/12/9999")) == (1000, -500, 0, 2)
+    assert len(totais.dias) == 2 and len(totais.arvores[0]) == 3
+    assert totais.proximo_dia(data_para_ordinal("02/01/2024")) == data_para_ordinal("31/12/9999")
+    assert totais.proximo_dia(datetime.date.max.toordinal()) == datetime.date.max.toordinal()
+    del lancamentos[2]
+    assert totais.proximo_dia(data_para_ordinal("02/01/2024")) is None